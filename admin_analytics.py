@@ -0,0 +1,130 @@
+# admin_analytics.py
+"""Admin Analytics page: data-layer instrumentation (see instrumentation.py)
+and page render profiling (see page_profiler.py)."""
+import pandas as pd
+import streamlit as st
+
+import instrumentation
+import page_profiler
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def admin_analytics():
+    """Admin Analytics page"""
+    data_layer_panel()
+    st.divider()
+    page_profiler_panel()
+
+def data_layer_panel():
+    """Per-function query statistics, latency histograms and the slow-query log"""
+    st.header("📊 Data Layer Analytics")
+    if not instrumentation.ENABLED:
+        st.info("Instrumentation is disabled (SMART_CLASSROOM_INSTRUMENT=0).")
+        return
+
+    snapshot = instrumentation.snapshot()
+    functions = snapshot["functions"]
+    st.caption(f"Since {snapshot['since']} · database {snapshot['database']} · "
+               f"slow threshold {snapshot['slow_call_ms']:.0f} ms")
+
+    col1, col2, col3 = st.columns(3)
+    col1.download_button(
+        "⬇ Download JSON snapshot", instrumentation.snapshot_json(),
+        file_name="data_layer_snapshot.json", mime="application/json",
+    )
+    if col2.button("♻ Reset counters"):
+        instrumentation.reset()
+        st.rerun()
+    cache = snapshot["cache"]
+    col3.metric("Reference cache hit rate", f"{cache['hit_rate']:.0%}", f"{cache['entries']} entries")
+
+    if not functions:
+        st.info("No data-layer calls recorded yet.")
+        return
+
+    table = pd.DataFrame.from_dict(functions, orient="index")
+    table.index.name = "function"
+    table["blob"] = table["blob_bytes"].map(_format_bytes)
+    table = table.sort_values("total_ms", ascending=False)
+
+    st.subheader("Functions by total time")
+    st.dataframe(
+        table[["calls", "errors", "total_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms",
+               "rows", "blob", "statements", "vm_steps"]],
+        use_container_width=True,
+    )
+
+    heavy = table[table["blob_bytes"] > 0].sort_values("blob_bytes", ascending=False)
+    if not heavy.empty:
+        st.subheader("BLOB bytes returned")
+        st.bar_chart(heavy["blob_bytes"])
+
+    st.subheader("Latency histogram")
+    name = st.selectbox("Function", list(table.index))
+    bounds = snapshot["latency_buckets_ms"]
+    labels = [f"≤ {bound:g} ms" for bound in bounds] + [f"> {bounds[-1]:g} ms"]
+    histogram = pd.DataFrame({"bucket": labels, "calls": functions[name]["histogram"]})
+    st.bar_chart(histogram.set_index("bucket"), y="calls")
+
+    st.subheader("Slow queries")
+    slow = snapshot["slow_queries"]
+    if not slow:
+        st.info("No calls over the slow threshold.")
+    for entry in reversed(slow):
+        with st.expander(f"{entry['at']} · {entry['function']} · {entry['duration_ms']:.0f} ms · "
+                         f"{entry['rows']} rows · {_format_bytes(entry['blob_bytes'])}"):
+            for statement in entry["statements"]:
+                st.code(statement["sql"], language="sql")
+                st.caption(f"~{statement['approx_ms']:.1f} ms · {statement['vm_steps']} VM steps")
+                if statement["plan"]:
+                    st.text("\n".join(statement["plan"]))
+
+def page_profiler_panel():
+    """Render timings per page and on-demand cProfile captures"""
+    st.header("⏱ Page Render Profiler")
+    enabled = st.toggle("Time every page render", value=page_profiler.is_enabled(),
+                        help="Applies to all sessions until the server restarts")
+    if enabled != page_profiler.is_enabled():
+        page_profiler.set_enabled(enabled)
+
+    stats = page_profiler.page_stats()
+    if stats:
+        table = pd.DataFrame.from_dict(stats, orient="index")
+        table.index.name = "page"
+        st.dataframe(
+            table.sort_values("p95_ms", ascending=False)[
+                ["renders", "errors", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "cpu_ms", "db_ms"]
+            ],
+            use_container_width=True,
+        )
+        st.caption("cpu_ms and db_ms are per-render means: CPU time of the rendering thread "
+                   "and time spent in database.py.")
+        page = st.selectbox("Histogram for page", list(table.index))
+        bounds = page_profiler.PAGE_BUCKETS_MS
+        labels = [f"≤ {bound:g} ms" for bound in bounds] + [f"> {bounds[-1]:g} ms"]
+        st.bar_chart(pd.DataFrame({"bucket": labels, "renders": stats[page]["histogram"]}).set_index("bucket"))
+    elif enabled:
+        st.info("No page renders timed yet.")
+
+    st.subheader("cProfile capture")
+    names = page_profiler.page_names()
+    col1, col2 = st.columns([3, 1])
+    target = col1.selectbox("Profile the next render of", names) if names else None
+    if target and col2.button("🎯 Capture"):
+        page_profiler.request_capture(target, st.session_state.get("username") or "")
+    for page, requested_by in page_profiler.pending_captures().items():
+        st.caption(f"Waiting for the next render of {page}" + (f" (asked by {requested_by})" if requested_by else ""))
+
+    for index, capture in enumerate(reversed(page_profiler.captures())):
+        with st.expander(f"{capture['at']} · {capture['page']} · {capture['wall_ms']:.0f} ms wall, "
+                         f"{capture['cpu_ms']:.0f} ms CPU"):
+            st.download_button(
+                "⬇ Download .prof", capture["pstats"],
+                file_name=f"{capture['page'].replace(' / ', '_')}_{capture['at']}.prof",
+                mime="application/octet-stream", key=f"capture_{index}_{capture['at']}",
+            )
+            st.text(capture["report"])
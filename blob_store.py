@@ -0,0 +1,305 @@
+# blob_store.py
+"""Content-addressed storage for uploaded file payloads.
+
+Bytes live on disk under <root>/<aa>/<bb>/<sha256>, so identical uploads
+(the same lecture PDF in ten sections) are stored once. Writes happen in two
+steps: stage() hashes the payload into a temp file without holding any
+database lock, and commit() moves it into place with a single rename while
+the caller holds the write transaction that records the hash.
+
+Payloads may be stored compressed. The hash always identifies the original
+bytes; the codec only adds a suffix to the file name (<sha256>.zlib,
+<sha256>.xz) and every reader hands back the original bytes, decompressing
+one chunk at a time.
+"""
+import hashlib
+import lzma
+import os
+import tempfile
+import threading
+import zlib
+
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Union
+
+# Upper bound on payload bytes held in memory per transfer
+CHUNK_SIZE = 1024 * 1024
+
+# What stage() accepts: a whole payload, a binary file object, or an iterator of chunks
+BlobSource = Union[bytes, bytearray, memoryview, BinaryIO, Iterable[bytes]]
+
+# ================== Codecs ==================
+RAW = "raw"
+ZLIB = "zlib"
+LZMA = "lzma"
+
+ZLIB_LEVEL = 6
+LZMA_PRESET = 1  # higher presets pack text ~10% tighter at a fraction of the speed
+# Keep the compressed copy only if it saves at least this fraction
+MIN_SAVING = 0.05
+
+# codec -> (file name suffix, compressor factory, decompressor factory)
+CODECS: Dict[str, tuple] = {
+    RAW: ("", None, None),
+    ZLIB: (".zlib", lambda: zlib.compressobj(ZLIB_LEVEL), zlib.decompressobj),
+    LZMA: (".xz", lambda: lzma.LZMACompressor(preset=LZMA_PRESET), lzma.LZMADecompressor),
+}
+
+def iter_source_chunks(source: BlobSource, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+    """Yield a payload source as chunks of at most chunk_size bytes"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        pieces = (source,)
+    elif hasattr(source, "read"):
+        pieces = iter(lambda: source.read(chunk_size), b"")
+    else:
+        pieces = source
+
+    for piece in pieces:
+        view = memoryview(piece)
+        for offset in range(0, len(view), chunk_size):
+            yield view[offset:offset + chunk_size]
+
+def compress_stream(chunks: Iterable[bytes], codec: str) -> Iterator[bytes]:
+    """Compress a stream of chunks with a codec"""
+    factory = CODECS[codec][1]
+    if factory is None:
+        yield from chunks
+        return
+    compressor = factory()
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+def decompress_stream(chunks: Iterable[bytes], codec: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Decompress a stream of chunks, yielding at most chunk_size bytes at a time"""
+    factory = CODECS[codec][2]
+    if factory is None:
+        yield from chunks
+        return
+    decompressor = factory()
+    for chunk in chunks:
+        if codec == ZLIB:
+            while chunk:
+                out = decompressor.decompress(chunk, chunk_size)
+                if out:
+                    yield out
+                chunk = decompressor.unconsumed_tail
+        else:
+            out = decompressor.decompress(chunk, chunk_size)
+            if out:
+                yield out
+            while not decompressor.needs_input and not decompressor.eof:
+                yield decompressor.decompress(b"", chunk_size)
+    if codec == ZLIB:
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+class StagedBlob:
+    """A payload written to a temp file and hashed, not yet visible in the store"""
+
+    def __init__(self, content_hash: str, size: int, temp_path: str, codec: str = RAW,
+                 stored_size: Optional[int] = None):
+        self.content_hash = content_hash
+        self.size = size
+        self.temp_path = temp_path
+        self.codec = codec
+        self.stored_size = size if stored_size is None else stored_size
+
+class BlobStore:
+    """Directory of payloads keyed by their SHA-256 hex digest"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def path(self, content_hash: str, codec: str = RAW) -> str:
+        """Location of a payload on disk"""
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4], content_hash + CODECS[codec][0])
+
+    def find(self, content_hash: str) -> Optional[str]:
+        """Codec a payload is stored with, or None if it isn't stored"""
+        for codec in CODECS:
+            if os.path.exists(self.path(content_hash, codec)):
+                return codec
+        return None
+
+    def exists(self, content_hash: str, codec: Optional[str] = None) -> bool:
+        if codec is None:
+            return self.find(content_hash) is not None
+        return os.path.exists(self.path(content_hash, codec))
+
+    def _temp_file(self):
+        fd, temp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        return os.fdopen(fd, "wb"), temp_path
+
+    def stage(self, source: BlobSource, codec: str = RAW) -> StagedBlob:
+        """Hash a payload into a temp file inside the store, one chunk at a time.
+
+        With a codec other than raw the payload is then compressed into a
+        second temp file, which is kept only if it saves at least MIN_SAVING.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        out, temp_path = self._temp_file()
+        try:
+            with out:
+                for chunk in iter_source_chunks(source):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        staged = StagedBlob(digest.hexdigest(), size, temp_path)
+        if codec != RAW:
+            self._compress_staged(staged, codec)
+        return staged
+
+    def _compress_staged(self, staged: StagedBlob, codec: str):
+        out, packed_path = self._temp_file()
+        stored_size = 0
+        try:
+            with out, open(staged.temp_path, "rb") as raw:
+                for chunk in compress_stream(iter(lambda: raw.read(CHUNK_SIZE), b""), codec):
+                    out.write(chunk)
+                    stored_size += len(chunk)
+        except BaseException:
+            os.remove(packed_path)
+            raise
+
+        if stored_size <= staged.size * (1 - MIN_SAVING):
+            os.remove(staged.temp_path)
+            staged.temp_path, staged.codec, staged.stored_size = packed_path, codec, stored_size
+        else:
+            os.remove(packed_path)
+
+    def commit(self, staged: StagedBlob) -> str:
+        """Make a staged payload visible under its hash (no-op if already stored).
+
+        If the payload is already stored, possibly with another codec, the
+        staged copy is dropped and staged.codec/stored_size describe the
+        existing one.
+        """
+        existing = self.find(staged.content_hash)
+        if existing is not None:
+            self.discard(staged)
+            staged.codec = existing
+            staged.stored_size = os.path.getsize(self.path(staged.content_hash, existing))
+        else:
+            target = self.path(staged.content_hash, staged.codec)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(staged.temp_path, target)
+        return staged.content_hash
+
+    def discard(self, staged: StagedBlob):
+        """Remove a staged temp file that was not committed"""
+        if os.path.exists(staged.temp_path):
+            os.remove(staged.temp_path)
+
+    def put(self, source: BlobSource, codec: str = RAW) -> str:
+        """Store a payload and return its hash"""
+        return self.commit(self.stage(source, codec))
+
+    def open(self, content_hash: str, codec: str = RAW):
+        """Open the stored (possibly compressed) bytes of a payload for binary reading"""
+        return open(self.path(content_hash, codec), "rb")
+
+    def iter_chunks(self, content_hash: str, start: int = 0, end: Optional[int] = None,
+                    chunk_size: int = CHUNK_SIZE, codec: str = RAW) -> Iterator[bytes]:
+        """Yield original bytes [start, end) of a payload in chunks of at most chunk_size"""
+        with self.open(content_hash, codec) as f:
+            if codec == RAW:
+                f.seek(start)
+                chunks = iter(lambda: f.read(chunk_size), b"")
+                position = start
+            else:
+                # Compressed streams can't seek; decode and drop what precedes start
+                chunks = decompress_stream(iter(lambda: f.read(chunk_size), b""), codec, chunk_size)
+                position = 0
+
+            for chunk in chunks:
+                chunk_end = position + len(chunk)
+                if chunk_end > start:
+                    if end is not None and chunk_end > end:
+                        chunk = chunk[:max(end - position, 0)]
+                    if position < start:
+                        chunk = chunk[start - position:]
+                    if chunk:
+                        yield chunk
+                position = chunk_end
+                if end is not None and position >= end:
+                    break
+
+    def size(self, content_hash: str, codec: str = RAW) -> int:
+        """Size in bytes of a payload as stored on disk"""
+        return os.path.getsize(self.path(content_hash, codec))
+
+    def read(self, content_hash: str, codec: str = RAW) -> bytes:
+        """Read a whole payload"""
+        return b"".join(self.iter_chunks(content_hash, codec=codec))
+
+    @contextmanager
+    def local_path(self, content_hash: str, codec: Optional[str] = None):
+        """Path of an uncompressed copy of a payload, for tools that need a real file.
+
+        Raw payloads are used in place; compressed ones are decoded into a
+        temp file that is removed on exit.
+        """
+        codec = codec or self.find(content_hash)
+        if codec is None:
+            raise FileNotFoundError(self.path(content_hash))
+        if codec == RAW:
+            yield self.path(content_hash)
+            return
+
+        out, temp_path = self._temp_file()
+        try:
+            with out:
+                for chunk in self.iter_chunks(content_hash, codec=codec):
+                    out.write(chunk)
+            yield temp_path
+        finally:
+            os.remove(temp_path)
+
+    def recode(self, content_hash: str, codec: str, new_codec: str) -> StagedBlob:
+        """Stage a copy of a stored payload under another codec (see stage())"""
+        staged = self.stage(self.iter_chunks(content_hash, codec=codec), new_codec)
+        if staged.content_hash != content_hash:
+            self.discard(staged)
+            raise ValueError(f"Stored payload {content_hash} is corrupt (hashes to {staged.content_hash})")
+        return staged
+
+    def publish(self, staged: StagedBlob):
+        """Move a staged payload into place even if a copy with another codec exists"""
+        target = self.path(staged.content_hash, staged.codec)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(staged.temp_path, target)
+
+    def delete(self, content_hash: str, codec: Optional[str] = None):
+        """Remove a payload (every stored codec by default); callers must ensure nothing references it"""
+        for name in ([codec] if codec else CODECS):
+            path = self.path(content_hash, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+_stores: Dict[str, BlobStore] = {}
+_stores_lock = threading.Lock()
+
+def blob_dir_for(db_path: str) -> str:
+    """Blob directory used for a database file (SMART_CLASSROOM_BLOBS overrides)"""
+    return os.environ.get("SMART_CLASSROOM_BLOBS") or os.path.join(
+        os.path.dirname(os.path.abspath(db_path)), "file_store"
+    )
+
+def get_blob_store(db_path: str, root: Optional[str] = None) -> BlobStore:
+    """Get the shared BlobStore for a database file"""
+    root = os.path.abspath(root or blob_dir_for(db_path))
+    store = _stores.get(root)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(root, BlobStore(root))
+    return store
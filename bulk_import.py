@@ -0,0 +1,281 @@
+# bulk_import.py
+"""Bulk ingestion of rosters, section assignments and grades.
+
+Rows are streamed from CSV or XLSX, validated against lookups loaded once
+per run, and written with executemany() in batched transactions. Bad rows
+(duplicate username, unknown section, non-numeric grade, ...) are reported
+with their line number and skipped; the rest of the batch still loads.
+
+    python bulk_import.py users roster.csv
+    python bulk_import.py sections sections.csv
+    python bulk_import.py student_sections enrolment.xlsx
+    python bulk_import.py teacher_sections teaching.csv
+    python bulk_import.py grades grades.csv --errors grade_errors.csv
+
+Expected columns:
+    users              username, password, role
+    sections           section_name
+    student_sections   username, section_name
+    teacher_sections   username, section_name
+    grades             username, subject, grade[, assignment_date]
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import database
+
+BATCH_SIZE = 5000
+ROLES = ("Student", "Teacher", "Admin")
+
+# ================== Readers ==================
+def read_csv(path: str) -> Iterator[Tuple[int, Dict]]:
+    """Yield (line number, row) from a CSV file with a header row"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for index, row in enumerate(csv.DictReader(f)):
+            yield index + 2, {k.strip(): (v or "").strip() for k, v in row.items() if k}
+
+def read_xlsx(path: str) -> Iterator[Tuple[int, Dict]]:
+    """Yield (line number, row) from the first sheet of an XLSX workbook"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Reading .xlsx files requires openpyxl (pip install openpyxl)")
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+        for index, values in enumerate(rows):
+            row = {
+                name: "" if value is None else str(value).strip()
+                for name, value in zip(header, values) if name
+            }
+            if any(row.values()):
+                yield index + 2, row
+    finally:
+        workbook.close()
+
+def read_rows(path: str) -> Iterator[Tuple[int, Dict]]:
+    """Pick a reader from the file extension"""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        return read_xlsx(path)
+    return read_csv(path)
+
+# ================== Validation ==================
+class RowError(Exception):
+    """A row that can't be imported; the message ends up in the report"""
+
+class _Lookups:
+    """Reference data needed to validate rows, loaded once per import"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.users = {
+            row["username"]: (row["id"], row["role"])
+            for row in conn.execute("SELECT id, username, role FROM users")
+        }
+        self.sections = {
+            row["section_name"]: row["id"]
+            for row in conn.execute("SELECT id, section_name FROM sections")
+        }
+        self._memberships = {}
+        self._conn = conn
+
+    def memberships(self, table: str, user_column: str) -> set:
+        if table not in self._memberships:
+            self._memberships[table] = {
+                (row[0], row[1])
+                for row in self._conn.execute(f"SELECT {user_column}, section_id FROM {table}")
+            }
+        return self._memberships[table]
+
+    def user_id(self, username: str, role: str) -> int:
+        if not username:
+            raise RowError("missing username")
+        if username not in self.users:
+            raise RowError(f"unknown user '{username}'")
+        user_id, user_role = self.users[username]
+        if user_role.lower() != role.lower():
+            raise RowError(f"user '{username}' is a {user_role}, not a {role}")
+        return user_id
+
+    def section_id(self, section_name: str) -> int:
+        if section_name not in self.sections:
+            raise RowError(f"unknown section '{section_name}'")
+        return self.sections[section_name]
+
+def _user_row(row: Dict, lookups: _Lookups) -> tuple:
+    username, password = row.get("username", ""), row.get("password", "")
+    role = row.get("role", "").capitalize()
+    if not username or not password:
+        raise RowError("username and password are required")
+    if role not in ROLES:
+        raise RowError(f"invalid role '{row.get('role', '')}'")
+    if username in lookups.users:
+        raise RowError(f"duplicate username '{username}'")
+    lookups.users[username] = (None, role)
+    return (username, password, role)
+
+def _section_row(row: Dict, lookups: _Lookups) -> tuple:
+    name = row.get("section_name", "")
+    if not name:
+        raise RowError("section_name is required")
+    if name in lookups.sections:
+        raise RowError(f"duplicate section '{name}'")
+    lookups.sections[name] = None
+    return (name,)
+
+def _membership_row(table: str, user_column: str, role: str) -> Callable:
+    def validate(row: Dict, lookups: _Lookups) -> tuple:
+        pair = (lookups.user_id(row.get("username", ""), role), lookups.section_id(row.get("section_name", "")))
+        existing = lookups.memberships(table, user_column)
+        if pair in existing:
+            raise RowError(f"'{row['username']}' is already assigned to '{row['section_name']}'")
+        existing.add(pair)
+        return pair
+    return validate
+
+def _grade_row(row: Dict, lookups: _Lookups) -> tuple:
+    student_id = lookups.user_id(row.get("username", ""), "Student")
+    subject = row.get("subject", "")
+    if not subject:
+        raise RowError("subject is required")
+    try:
+        grade = float(row.get("grade", ""))
+    except ValueError:
+        raise RowError(f"grade '{row.get('grade', '')}' is not a number")
+
+    assignment_date = row.get("assignment_date") or datetime.now().strftime("%Y-%m-%d")
+    try:
+        assignment_date = datetime.fromisoformat(assignment_date[:10]).strftime("%Y-%m-%d")
+    except ValueError:
+        raise RowError(f"invalid assignment_date '{row['assignment_date']}'")
+    return (student_id, subject, grade, assignment_date)
+
+# dataset -> (row validator, INSERT statement)
+DATASETS: Dict[str, Tuple[Callable, str]] = {
+    "users": (
+        _user_row,
+        "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+    ),
+    "sections": (
+        _section_row,
+        "INSERT INTO sections (section_name) VALUES (?)",
+    ),
+    "student_sections": (
+        _membership_row("student_sections", "student_id", "Student"),
+        "INSERT INTO student_sections (student_id, section_id) VALUES (?, ?)",
+    ),
+    "teacher_sections": (
+        _membership_row("teacher_sections", "teacher_id", "Teacher"),
+        "INSERT INTO teacher_sections (teacher_id, section_id) VALUES (?, ?)",
+    ),
+    "grades": (
+        _grade_row,
+        "INSERT INTO grades (student_id, subject, grade, assignment_date) VALUES (?, ?, ?, ?)",
+    ),
+}
+
+# ================== Loading ==================
+def _write_batch(conn: sqlite3.Connection, sql: str, batch: List[Tuple[int, tuple]], errors: List) -> int:
+    """Insert one batch in a single transaction; isolate failures row by row"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(sql, [params for _, params in batch])
+        conn.commit()
+        return len(batch)
+    except sqlite3.IntegrityError:
+        conn.rollback()
+
+    # Something changed under us since the lookups were loaded; retry each
+    # row behind a savepoint so one bad row doesn't sink the batch
+    inserted = 0
+    conn.execute("BEGIN IMMEDIATE")
+    for line, params in batch:
+        conn.execute("SAVEPOINT import_row")
+        try:
+            conn.execute(sql, params)
+            inserted += 1
+        except sqlite3.IntegrityError as e:
+            errors.append((line, str(e)))
+            conn.execute("ROLLBACK TO import_row")
+        conn.execute("RELEASE import_row")
+    conn.commit()
+    return inserted
+
+def import_rows(dataset: str, rows: Iterable[Tuple[int, Dict]], batch_size: int = BATCH_SIZE,
+                db_path: Optional[str] = None) -> Dict:
+    """Validate and load (line number, row) pairs into a dataset.
+
+    Returns {"rows": seen, "inserted": loaded, "errors": [(line, message), ...]}.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset}', expected one of {', '.join(DATASETS)}")
+    validate, sql = DATASETS[dataset]
+
+    database.init_db(db_path)
+    conn = database.get_db_connection(db_path)
+    report = {"rows": 0, "inserted": 0, "errors": []}
+    try:
+        lookups = _Lookups(conn)
+        batch = []
+        for line, row in rows:
+            report["rows"] += 1
+            try:
+                batch.append((line, validate(row, lookups)))
+            except RowError as e:
+                report["errors"].append((line, str(e)))
+                continue
+            if len(batch) >= batch_size:
+                report["inserted"] += _write_batch(conn, sql, batch, report["errors"])
+                batch = []
+        if batch:
+            report["inserted"] += _write_batch(conn, sql, batch, report["errors"])
+    finally:
+        conn.close()
+        # Sections and assignments are cached per process; drop stale entries
+        database.clear_cache()
+
+    report["errors"].sort()
+    return report
+
+def import_file(dataset: str, path: str, batch_size: int = BATCH_SIZE, db_path: Optional[str] = None) -> Dict:
+    """Stream a CSV/XLSX file into a dataset"""
+    return import_rows(dataset, read_rows(path), batch_size=batch_size, db_path=db_path)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import rosters, section assignments and grades")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("path", help="CSV or XLSX file with a header row")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--db", default=None, help="Database file (defaults to SMART_CLASSROOM_DB)")
+    parser.add_argument("--errors", default=None, help="Write rejected rows to this CSV file")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"File not found: {args.path}")
+        return 2
+
+    report = import_file(args.dataset, args.path, batch_size=args.batch_size, db_path=args.db)
+    print(f"{args.dataset}: {report['inserted']} of {report['rows']} rows imported, "
+          f"{len(report['errors'])} rejected")
+
+    if args.errors:
+        with open(args.errors, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["line", "error"])
+            writer.writerows(report["errors"])
+    else:
+        for line, message in report["errors"][:20]:
+            print(f"  line {line}: {message}")
+        if len(report["errors"]) > 20:
+            print(f"  ... {len(report['errors']) - 20} more (use --errors to save them all)")
+    return 0 if not report["errors"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
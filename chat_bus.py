@@ -0,0 +1,225 @@
+# chat_bus.py
+"""In-process fan-out of class chat messages.
+
+Every viewer of a section's chat reruns on a timer. Instead of each rerun
+querying the messages table, viewers read from a per-section ring buffer of
+the latest messages, kept current by database.save_message/delete_message
+through a message listener. A section's buffer is loaded from the database
+once, on its first viewer, and then only changes when someone writes, so
+chat reads cost one query per write rather than one per viewer per refresh.
+
+    messages = chat_bus.get_recent_messages(section_id)
+    new = chat_bus.get_messages_since(section_id, messages[-1]["id"])
+    older = chat_bus.get_messages_page(section_id, before_id=messages[0]["id"])
+
+Buffers hold at most CHAT_BUFFER_SIZE messages; scrolling further back reads
+the database. Sections nobody has read for CHAT_IDLE_SECONDS are dropped, as
+are the least recently read ones beyond CHAT_MAX_SECTIONS. The bus only sees
+writes made by this process, so each buffer is also reloaded every
+CHAT_RESYNC_SECONDS to pick up messages written elsewhere (bulk imports,
+another app server).
+"""
+import os
+import threading
+import time
+
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+import database
+
+CHAT_BUFFER_SIZE = 200
+CHAT_MAX_SECTIONS = int(os.environ.get("SMART_CLASSROOM_CHAT_SECTIONS", "512"))
+CHAT_IDLE_SECONDS = 900
+CHAT_RESYNC_SECONDS = 60
+CHAT_SWEEP_SECONDS = 60
+
+class SectionBuffer:
+    """The latest messages of one section, oldest first"""
+
+    def __init__(self, capacity: int = CHAT_BUFFER_SIZE):
+        self.messages: deque = deque(maxlen=capacity)
+        # True while the buffer holds every message of the section
+        self.complete = False
+        self.loaded_at: Optional[float] = None
+        self.last_read = time.monotonic()
+        # Bumped on every change so viewers can skip re-rendering
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def load(self, messages: List[Dict]):
+        self.messages.clear()
+        self.messages.extend(messages)
+        self.complete = len(messages) < self.messages.maxlen
+        self.loaded_at = time.monotonic()
+        self.version += 1
+
+    def append(self, message: Dict):
+        full = len(self.messages) == self.messages.maxlen
+        if not self.messages or message["id"] > self.messages[-1]["id"]:
+            if full:
+                self.complete = False
+            self.messages.append(message)
+            self.version += 1
+            return
+
+        # Concurrent writers can publish out of commit order: place it by id
+        index = bisect_left([m["id"] for m in self.messages], message["id"])
+        if index < len(self.messages) and self.messages[index]["id"] == message["id"]:
+            return  # already loaded from the database
+        if index == 0 and (full or not self.complete):
+            # Older than the buffer reaches; readers that far back use the database
+            self.complete = False
+            return
+        if full:
+            self.messages.popleft()
+            index -= 1
+            self.complete = False
+        self.messages.insert(index, message)
+        self.version += 1
+
+    def remove(self, message_id: int):
+        for index, message in enumerate(self.messages):
+            if message["id"] == message_id:
+                del self.messages[index]
+                self.version += 1
+                return
+
+    def covers(self, last_id: int) -> bool:
+        """Whether every message after last_id is in the buffer"""
+        return self.complete or (bool(self.messages) and last_id >= self.messages[0]["id"] - 1)
+
+class ChatBus:
+    """Ring buffers of recent messages for the sections being viewed"""
+
+    def __init__(self, buffer_size: int = CHAT_BUFFER_SIZE, max_sections: int = CHAT_MAX_SECTIONS,
+                 idle_seconds: float = CHAT_IDLE_SECONDS, resync_seconds: float = CHAT_RESYNC_SECONDS):
+        self.buffer_size = buffer_size
+        self.max_sections = max_sections
+        self.idle_seconds = idle_seconds
+        self.resync_seconds = resync_seconds
+        self._sections: "OrderedDict[Tuple[str, int], SectionBuffer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + CHAT_SWEEP_SECONDS
+        self.loads = 0
+        self.reads = 0
+        self.evictions = 0
+
+    def publish(self, event: str, message: Dict):
+        """Message listener: apply a committed write to its section's buffer, if loaded"""
+        with self._lock:
+            buffer = self._sections.get((database.DB_PATH, message["section_id"]))
+        if buffer is None:
+            return  # nobody is viewing it; the first viewer loads from the database
+        with buffer.lock:
+            if buffer.loaded_at is None:
+                return
+            if event == database.MESSAGE_SAVED:
+                buffer.append(dict(message))
+            elif event == database.MESSAGE_DELETED:
+                buffer.remove(message["id"])
+
+    def _buffer(self, section_id: int) -> SectionBuffer:
+        """The section's buffer, loaded from the database if it is new or stale"""
+        now = time.monotonic()
+        key = (database.DB_PATH, section_id)
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            buffer = self._sections.get(key)
+            if buffer is None:
+                buffer = self._sections[key] = SectionBuffer(self.buffer_size)
+                while len(self._sections) > self.max_sections:
+                    self._sections.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._sections.move_to_end(key)
+            buffer.last_read = now
+            self.reads += 1
+
+        # Holding the section lock while loading makes concurrent viewers wait
+        # for one query instead of each running it, and queues publishes behind it
+        with buffer.lock:
+            if buffer.loaded_at is None or now - buffer.loaded_at >= self.resync_seconds:
+                buffer.load(database.get_messages_page(section_id, self.buffer_size))
+                self.loads += 1
+        return buffer
+
+    def _sweep(self, now: float):
+        for key in [key for key, buffer in self._sections.items() if now - buffer.last_read >= self.idle_seconds]:
+            del self._sections[key]
+            self.evictions += 1
+        self._next_sweep = now + CHAT_SWEEP_SECONDS
+
+    def get_recent_messages(self, section_id: int, limit: int = database.CHAT_PAGE_SIZE) -> List[Dict]:
+        buffer = self._buffer(section_id)
+        with buffer.lock:
+            recent = list(buffer.messages)[-limit:]
+            if len(recent) >= limit or buffer.complete:
+                return [dict(message) for message in recent]
+        return database.get_messages_page(section_id, limit)
+
+    def get_messages_since(self, section_id: int, last_id: int) -> List[Dict]:
+        buffer = self._buffer(section_id)
+        with buffer.lock:
+            if buffer.covers(last_id):
+                return [dict(message) for message in buffer.messages if message["id"] > last_id]
+        # The viewer fell further behind than the buffer reaches
+        return database.get_messages_since(section_id, last_id)
+
+    def get_messages_page(self, section_id: int, limit: int = database.CHAT_PAGE_SIZE,
+                          before_id: Optional[int] = None) -> List[Dict]:
+        if before_id is None:
+            return self.get_recent_messages(section_id, limit)
+        buffer = self._buffer(section_id)
+        with buffer.lock:
+            older = [message for message in buffer.messages if message["id"] < before_id]
+            if len(older) >= limit or buffer.complete:
+                return [dict(message) for message in older[-limit:]]
+        return database.get_messages_page(section_id, limit, before_id)
+
+    def get_version(self, section_id: int) -> int:
+        return self._buffer(section_id).version
+
+    def clear(self):
+        with self._lock:
+            self._sections.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sections": len(self._sections),
+                "buffered_messages": sum(len(buffer.messages) for buffer in self._sections.values()),
+                "reads": self.reads,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+_bus = ChatBus()
+database.add_message_listener(_bus.publish)
+
+def get_recent_messages(section_id: int, limit: int = database.CHAT_PAGE_SIZE) -> List[Dict]:
+    """The latest messages of a section, oldest first"""
+    return _bus.get_recent_messages(section_id, limit)
+
+def get_messages_since(section_id: int, last_id: int) -> List[Dict]:
+    """Messages posted to a section after last_id, oldest first"""
+    return _bus.get_messages_since(section_id, last_id)
+
+def get_messages_page(section_id: int, limit: int = database.CHAT_PAGE_SIZE,
+                      before_id: Optional[int] = None) -> List[Dict]:
+    """Like database.get_messages_page, served from the buffer when it reaches back far enough"""
+    return _bus.get_messages_page(section_id, limit, before_id)
+
+def get_version(section_id: int) -> int:
+    """Counter that changes whenever the section's recent messages change"""
+    return _bus.get_version(section_id)
+
+def clear():
+    """Drop every buffer (e.g. after a bulk import); they reload on next read"""
+    _bus.clear()
+
+def get_stats() -> Dict:
+    """Sections held, messages buffered, and read/load/eviction counters"""
+    return _bus.stats()
@@ -0,0 +1,153 @@
+# compression_benchmark.py
+"""Compare payload codecs: size ratio versus encode/decode throughput.
+
+Runs every codec setting over sample payloads through the same streaming
+code paths the blob store uses and prints one row per (payload, setting).
+Samples are the given files, payloads stored for a database (--db), or a
+built-in synthetic set (text, uncompressed PDF content streams, and random
+bytes standing in for video).
+
+    python compression_benchmark.py
+    python compression_benchmark.py notes.pdf lecture.mp4
+    python compression_benchmark.py --db smart_classroom.db --per-type 5 --json results.json
+"""
+import argparse
+import json
+import lzma
+import os
+import random
+import sys
+import time
+import zlib
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import blob_store
+import database
+
+# (label, codec, level) settings; levels feed the codec's compressor
+SETTINGS = [
+    ("zlib-1", blob_store.ZLIB, 1),
+    ("zlib-6", blob_store.ZLIB, 6),
+    ("zlib-9", blob_store.ZLIB, 9),
+    ("lzma-1", blob_store.LZMA, 1),
+    ("lzma-6", blob_store.LZMA, 6),
+]
+
+SYNTHETIC_SIZE = 8 * 1024 * 1024
+
+def _chunks(data: bytes, chunk_size: int = blob_store.CHUNK_SIZE) -> Iterator[bytes]:
+    for offset in range(0, len(data), chunk_size):
+        yield data[offset:offset + chunk_size]
+
+def synthetic_samples(size: int = SYNTHETIC_SIZE) -> List[Tuple[str, bytes]]:
+    rng = random.Random(42)
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9)))
+        for _ in range(3000)
+    ]
+    text = " ".join(rng.choice(words) for _ in range(size // 6)).encode()[:size]
+
+    page = (b"BT /F1 11 Tf 72 %d Td (%s) Tj ET\n")
+    streams = bytearray(b"%PDF-1.4\n")
+    while len(streams) < size:
+        line = " ".join(rng.choice(words) for _ in range(12)).encode()
+        streams += page % (rng.randint(50, 750), line)
+    return [
+        ("text", text),
+        ("pdf-content-streams", bytes(streams[:size])),
+        ("random (video-like)", rng.randbytes(size)),
+    ]
+
+def file_samples(paths: List[str]) -> List[Tuple[str, bytes]]:
+    samples = []
+    for path in paths:
+        with open(path, "rb") as f:
+            samples.append((os.path.basename(path), f.read()))
+    return samples
+
+def database_samples(db_path: str, per_type: int) -> List[Tuple[str, bytes]]:
+    """Decoded payloads of up to per_type stored files of each file_type"""
+    database.DB_PATH = db_path
+    database.init_db()
+    conn = database.get_db_connection()
+    rows = conn.execute("""
+        SELECT id, filename, file_type FROM (
+            SELECT id, filename, file_type,
+                   ROW_NUMBER() OVER (PARTITION BY file_type ORDER BY id DESC) AS n
+            FROM files WHERE content_hash IS NOT NULL
+        ) WHERE n <= ?
+    """, (per_type,)).fetchall()
+    conn.close()
+    samples = []
+    for row in rows:
+        data = database.get_file_data(row["id"])
+        if data is not None:
+            samples.append((f"{row['file_type']}: {row['filename']}", data))
+    return samples
+
+def _compressor(codec: str, level: int):
+    if codec == blob_store.ZLIB:
+        return zlib.compressobj(level)
+    return lzma.LZMACompressor(preset=level)
+
+def measure(data: bytes, codec: str, level: int) -> Dict:
+    started = time.perf_counter()
+    compressor = _compressor(codec, level)
+    packed = [compressor.compress(chunk) for chunk in _chunks(data)]
+    packed.append(compressor.flush())
+    encode_seconds = time.perf_counter() - started
+    packed_size = sum(len(chunk) for chunk in packed)
+
+    started = time.perf_counter()
+    decoded = sum(len(chunk) for chunk in blob_store.decompress_stream(iter(packed), codec))
+    decode_seconds = time.perf_counter() - started
+    if decoded != len(data):
+        raise RuntimeError(f"{codec} round trip lost data ({decoded} of {len(data)} bytes)")
+
+    mb = len(data) / 1e6
+    return {
+        "ratio": packed_size / len(data) if data else 1.0,
+        "encode_mb_s": mb / encode_seconds if encode_seconds else float("inf"),
+        "decode_mb_s": mb / decode_seconds if decode_seconds else float("inf"),
+    }
+
+def run_benchmark(samples: List[Tuple[str, bytes]]) -> List[Dict]:
+    results = []
+    for name, data in samples:
+        for label, codec, level in SETTINGS:
+            result = {"payload": name, "bytes": len(data), "setting": label}
+            result.update(measure(data, codec, level))
+            results.append(result)
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark payload compression codecs")
+    parser.add_argument("paths", nargs="*", help="Files to use as sample payloads")
+    parser.add_argument("--db", default=None, help="Sample payloads stored for this database")
+    parser.add_argument("--per-type", type=int, default=3, help="With --db: files per file_type")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    if args.paths:
+        samples = file_samples(args.paths)
+    elif args.db:
+        samples = database_samples(args.db, args.per_type)
+    else:
+        samples = synthetic_samples()
+    if not samples:
+        print("No sample payloads found")
+        return 1
+
+    results = run_benchmark(samples)
+    print(f"{'payload':<32} {'MB':>7} {'setting':<8} {'ratio':>7} {'enc MB/s':>9} {'dec MB/s':>9}")
+    for r in results:
+        print(f"{r['payload'][:32]:<32} {r['bytes'] / 1e6:>7.2f} {r['setting']:<8} {r['ratio']:>7.1%} "
+              f"{r['encode_mb_s']:>9.1f} {r['decode_mb_s']:>9.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
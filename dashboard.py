@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from database import get_db_connection
+from database import get_db_connection, get_student_grade_summary_frame
 
 def student_dashboard():
     """Main student dashboard interface"""
@@ -21,14 +21,11 @@ def student_dashboard():
         (student_id,)
     ).fetchall()
     
-    # Get performance data
-    grades = conn.execute(
-        "SELECT subject, grade FROM grades WHERE student_id = ?",
-        (student_id,)
-    ).fetchall()
-    
     conn.close()
 
+    # Get performance data (one pre-aggregated row per subject, already typed)
+    grades_df = get_student_grade_summary_frame(student_id)
+
     # Display sections
     if sections:
         st.subheader("📚 Enrolled Sections")
@@ -38,9 +35,8 @@ def student_dashboard():
         st.info("No enrolled sections yet.")
 
     # Display academic performance
-    if grades:
+    if not grades_df.empty:
         st.subheader("📊 Academic Performance")
-        grades_df = pd.DataFrame([dict(g) for g in grades])
-        st.bar_chart(grades_df.set_index("subject"))
+        st.bar_chart(grades_df.set_index("subject")[["average"]])
     else:
         st.info("No grade information available yet.")
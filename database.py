@@ -1,23 +1,159 @@
 
+import inspect
+import json
 import os
+import re
 import sqlite3
+import threading
+import time
 
-from typing import Optional, Dict, List, Union
+from collections import OrderedDict, deque
+from functools import wraps
+from typing import Any, Callable, Optional, Dict, Iterable, Iterator, List, Tuple, Union
 from datetime import datetime
 
-def get_db_connection() -> sqlite3.Connection:
-    """Create and return a database connection with foreign key support"""
-    conn = sqlite3.connect("smart_classroom.db")
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+from blob_store import CHUNK_SIZE, LZMA, RAW, ZLIB, BlobSource, BlobStore, get_blob_store as _get_blob_store
+
+# ================== Connection Pool ==================
+DB_PATH = os.environ.get("SMART_CLASSROOM_DB", "smart_classroom.db")
+POOL_MAX_IDLE = int(os.environ.get("SMART_CLASSROOM_POOL_SIZE", "16"))
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256
+
+# Applied to every new connection so all callers see the same settings
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Callables run on each newly opened connection (tracing, instrumentation)
+_connection_hooks: List[Callable[[sqlite3.Connection], None]] = []
+
+def add_connection_hook(hook: Callable[[sqlite3.Connection], None]):
+    """Run hook(conn) on every connection opened from now on"""
+    _connection_hooks.append(hook)
+
+def remove_connection_hook(hook: Callable[[sqlite3.Connection], None]):
+    """Stop running a previously added connection hook"""
+    if hook in _connection_hooks:
+        _connection_hooks.remove(hook)
+
+class PooledConnection(sqlite3.Connection):
+    """Connection whose close() hands it back to its pool instead of closing it"""
+    _pool = None
+    _checked_out = False
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
 
-def init_db():
-    """Initialize database with all required tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.executescript("""
+    def really_close(self):
+        """Close the underlying SQLite handle"""
+        self._pool = None
+        super().close()
+
+class ConnectionPool:
+    """Pool of warm connections to a single database file.
+
+    At most max_idle connections are kept open between uses. Busy callers
+    are never made to wait: acquire() opens a new connection when none is
+    idle, since some callers hold one connection while a nested call takes
+    another, and a hard cap could deadlock them.
+    """
+
+    def __init__(self, db_path: str, max_idle: int = POOL_MAX_IDLE):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        for hook in _connection_hooks:
+            hook(conn)
+        conn._pool = self
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        """Return an idle connection, opening a new one if none is available"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+        conn._checked_out = True
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Return a connection to the pool, discarding uncommitted work"""
+        with self._lock:
+            # A second close() must not put the same handle in the pool twice
+            if not conn._checked_out:
+                return
+            conn._checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.really_close()
+            return
+
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.really_close()
+
+    def close_all(self):
+        """Close every idle connection held by the pool"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            conn.really_close()
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path: Optional[str] = None) -> ConnectionPool:
+    """Get (or create) the connection pool for a database file"""
+    path = os.path.abspath(db_path or DB_PATH)
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(path, ConnectionPool(path))
+    return pool
+
+def get_db_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """Get a pooled database connection; call close() to hand it back"""
+    return get_pool(db_path).acquire()
+
+def close_all_connections():
+    """Close all pooled connections (e.g. before deleting the database file)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+# ================== Schema Migrations ==================
+# Each migration runs once per database, in its own transaction, and bumps
+# PRAGMA user_version. Append new migrations; never edit an applied one.
+
+_SCHEMA_TABLES = """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -119,35 +255,400 @@ def init_db():
             FOREIGN KEY(topic_id) REFERENCES recommendation_topics(id),
             FOREIGN KEY(added_by) REFERENCES users(id)
         );
-        
-        CREATE TABLE IF NOT EXISTS recommendation_topics (
+"""
+
+_SCHEMA_INDEXES = """
+        CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
+        CREATE INDEX IF NOT EXISTS idx_teacher_sections_section ON teacher_sections(section_id, teacher_id);
+        CREATE INDEX IF NOT EXISTS idx_student_sections_section ON student_sections(section_id, student_id);
+        CREATE INDEX IF NOT EXISTS idx_files_section_type ON files(section_id, file_type, uploaded_at);
+        CREATE INDEX IF NOT EXISTS idx_files_type_uploaded ON files(file_type, uploaded_at);
+        CREATE INDEX IF NOT EXISTS idx_files_uploaded_by ON files(uploaded_by);
+        CREATE INDEX IF NOT EXISTS idx_grades_student_subject ON grades(student_id, subject, grade);
+        CREATE INDEX IF NOT EXISTS idx_assignments_section ON assignments(section_id);
+        CREATE INDEX IF NOT EXISTS idx_messages_section_time ON messages(section_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(user_id);
+        CREATE INDEX IF NOT EXISTS idx_subjects_section ON subjects(section_id);
+        CREATE INDEX IF NOT EXISTS idx_topics_section ON recommendation_topics(section_id);
+        CREATE INDEX IF NOT EXISTS idx_video_recommendations_topic ON video_recommendations(topic_id);
+"""
+
+DEFAULT_ADMIN = {
+    "username": "admin",
+    "password": "admin123",
+    "role": "Admin"
+}
+
+def _execute_script(conn: sqlite3.Connection, script: str):
+    """Run a multi-statement script inside the caller's transaction.
+
+    Unlike executescript(), this does not COMMIT first, so a migration's
+    statements apply (or roll back) together with its user_version bump.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Column names of a table, in order"""
+    return [row["name"] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, declaration: str):
+    """Add a column to a populated table if it isn't there yet"""
+    if column not in _table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+def _rebuild_table(conn: sqlite3.Connection, table: str, create_sql: str):
+    """Recreate a table with a new definition, keeping rows in shared columns.
+
+    Follows SQLite's documented ALTER TABLE procedure; the migration runner
+    disables foreign key enforcement while migrations run.
+    """
+    old_columns = _table_columns(conn, table)
+    conn.execute(create_sql.replace(f"CREATE TABLE {table} ", f"CREATE TABLE {table}__new ", 1))
+    shared = ", ".join(c for c in _table_columns(conn, f"{table}__new") if c in old_columns)
+    conn.execute(f"INSERT INTO {table}__new ({shared}) SELECT {shared} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}__new RENAME TO {table}")
+
+def _migration_base_schema(conn: sqlite3.Connection):
+    _execute_script(conn, _SCHEMA_TABLES)
+    conn.execute(
+        "INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)",
+        (DEFAULT_ADMIN["username"], DEFAULT_ADMIN["password"], DEFAULT_ADMIN["role"])
+    )
+
+def _migration_indexes(conn: sqlite3.Connection):
+    _execute_script(conn, _SCHEMA_INDEXES)
+
+def _migration_legacy_files(conn: sqlite3.Connection):
+    # Databases created by older releases stored a mandatory files.file_path
+    # and had no file_data column; make file_path optional and add file_data.
+    if "file_path" not in _table_columns(conn, "files"):
+        return
+    _rebuild_table(conn, "files", """
+        CREATE TABLE files (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            topic_name TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            file_type TEXT NOT NULL,
+            file_data BLOB,
+            file_path TEXT,
+            uploaded_by INTEGER NOT NULL,
             section_id INTEGER NOT NULL,
-            created_by INTEGER NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(section_id) REFERENCES sections(id),
-            FOREIGN KEY(created_by) REFERENCES users(id),
-            UNIQUE(topic_name, section_id)
-        );               
-
+            uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(uploaded_by) REFERENCES users(id),
+            FOREIGN KEY(section_id) REFERENCES sections(id)
+        )
     """)
-
-    # Create default admin
-    default_admin = {
-        "username": "admin",
-        "password": "admin123",
-        "role": "Admin"
-    }
-    cursor.execute("SELECT * FROM users WHERE username = ?", (default_admin["username"],))
-    if not cursor.fetchone():
-        cursor.execute(
-            "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-            (default_admin["username"], default_admin["password"], default_admin["role"])
+    _execute_script(conn, _SCHEMA_INDEXES)
+
+def _connection_db_path(conn: sqlite3.Connection) -> str:
+    """File path of the main database behind a connection"""
+    return conn.execute("PRAGMA database_list").fetchone()["file"]
+
+def _migration_external_blobs(conn: sqlite3.Connection):
+    # Move payloads out of files.file_data (and legacy file_path files) into
+    # the content-addressed blob store, leaving only metadata in the table.
+    store = get_blob_store(_connection_db_path(conn))
+    _add_column(conn, "files", "content_hash", "TEXT")
+    _add_column(conn, "files", "file_size", "INTEGER")
+    columns = _table_columns(conn, "files")
+
+    if "file_data" in columns:
+        ids = [row["id"] for row in conn.execute("SELECT id FROM files WHERE file_data IS NOT NULL")]
+        for file_id in ids:
+            data = conn.execute("SELECT file_data FROM files WHERE id = ?", (file_id,)).fetchone()[0]
+            content_hash = store.put(bytes(data))
+            conn.execute(
+                "UPDATE files SET content_hash = ?, file_size = ? WHERE id = ?",
+                (content_hash, len(data), file_id)
+            )
+
+    if "file_path" in columns:
+        legacy = conn.execute(
+            "SELECT id, file_path FROM files WHERE content_hash IS NULL AND file_path IS NOT NULL"
+        ).fetchall()
+        for row in legacy:
+            if os.path.exists(row["file_path"]):
+                with open(row["file_path"], "rb") as f:
+                    data = f.read()
+                conn.execute(
+                    "UPDATE files SET content_hash = ?, file_size = ? WHERE id = ?",
+                    (store.put(data), len(data), row["id"])
+                )
+
+    _rebuild_table(conn, "files", """
+        CREATE TABLE files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            file_type TEXT NOT NULL,
+            content_hash TEXT,
+            file_size INTEGER,
+            uploaded_by INTEGER NOT NULL,
+            section_id INTEGER NOT NULL,
+            uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(uploaded_by) REFERENCES users(id),
+            FOREIGN KEY(section_id) REFERENCES sections(id)
         )
-    
-    conn.commit()
-    conn.close()
+    """)
+    _execute_script(conn, _SCHEMA_INDEXES)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files(content_hash)")
+
+def _migration_message_keyset_index(conn: sqlite3.Connection):
+    # Chat pages and incremental refreshes walk a section's messages by id
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_section_id ON messages(section_id, id)")
+
+def _migration_grade_summaries(conn: sqlite3.Connection):
+    # Summary tables are defined with the rest of the grade summary code below
+    _execute_script(conn, _GRADE_SUMMARY_SCHEMA)
+    _rebuild_grade_summaries(conn)
+
+def _migration_search_index(conn: sqlite3.Connection):
+    # Index tables and triggers are defined with the search code below
+    _execute_script(conn, _SEARCH_SCHEMA)
+    _rebuild_search_index(conn)
+
+def _migration_job_queue(conn: sqlite3.Connection):
+    # Queue tables are defined with the job code below; PDFs uploaded before
+    # the queue existed get their text extracted by the first worker run
+    _execute_script(conn, _JOB_QUEUE_SCHEMA)
+    for row in conn.execute(
+        "SELECT DISTINCT content_hash FROM files WHERE content_hash IS NOT NULL AND "
+        + _PDF_FILE_FILTER
+    ).fetchall():
+        _enqueue_pdf_text(conn, row[0])
+
+def _migration_thumbnails(conn: sqlite3.Connection):
+    _execute_script(conn, _THUMBNAIL_SCHEMA)
+    for row in conn.execute(
+        "SELECT DISTINCT content_hash FROM files WHERE content_hash IS NOT NULL AND "
+        + _PDF_FILE_FILTER
+    ).fetchall():
+        _enqueue_thumbnails(conn, row[0])
+
+def _migration_payload_codecs(conn: sqlite3.Connection):
+    # Existing payloads stay raw until `python database.py compress-files`
+    _add_column(conn, "files", "codec", f"TEXT NOT NULL DEFAULT '{RAW}'")
+    _add_column(conn, "files", "stored_size", "INTEGER")
+    conn.execute("UPDATE files SET stored_size = file_size WHERE stored_size IS NULL")
+
+def _migration_unread_counters(conn: sqlite3.Connection):
+    # Existing members start with nothing unread
+    _execute_script(conn, _UNREAD_SCHEMA)
+    _backfill_section_reads(conn)
+
+def _migration_grade_trends(conn: sqlite3.Connection):
+    # Filled by the first `python trend_analysis.py` run
+    _execute_script(conn, _GRADE_TREND_SCHEMA)
+
+def _migration_user_foreign_key_indexes(conn: sqlite3.Connection):
+    # With foreign keys enforced, deleting a user looks up every row that
+    # references it; without these that is a full scan of each table
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_subjects_created_by ON subjects(created_by)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_topics_created_by ON recommendation_topics(created_by)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_video_recommendations_added_by ON video_recommendations(added_by)")
+
+def _migration_unread_own_files(conn: sqlite3.Connection):
+    # New members were counted their own uploads as unread; recreate the
+    # membership triggers and recount the rows they already wrote
+    for table in ("student_sections", "teacher_sections"):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_unread_insert")
+    _execute_script(conn, _UNREAD_SCHEMA)
+    _rebuild_unread_counters(conn)
+
+MIGRATIONS = [
+    (1, "base schema and default admin", _migration_base_schema),
+    (2, "secondary indexes", _migration_indexes),
+    (3, "legacy files.file_path layout", _migration_legacy_files),
+    (4, "file payloads in external blob store", _migration_external_blobs),
+    (5, "keyset index for chat pagination", _migration_message_keyset_index),
+    (6, "trigger-maintained grade summaries", _migration_grade_summaries),
+    (7, "full-text search over chat and file names", _migration_search_index),
+    (8, "background job queue and PDF page text", _migration_job_queue),
+    (9, "PDF thumbnail cache", _migration_thumbnails),
+    (10, "per-file payload compression codec", _migration_payload_codecs),
+    (11, "unread counters and read watermarks", _migration_unread_counters),
+    (12, "grade trend and at-risk results", _migration_grade_trends),
+    (13, "indexes on columns referencing users", _migration_user_foreign_key_indexes),
+    (14, "unread files exclude a new member's own uploads", _migration_unread_own_files),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_migrated_paths = set()
+_migration_lock = threading.Lock()
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Read the schema version recorded in PRAGMA user_version"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply every pending migration and return the resulting schema version"""
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for version, name, apply in MIGRATIONS:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-read under the write lock in case another process migrated
+                if get_schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+    return get_schema_version(conn)
+
+def get_blob_store(db_path: Optional[str] = None) -> BlobStore:
+    """Blob store holding file payloads for a database file"""
+    return _get_blob_store(db_path or DB_PATH)
+
+def init_db(db_path: Optional[str] = None):
+    """Bring the database schema up to date (once per process per file)"""
+    path = os.path.abspath(db_path or DB_PATH)
+    if path in _migrated_paths:
+        return
+
+    with _migration_lock:
+        if path in _migrated_paths:
+            return
+        conn = get_db_connection(path)
+        try:
+            if get_schema_version(conn) < SCHEMA_VERSION:
+                migrate(conn)
+        finally:
+            conn.close()
+        _migrated_paths.add(path)
+
+# ================== Reference Data Cache ==================
+CACHE_MAX_ENTRIES = 2048
+CACHE_TTL_SECONDS = 300
+
+class QueryCache:
+    """Process-wide LRU cache with a TTL, shared by every Streamlit session.
+
+    Entries are keyed by (function name, database path, args) so writers can
+    invalidate exactly the lookups they affect. Invalidations also bump a
+    generation, so a miss that raced with a writer doesn't store the rows it
+    read before the write.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._name_generations: Dict[str, int] = {}
+        self._key_generations: Dict[Tuple, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def generation(self, key: Tuple) -> Tuple[int, int, int]:
+        """Token to take before computing a value for key; see set()"""
+        with self._lock:
+            return self._generation(key)
+
+    def _generation(self, key: Tuple) -> Tuple[int, int, int]:
+        return self._epoch, self._name_generations.get(key[0], 0), self._key_generations.get(key, 0)
+
+    def set(self, key: Tuple, value: Any, generation: Optional[Tuple[int, int, int]] = None):
+        """Store value, unless key was invalidated since generation was taken"""
+        with self._lock:
+            if generation is not None and generation != self._generation(key):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, name: str, *args):
+        """Drop one cached call, or every cached call of a function if no args"""
+        with self._lock:
+            if args:
+                key = (name, DB_PATH, args)
+                self._entries.pop(key, None)
+                if len(self._key_generations) >= self.max_entries:
+                    # Bounded bookkeeping: a new epoch outdates every generation at once
+                    self._epoch += 1
+                    self._key_generations.clear()
+                self._key_generations[key] = self._key_generations.get(key, 0) + 1
+            else:
+                self._name_generations[name] = self._name_generations.get(name, 0) + 1
+                for key in [key for key in self._entries if key[0] == name]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._key_generations.clear()
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+_query_cache = QueryCache()
+
+def cached_query(func: Callable[..., List[Dict]]) -> Callable[..., List[Dict]]:
+    """Serve a list-of-rows lookup from the shared cache until a writer invalidates it"""
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        # Bind so f(1) and f(section_id=1) share the key invalidate_cache(name, 1) drops
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__name__, DB_PATH, bound.args + tuple(sorted(bound.kwargs.items())))
+        found, rows = _query_cache.get(key)
+        if not found:
+            generation = _query_cache.generation(key)
+            rows = func(*bound.args, **bound.kwargs)
+            _query_cache.set(key, rows, generation)
+        # Hand out copies so callers can't modify the cached rows
+        return [dict(row) for row in rows]
+    return wrapper
+
+def invalidate_cache(name: str, *args):
+    """Forget cached results of a cached_query function (all of them if no args)"""
+    _query_cache.invalidate(name, *args)
+
+def clear_cache():
+    """Forget every cached result (e.g. after a bulk import)"""
+    _query_cache.clear()
+
+def get_cache_stats() -> Dict:
+    """Hit/miss/eviction counters for the reference data cache"""
+    return _query_cache.stats()
 
 # ================== User Management ==================
 def add_user(username: str, password: str, role: str) -> bool:
@@ -191,12 +692,14 @@ def add_section(section_name: str) -> bool:
             (section_name,)
         )
         conn.commit()
+        invalidate_cache("get_all_sections")
         return True
     except sqlite3.IntegrityError:
         return False  # Section exists
     finally:
         conn.close()
 
+@cached_query
 def get_all_sections() -> List[Dict]:
     """Get all sections from the database"""
     conn = get_db_connection()
@@ -213,6 +716,7 @@ def assign_section_to_teacher(teacher_id: int, section_id: int) -> bool:
             (teacher_id, section_id)
         )
         conn.commit()
+        invalidate_cache("get_teacher_sections", teacher_id)
         return True
     except sqlite3.IntegrityError:
         return False  # Assignment exists
@@ -228,6 +732,7 @@ def assign_section_to_student(student_id: int, section_id: int) -> bool:
             (student_id, section_id)
         )
         conn.commit()
+        invalidate_cache("get_student_sections", student_id)
         return True
     except sqlite3.IntegrityError:
         return False  # Assignment exists
@@ -257,27 +762,53 @@ def get_users_with_sections():
     conn.close()
     return [dict(s) for s in students], [dict(t) for t in teachers]
 
-def get_db_connection():
-    """Establish connection to the SQLite database."""
-    conn = sqlite3.connect("smart_classroom.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+# (table, column) of section material a deleted user leaves behind
+_HANDED_OVER_ON_DELETE = (
+    ("files", "uploaded_by"),
+    ("subjects", "created_by"),
+    ("recommendation_topics", "created_by"),
+)
 
 def delete_user(user_id):
-    """Delete a user and remove their associated records."""
+    """Delete a user and remove their associated records.
+
+    Their chat messages and video recommendations are deleted with them;
+    files, subjects and topics they created stay with their sections and
+    are handed to the oldest remaining admin.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        cursor.execute("BEGIN IMMEDIATE")
         # Remove user from student_sections or teacher_sections first to prevent foreign key errors
         cursor.execute("DELETE FROM student_sections WHERE student_id = ?", (user_id,))
         cursor.execute("DELETE FROM teacher_sections WHERE teacher_id = ?", (user_id,))
+
+        # Rows pointing at the user don't cascade, so clear them in the same transaction
+        deleted_messages = [dict(row) for row in cursor.execute(
+            "DELETE FROM messages WHERE user_id = ? RETURNING id, section_id", (user_id,)
+        ).fetchall()]
+        cursor.execute("DELETE FROM video_recommendations WHERE added_by = ?", (user_id,))
+        new_owner = cursor.execute(
+            "SELECT id FROM users WHERE role = 'Admin' AND id != ? ORDER BY id LIMIT 1", (user_id,)
+        ).fetchone()
+        for table, column in _HANDED_OVER_ON_DELETE:
+            if new_owner is None:
+                if cursor.execute(f"SELECT 1 FROM {table} WHERE {column} = ? LIMIT 1", (user_id,)).fetchone():
+                    raise ValueError(f"no other admin to take over their {table}")
+                continue
+            cursor.execute(f"UPDATE {table} SET {column} = ? WHERE {column} = ?", (new_owner[0], user_id))
         
         # Now, delete the user from the users table
         cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
         
         conn.commit()
         conn.close()
+        invalidate_cache("get_student_sections", user_id)
+        invalidate_cache("get_teacher_sections", user_id)
+        invalidate_cache("get_section_topics")
+        _notify_message_listeners(MESSAGE_DELETED, deleted_messages)
         return True  # Deletion successful
     except Exception as e:
         conn.rollback()
@@ -286,36 +817,110 @@ def delete_user(user_id):
         return False  
 
 # ================== File Management ==================
-def add_file(filename: str, file_type: str, file_data: bytes, uploaded_by: int, section_id: int) -> bool:
-    """Add a file record with binary data to the database"""
+# Columns returned by file listings; payloads are only read via get_file_data()
+FILE_METADATA_COLUMNS = (
+    "id, filename, file_type, content_hash, file_size, codec, stored_size, uploaded_by, section_id, uploaded_at"
+)
+# The same columns for queries that join files as f
+_JOINED_FILE_COLUMNS = ", ".join(f"f.{column}" for column in FILE_METADATA_COLUMNS.split(", "))
+
+# Payload codec per file_type: zlib decodes fast enough to stream PDFs,
+# lzma packs small text files tighter, video is already compressed
+PAYLOAD_CODECS = {"pdf": ZLIB, "video": RAW, "text": LZMA, "txt": LZMA, "csv": LZMA}
+DEFAULT_PAYLOAD_CODEC = ZLIB
+PRECOMPRESSED_EXTENSIONS = (
+    ".mp4", ".m4v", ".mov", ".mkv", ".webm", ".avi", ".mp3", ".m4a", ".ogg",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".zip", ".gz", ".xz", ".bz2", ".7z",
+    ".docx", ".pptx", ".xlsx",
+)
+
+def payload_codec(filename: str, file_type: str) -> str:
+    """Codec new payloads of this kind are stored with"""
+    if (filename or "").lower().endswith(PRECOMPRESSED_EXTENSIONS):
+        return RAW
+    return PAYLOAD_CODECS.get((file_type or "").lower(), DEFAULT_PAYLOAD_CODEC)
+
+def add_file_stream(filename: str, file_type: str, source: BlobSource, uploaded_by: int, section_id: int) -> Optional[int]:
+    """Store an upload read chunk by chunk from bytes, a file object or an iterator.
+
+    At most blob_store.CHUNK_SIZE bytes of the payload are held in memory,
+    and the payload is compressed with payload_codec(filename, file_type).
+    Returns the new file id, or None on failure.
+    """
+    store = get_blob_store()
+    try:
+        staged = store.stage(source, payload_codec(filename, file_type))
+    except (OSError, ValueError) as e:
+        print(f"Upload error: {e}")
+        return None
+
     conn = get_db_connection()
     try:
-        conn.execute(
+        # Publish the blob under the write lock so delete_file can't race us
+        conn.execute("BEGIN IMMEDIATE")
+        store.commit(staged)
+        cursor = conn.execute(
             """INSERT INTO files 
-            (filename, file_type, file_data, uploaded_by, section_id, uploaded_at)
-            VALUES (?, ?, ?, ?, ?, datetime('now'))""",
-            (filename, file_type, file_data, uploaded_by, section_id)
+            (filename, file_type, content_hash, file_size, codec, stored_size, uploaded_by, section_id, uploaded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))""",
+            (filename, file_type, staged.content_hash, staged.size, staged.codec, staged.stored_size,
+             uploaded_by, section_id)
         )
+        if _is_pdf(filename, file_type):
+            # Text and previews are made by job_worker.py, never on the upload path
+            _enqueue_pdf_text(conn, staged.content_hash)
+            _enqueue_thumbnails(conn, staged.content_hash)
         conn.commit()
-        return True
+        return cursor.lastrowid
     except Exception as e:
         print(f"Database error: {e}")
-        return False
+        return None
     finally:
+        store.discard(staged)
         conn.close()
 
+def add_file(filename: str, file_type: str, file_data: bytes, uploaded_by: int, section_id: int) -> bool:
+    """Store the file payload in the blob store and record its metadata"""
+    return add_file_stream(filename, file_type, file_data, uploaded_by, section_id) is not None
 
+def get_file(file_id: int) -> Optional[Dict]:
+    """Get a file's metadata by id"""
+    conn = get_db_connection()
+    file = conn.execute(
+        f"SELECT {FILE_METADATA_COLUMNS} FROM files WHERE id = ?", (file_id,)
+    ).fetchone()
+    conn.close()
+    return dict(file) if file else None
+
+def get_file_data(file_id: int) -> Optional[bytes]:
+    """Read a file's payload from the blob store"""
+    file = get_file(file_id)
+    if not file or not file['content_hash']:
+        return None
+    try:
+        return get_blob_store().read(file['content_hash'], codec=file['codec'])
+    except OSError as e:
+        print(f"File read error: {e}")
+        return None
+
+def iter_file_data(file_id: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a file's payload in chunks of chunk_size bytes (for downloads)"""
+    file = get_file(file_id)
+    if not file or not file['content_hash']:
+        return
+    yield from get_blob_store().iter_chunks(file['content_hash'], chunk_size=chunk_size, codec=file['codec'])
 
 def get_files_by_type(file_type: str) -> List[Dict]:
     """Get files filtered by type"""
     conn = get_db_connection()
     files = conn.execute(
-        "SELECT * FROM files WHERE file_type = ? ORDER BY uploaded_at DESC",
+        f"SELECT {FILE_METADATA_COLUMNS} FROM files WHERE file_type = ? ORDER BY uploaded_at DESC",
         (file_type,)
     ).fetchall()
     conn.close()
     return [dict(file) for file in files]
 
+@cached_query
 def get_teacher_sections(teacher_id: int) -> List[Dict]:
     """Get sections assigned to a teacher"""
     conn = get_db_connection()
@@ -331,8 +936,8 @@ def get_teacher_sections(teacher_id: int) -> List[Dict]:
 def get_student_files(student_id: int) -> List[Dict]:
     """Get files available to a student"""
     conn = get_db_connection()
-    files = conn.execute("""
-        SELECT f.*, s.section_name 
+    files = conn.execute(f"""
+        SELECT {_JOINED_FILE_COLUMNS}, s.section_name
         FROM files f
         JOIN student_sections ss ON f.section_id = ss.section_id
         JOIN sections s ON f.section_id = s.id
@@ -397,6 +1002,453 @@ def delete_grade(grade_id: int) -> bool:
     finally:
         conn.close()
 
+# ================== Grade Summaries ==================
+# grade_summary_student holds count/sum/sum of squares/min/max/latest date per
+# (student, subject); grade_summary_section holds the same per (section,
+# subject) over the section's current students. Triggers on grades and
+# student_sections keep both current, so dashboards read O(subjects) rows.
+
+_SUMMARY_COLUMNS = "grade_count, grade_sum, grade_sum_sq, min_grade, max_grade, latest_assignment_date"
+
+_SUMMARY_UPSERT = """
+    ON CONFLICT DO UPDATE SET
+        grade_count = grade_count + excluded.grade_count,
+        grade_sum = grade_sum + excluded.grade_sum,
+        grade_sum_sq = grade_sum_sq + excluded.grade_sum_sq,
+        min_grade = MIN(min_grade, excluded.min_grade),
+        max_grade = MAX(max_grade, excluded.max_grade),
+        latest_assignment_date = MAX(latest_assignment_date, excluded.latest_assignment_date)
+"""
+
+def _summary_student_add(row: str) -> str:
+    """Fold grade row NEW into its student summary"""
+    return f"""
+        INSERT INTO grade_summary_student (student_id, subject, {_SUMMARY_COLUMNS})
+        VALUES ({row}.student_id, {row}.subject, 1, {row}.grade, {row}.grade * {row}.grade,
+                {row}.grade, {row}.grade, {row}.assignment_date)
+        {_SUMMARY_UPSERT};
+    """
+
+def _summary_student_recompute(row: str) -> str:
+    """Recompute the student summary for a grade row's key from the raw grades"""
+    return f"""
+        DELETE FROM grade_summary_student WHERE student_id = {row}.student_id AND subject = {row}.subject;
+        INSERT INTO grade_summary_student (student_id, subject, {_SUMMARY_COLUMNS})
+        SELECT student_id, subject, COUNT(*), SUM(grade), SUM(grade * grade),
+               MIN(grade), MAX(grade), MAX(assignment_date)
+        FROM grades WHERE student_id = {row}.student_id AND subject = {row}.subject
+        GROUP BY student_id, subject;
+    """
+
+def _summary_section_add(row: str) -> str:
+    """Fold grade row NEW into the summaries of every section the student is in"""
+    return f"""
+        INSERT INTO grade_summary_section (section_id, subject, {_SUMMARY_COLUMNS})
+        SELECT ss.section_id, {row}.subject, 1, {row}.grade, {row}.grade * {row}.grade,
+               {row}.grade, {row}.grade, {row}.assignment_date
+        FROM student_sections ss WHERE ss.student_id = {row}.student_id
+        {_SUMMARY_UPSERT};
+    """
+
+def _summary_section_subtract(row: str) -> str:
+    """Take grade row OLD's count and sums back out of its sections"""
+    return f"""
+        UPDATE grade_summary_section SET
+            grade_count = grade_count - 1,
+            grade_sum = grade_sum - {row}.grade,
+            grade_sum_sq = grade_sum_sq - {row}.grade * {row}.grade
+        WHERE subject = {row}.subject
+          AND section_id IN (SELECT section_id FROM student_sections WHERE student_id = {row}.student_id);
+    """
+
+def _summary_section_refresh(section_filter: str, subject_filter: str) -> str:
+    """Recompute section min/max/latest from the members' student summaries.
+
+    Min and max can't be decremented, so after a removal they are rebuilt
+    from the (already updated) per-student rows of the section's members.
+    """
+    return f"""
+        UPDATE grade_summary_section SET (min_grade, max_grade, latest_assignment_date) = (
+            SELECT MIN(gs.min_grade), MAX(gs.max_grade), MAX(gs.latest_assignment_date)
+            FROM student_sections ss
+            JOIN grade_summary_student gs ON gs.student_id = ss.student_id
+            WHERE ss.section_id = grade_summary_section.section_id
+              AND gs.subject = grade_summary_section.subject
+        )
+        WHERE {section_filter} AND {subject_filter};
+        DELETE FROM grade_summary_section WHERE grade_count <= 0 AND {section_filter} AND {subject_filter};
+    """
+
+def _summary_grade_sections_refresh(row: str) -> str:
+    return _summary_section_refresh(
+        f"section_id IN (SELECT section_id FROM student_sections WHERE student_id = {row}.student_id)",
+        f"subject = {row}.subject",
+    )
+
+def _summary_add_member(row: str) -> str:
+    """Trigger statements adding a student's summaries to a section"""
+    return f"""
+        INSERT INTO grade_summary_section (section_id, subject, {_SUMMARY_COLUMNS})
+        SELECT {row}.section_id, subject, {_SUMMARY_COLUMNS}
+        FROM grade_summary_student WHERE student_id = {row}.student_id
+        {_SUMMARY_UPSERT};
+    """
+
+def _summary_remove_member(row: str) -> str:
+    """Trigger statements removing a student's summaries from a section"""
+    subjects = f"subject IN (SELECT subject FROM grade_summary_student WHERE student_id = {row}.student_id)"
+    return f"""
+        UPDATE grade_summary_section SET
+            grade_count = grade_summary_section.grade_count - gs.grade_count,
+            grade_sum = grade_summary_section.grade_sum - gs.grade_sum,
+            grade_sum_sq = grade_summary_section.grade_sum_sq - gs.grade_sum_sq
+        FROM grade_summary_student gs
+        WHERE gs.student_id = {row}.student_id
+          AND grade_summary_section.section_id = {row}.section_id
+          AND grade_summary_section.subject = gs.subject;
+        {_summary_section_refresh(f"section_id = {row}.section_id", subjects)}
+    """
+
+_GRADE_SUMMARY_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS grade_summary_student (
+        student_id INTEGER NOT NULL,
+        subject TEXT NOT NULL,
+        grade_count INTEGER NOT NULL,
+        grade_sum REAL NOT NULL,
+        grade_sum_sq REAL NOT NULL,
+        min_grade REAL,
+        max_grade REAL,
+        latest_assignment_date DATE,
+        PRIMARY KEY (student_id, subject)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS grade_summary_section (
+        section_id INTEGER NOT NULL,
+        subject TEXT NOT NULL,
+        grade_count INTEGER NOT NULL,
+        grade_sum REAL NOT NULL,
+        grade_sum_sq REAL NOT NULL,
+        min_grade REAL,
+        max_grade REAL,
+        latest_assignment_date DATE,
+        PRIMARY KEY (section_id, subject)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS trg_grades_summary_insert AFTER INSERT ON grades
+    BEGIN
+        {_summary_student_add("NEW")}
+        {_summary_section_add("NEW")}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_grades_summary_delete AFTER DELETE ON grades
+    BEGIN
+        {_summary_student_recompute("OLD")}
+        {_summary_section_subtract("OLD")}
+        {_summary_grade_sections_refresh("OLD")}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_grades_summary_update
+    AFTER UPDATE OF student_id, subject, grade, assignment_date ON grades
+    BEGIN
+        {_summary_student_recompute("OLD")}
+        {_summary_student_recompute("NEW")}
+        {_summary_section_subtract("OLD")}
+        {_summary_section_add("NEW")}
+        {_summary_grade_sections_refresh("OLD")}
+        {_summary_grade_sections_refresh("NEW")}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_student_sections_summary_insert AFTER INSERT ON student_sections
+    BEGIN
+        {_summary_add_member("NEW")}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_student_sections_summary_delete AFTER DELETE ON student_sections
+    BEGIN
+        {_summary_remove_member("OLD")}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_student_sections_summary_update
+    AFTER UPDATE OF student_id, section_id ON student_sections
+    BEGIN
+        {_summary_remove_member("OLD")}
+        {_summary_add_member("NEW")}
+    END;
+"""
+
+# Summaries recomputed from raw rows; used to rebuild and to check the tables
+_STUDENT_SUMMARY_FROM_GRADES = """
+    SELECT student_id, subject, COUNT(*), SUM(grade), SUM(grade * grade),
+           MIN(grade), MAX(grade), MAX(assignment_date)
+    FROM grades GROUP BY student_id, subject
+"""
+_SECTION_SUMMARY_FROM_GRADES = """
+    SELECT ss.section_id, g.subject, COUNT(*), SUM(g.grade), SUM(g.grade * g.grade),
+           MIN(g.grade), MAX(g.grade), MAX(g.assignment_date)
+    FROM grades g JOIN student_sections ss ON ss.student_id = g.student_id
+    GROUP BY ss.section_id, g.subject
+"""
+
+def _rebuild_grade_summaries(conn: sqlite3.Connection):
+    conn.execute("DELETE FROM grade_summary_student")
+    conn.execute("DELETE FROM grade_summary_section")
+    conn.execute(f"INSERT INTO grade_summary_student (student_id, subject, {_SUMMARY_COLUMNS}) "
+                 + _STUDENT_SUMMARY_FROM_GRADES)
+    conn.execute(f"INSERT INTO grade_summary_section (section_id, subject, {_SUMMARY_COLUMNS}) "
+                 + _SECTION_SUMMARY_FROM_GRADES)
+
+def rebuild_grade_summaries() -> bool:
+    """Recompute both summary tables from the raw grades"""
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild_grade_summaries(conn)
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Summary rebuild error: {e}")
+        return False
+    finally:
+        conn.close()
+
+def check_grade_summaries(tolerance: float = 1e-6) -> List[Dict]:
+    """Compare the summary tables against the raw grades; returns mismatched keys"""
+    conn = get_db_connection()
+    try:
+        mismatches = []
+        for table, key, expected_sql in (
+            ("grade_summary_student", "student_id", _STUDENT_SUMMARY_FROM_GRADES),
+            ("grade_summary_section", "section_id", _SECTION_SUMMARY_FROM_GRADES),
+        ):
+            expected = {(row[0], row[1]): tuple(row[2:]) for row in conn.execute(expected_sql)}
+            actual = {
+                (row[0], row[1]): tuple(row[2:])
+                for row in conn.execute(f"SELECT {key}, subject, {_SUMMARY_COLUMNS} FROM {table}")
+            }
+            for k in expected.keys() | actual.keys():
+                want, got = expected.get(k), actual.get(k)
+                if want is None or got is None or not all(
+                    a == b or (isinstance(a, float) and isinstance(b, float)
+                               and abs(a - b) <= tolerance * max(1.0, abs(a)))
+                    for a, b in zip(want, got)
+                ):
+                    mismatches.append({"table": table, key: k[0], "subject": k[1],
+                                       "expected": want, "actual": got})
+        return mismatches
+    finally:
+        conn.close()
+
+def _summary_rows(rows) -> List[Dict]:
+    """Turn summary rows into dicts with average and standard deviation"""
+    summaries = []
+    for row in rows:
+        summary = dict(row)
+        n = summary["grade_count"]
+        mean = summary["grade_sum"] / n
+        summary["average"] = mean
+        summary["std"] = max(summary["grade_sum_sq"] / n - mean * mean, 0.0) ** 0.5
+        summaries.append(summary)
+    return summaries
+
+def get_student_grade_summary(student_id: int) -> List[Dict]:
+    """Per-subject grade summary for a student"""
+    conn = get_db_connection()
+    rows = conn.execute(
+        f"SELECT subject, {_SUMMARY_COLUMNS} FROM grade_summary_student WHERE student_id = ? ORDER BY subject",
+        (student_id,)
+    ).fetchall()
+    conn.close()
+    return _summary_rows(rows)
+
+def get_section_grade_summary(section_id: int) -> List[Dict]:
+    """Per-subject grade summary across a section's students"""
+    conn = get_db_connection()
+    rows = conn.execute(
+        f"SELECT subject, {_SUMMARY_COLUMNS} FROM grade_summary_section WHERE section_id = ? ORDER BY subject",
+        (section_id,)
+    ).fetchall()
+    conn.close()
+    return _summary_rows(rows)
+
+# ================== Columnar Queries ==================
+# Analytics pages get pyarrow Tables / pandas DataFrames straight from the
+# cursor, one fetchmany() batch at a time, instead of Row -> dict -> DataFrame.
+# pyarrow and pandas are imported lazily so the login page doesn't load them.
+FETCH_BATCH_SIZE = 10000
+
+GRADE_COLUMN_TYPES = {
+    "id": "int64",
+    "student_id": "int64",
+    "subject": "string",
+    "grade": "double",
+    "assignment_date": "date32",
+    "username": "string",
+}
+
+GRADE_SUMMARY_COLUMN_TYPES = {
+    "subject": "string",
+    "grade_count": "int64",
+    "average": "double",
+    "min_grade": "double",
+    "max_grade": "double",
+    "latest_assignment_date": "date32",
+}
+
+def query_arrow(sql: str, params=(), column_types: Optional[Dict[str, str]] = None,
+                batch_size: int = FETCH_BATCH_SIZE, db_path: Optional[str] = None):
+    """Run a query and return a pyarrow.Table built batch by batch.
+
+    column_types maps column names to Arrow type aliases ("int64", "double",
+    "string", "date32", "timestamp[s]", ...); other columns are inferred.
+    """
+    import pyarrow as pa
+
+    column_types = column_types or {}
+    conn = get_db_connection(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.row_factory = None  # plain tuples; columns are transposed below
+        cursor.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+        types = [pa.type_for_alias(column_types[n]) if n in column_types else None for n in names]
+
+        batches = []
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            arrays = []
+            for values, arrow_type in zip(zip(*rows), types):
+                array = pa.array(values)
+                if arrow_type is not None and array.type != arrow_type:
+                    array = array.cast(arrow_type)
+                arrays.append(array)
+            batches.append(pa.RecordBatch.from_arrays(arrays, names=names))
+    finally:
+        conn.close()
+
+    if not batches:
+        return pa.table({n: pa.array([], type=t or pa.null()) for n, t in zip(names, types)})
+    # Inferred column types can differ between batches (all-NULL, or int64 vs double);
+    # permissive promotion widens them to a common type
+    return pa.Table.from_batches(batches) if len({b.schema for b in batches}) == 1 else \
+        pa.concat_tables([pa.Table.from_batches([b]) for b in batches], promote_options="permissive")
+
+def query_dataframe(sql: str, params=(), column_types: Optional[Dict[str, str]] = None,
+                    batch_size: int = FETCH_BATCH_SIZE, db_path: Optional[str] = None):
+    """Run a query and return a typed pandas DataFrame (via query_arrow)"""
+    table = query_arrow(sql, params, column_types, batch_size, db_path)
+    return table.to_pandas(date_as_object=False)
+
+def get_student_grades_frame(student_id: int):
+    """DataFrame variant of get_student_grades"""
+    return query_dataframe(
+        "SELECT subject, grade, assignment_date FROM grades WHERE student_id = ?",
+        (student_id,), GRADE_COLUMN_TYPES
+    )
+
+def get_section_grades_arrow(section_id: int):
+    """pyarrow.Table variant of get_section_grades"""
+    return query_arrow("""
+        SELECT g.id, g.student_id, g.subject, g.grade, g.assignment_date, u.username
+        FROM student_sections ss
+        JOIN grades g ON g.student_id = ss.student_id
+        JOIN users u ON u.id = ss.student_id
+        WHERE ss.section_id = ?
+    """, (section_id,), GRADE_COLUMN_TYPES)
+
+def get_section_grades_frame(section_id: int):
+    """DataFrame variant of get_section_grades"""
+    return get_section_grades_arrow(section_id).to_pandas(date_as_object=False)
+
+def get_student_grade_summary_frame(student_id: int):
+    """DataFrame variant of get_student_grade_summary"""
+    return query_dataframe("""
+        SELECT subject, grade_count, grade_sum / grade_count AS average,
+               min_grade, max_grade, latest_assignment_date
+        FROM grade_summary_student WHERE student_id = ? ORDER BY subject
+    """, (student_id,), GRADE_SUMMARY_COLUMN_TYPES)
+
+# ================== Grade Trends ==================
+# grade_trends holds the nightly output of trend_analysis.py: per (student,
+# subject) the least-squares slope of grade over time and the student's
+# z-score within the subject, plus the resulting at-risk flags. The whole
+# table is replaced by each run.
+
+GRADE_TREND_COLUMNS = (
+    "student_id", "subject", "grade_count", "mean_grade", "slope_per_30_days",
+    "z_score", "first_date", "last_date", "declining", "outlier",
+)
+
+_GRADE_TREND_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS grade_trends (
+        student_id INTEGER NOT NULL,
+        subject TEXT NOT NULL,
+        grade_count INTEGER NOT NULL,
+        mean_grade REAL NOT NULL,
+        slope_per_30_days REAL,         -- NULL when all grades share one date
+        z_score REAL,                   -- NULL when the subject has no spread
+        first_date DATE NOT NULL,
+        last_date DATE NOT NULL,
+        declining INTEGER NOT NULL DEFAULT 0,
+        outlier INTEGER NOT NULL DEFAULT 0,
+        computed_at DATETIME NOT NULL,
+        PRIMARY KEY (student_id, subject),
+        FOREIGN KEY (student_id) REFERENCES users(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+"""
+
+def replace_grade_trends(rows: Iterable[tuple], computed_at: Optional[str] = None,
+                         db_path: Optional[str] = None) -> int:
+    """Swap in a new set of trend rows (tuples in GRADE_TREND_COLUMNS order) in one transaction"""
+    computed_at = computed_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    columns = ", ".join(GRADE_TREND_COLUMNS)
+    placeholders = ", ".join("?" * len(GRADE_TREND_COLUMNS))
+    conn = get_db_connection(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM grade_trends")
+        cursor = conn.executemany(
+            f"INSERT INTO grade_trends ({columns}, computed_at) VALUES ({placeholders}, ?)",
+            (tuple(row) + (computed_at,) for row in rows)
+        )
+        count = cursor.rowcount
+        conn.commit()
+        return count
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def get_section_grade_trends(section_id: int, flagged_only: bool = False) -> List[Dict]:
+    """Trend rows of a section's students, most declining first"""
+    query = f"""
+        SELECT u.username, {", ".join("t." + column for column in GRADE_TREND_COLUMNS)}, t.computed_at
+        FROM student_sections ss
+        JOIN grade_trends t ON t.student_id = ss.student_id
+        JOIN users u ON u.id = ss.student_id
+        WHERE ss.section_id = ?
+    """
+    if flagged_only:
+        query += " AND (t.declining OR t.outlier)"
+    conn = get_db_connection()
+    rows = conn.execute(query, (section_id,)).fetchall()
+    conn.close()
+    trends = [dict(row) for row in rows]
+    trends.sort(key=lambda row: (row["slope_per_30_days"] is None, row["slope_per_30_days"] or 0.0))
+    return trends
+
+def get_student_grade_trends(student_id: int) -> List[Dict]:
+    """Trend rows of one student, by subject"""
+    conn = get_db_connection()
+    rows = conn.execute(
+        f"SELECT {', '.join(GRADE_TREND_COLUMNS)}, computed_at FROM grade_trends WHERE student_id = ? ORDER BY subject",
+        (student_id,)
+    ).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
 # ================== Assignment Management ==================
 def create_assignment(title: str, description: str, due_date: str, section_id: int) -> bool:
     """Create a new assignment"""
@@ -429,7 +1481,7 @@ def get_assignments_by_section(section_id: int) -> List[Dict]:
 def get_section_files(section_id: int, file_type: str = None) -> List[Dict]:
     """Get files for a specific section"""
     conn = get_db_connection()
-    query = "SELECT * FROM files WHERE section_id = ?"
+    query = f"SELECT {FILE_METADATA_COLUMNS} FROM files WHERE section_id = ?"
     params = [section_id]
     
     if file_type:
@@ -444,18 +1496,26 @@ def delete_file(file_id: int, user_id: int) -> bool:
     """Delete a file if user is the uploader"""
     conn = get_db_connection()
     try:
+        conn.execute("BEGIN IMMEDIATE")
         file_info = conn.execute(
-            "SELECT file_path, uploaded_by FROM files WHERE id = ?",
+            "SELECT content_hash, uploaded_by FROM files WHERE id = ?",
             (file_id,)
         ).fetchone()
         
         if not file_info or file_info['uploaded_by'] != user_id:
             return False
             
-        if os.path.exists(file_info['file_path']):
-            os.remove(file_info['file_path'])
-            
         conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+        # Other sections may share the same payload; only drop the last reference
+        content_hash = file_info['content_hash']
+        if content_hash and not conn.execute(
+            "SELECT 1 FROM files WHERE content_hash = ? LIMIT 1", (content_hash,)
+        ).fetchone():
+            conn.execute("DELETE FROM pdf_pages WHERE content_hash = ?", (content_hash,))
+            conn.execute("DELETE FROM thumbnails WHERE content_hash = ?", (content_hash,))
+            get_blob_store().delete(content_hash)
+
         conn.commit()
         return True
     except Exception as e:
@@ -464,22 +1524,69 @@ def delete_file(file_id: int, user_id: int) -> bool:
     finally:
         conn.close()
 
+def user_can_access_file(user_id: int, file_id: int) -> bool:
+    """Check that a user belongs to the file's section (admins can see everything)"""
+    conn = get_db_connection()
+    row = conn.execute("""
+        SELECT 1 FROM files f
+        WHERE f.id = ? AND (
+            EXISTS (SELECT 1 FROM student_sections ss
+                    WHERE ss.student_id = ? AND ss.section_id = f.section_id)
+            OR EXISTS (SELECT 1 FROM teacher_sections ts
+                       WHERE ts.teacher_id = ? AND ts.section_id = f.section_id)
+            OR EXISTS (SELECT 1 FROM users u WHERE u.id = ? AND u.role = 'Admin')
+        )
+    """, (file_id, user_id, user_id, user_id)).fetchone()
+    conn.close()
+    return row is not None
+
 # ================== Chat Functionality ==================
+MESSAGE_SAVED = "saved"
+MESSAGE_DELETED = "deleted"
+
+# Callables told about committed chat writes (see chat_bus.py): listener(event, message)
+# gets the full message row for MESSAGE_SAVED and {"id", "section_id"} for MESSAGE_DELETED
+_message_listeners: List[Callable[[str, Dict], None]] = []
+
+def add_message_listener(listener: Callable[[str, Dict], None]):
+    """Call listener(event, message) after every message saved or deleted from now on"""
+    if listener not in _message_listeners:
+        _message_listeners.append(listener)
+
+def remove_message_listener(listener: Callable[[str, Dict], None]):
+    """Stop notifying a previously added message listener"""
+    if listener in _message_listeners:
+        _message_listeners.remove(listener)
+
+def _notify_message_listeners(event: str, messages: List[Dict]):
+    for listener in list(_message_listeners):
+        for message in messages:
+            try:
+                listener(event, message)
+            except Exception as e:
+                print(f"Message listener error: {e}")
+
 def save_message(section_id: int, user_id: int, content: str) -> bool:
     """Save a chat message to the database"""
     conn = get_db_connection()
     try:
-        conn.execute(
-            "INSERT INTO messages (section_id, user_id, content) VALUES (?, ?, ?)",
+        message_id = conn.execute(
+            "INSERT INTO messages (section_id, user_id, content) VALUES (?, ?, ?) RETURNING id",
             (section_id, user_id, content)
-        )
+        ).fetchone()[0]
+        # Listeners get the row as chat pages read it, so they never query for it
+        message = None
+        if _message_listeners:
+            message = dict(conn.execute(_MESSAGE_COLUMNS + " WHERE m.id = ?", (message_id,)).fetchone())
         conn.commit()
-        return True
     except Exception as e:
         print(f"Error saving message: {e}")
         return False
     finally:
         conn.close()
+    if message is not None:
+        _notify_message_listeners(MESSAGE_SAVED, [message])
+    return True
 
 def get_messages(section_id: int) -> List[Dict]:
     """Retrieve messages for a section"""
@@ -494,23 +1601,66 @@ def get_messages(section_id: int) -> List[Dict]:
     conn.close()
     return [dict(msg) for msg in messages]
 
+CHAT_PAGE_SIZE = 50
+
+_MESSAGE_COLUMNS = """
+    SELECT m.id, m.section_id, m.user_id, m.content, m.timestamp, u.username, u.role
+    FROM messages m
+    JOIN users u ON m.user_id = u.id
+"""
+
+def get_messages_page(section_id: int, limit: int = CHAT_PAGE_SIZE, before_id: Optional[int] = None) -> List[Dict]:
+    """Get the latest messages of a section, or the page older than before_id.
+
+    Messages come back oldest first; pass the first message's id as
+    before_id to load the previous page.
+    """
+    query = _MESSAGE_COLUMNS + " WHERE m.section_id = ?"
+    params = [section_id]
+    if before_id is not None:
+        query += " AND m.id < ?"
+        params.append(before_id)
+    query += " ORDER BY m.id DESC LIMIT ?"
+    params.append(limit)
+
+    conn = get_db_connection()
+    messages = conn.execute(query, params).fetchall()
+    conn.close()
+    return [dict(msg) for msg in reversed(messages)]
+
+def get_messages_since(section_id: int, last_id: int, limit: Optional[int] = None) -> List[Dict]:
+    """Get messages posted to a section after last_id, oldest first"""
+    query = _MESSAGE_COLUMNS + " WHERE m.section_id = ? AND m.id > ? ORDER BY m.id"
+    params = [section_id, last_id]
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    conn = get_db_connection()
+    messages = conn.execute(query, params).fetchall()
+    conn.close()
+    return [dict(msg) for msg in messages]
+
 def delete_message(message_id: int, user_id: int, user_role: str) -> bool:
     """Delete a message from the chat"""
     conn = get_db_connection()
     try:
         if user_role == "Teacher":
-            conn.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+            deleted = conn.execute("DELETE FROM messages WHERE id = ? RETURNING id, section_id",
+                                   (message_id,)).fetchall()
         else:
-            conn.execute("DELETE FROM messages WHERE id = ? AND user_id = ?", 
-                        (message_id, user_id))
+            deleted = conn.execute("DELETE FROM messages WHERE id = ? AND user_id = ? RETURNING id, section_id",
+                                   (message_id, user_id)).fetchall()
         conn.commit()
-        return True
     except Exception as e:
         print(f"Delete error: {e}")
         return False
     finally:
         conn.close()
+    _notify_message_listeners(MESSAGE_DELETED, [dict(row) for row in deleted])
+    return True
 
+@cached_query
 def get_student_sections(student_id: int) -> List[Dict]:
     """Get sections assigned to a student"""
     conn = get_db_connection()
@@ -523,17 +1673,12 @@ def get_student_sections(student_id: int) -> List[Dict]:
     conn.close()
     return [dict(section) for section in sections]
 
-if __name__ == "__main__":
-    init_db()
-    print("Database initialized successfully!")
-
-    # database.py - Add these new functions
-
 def get_teacher_section_students(teacher_id: int) -> List[Dict]:
     """Get all students in sections taught by a teacher"""
     conn = get_db_connection()
+    # (teacher, section) and (student, section) pairs are unique, so no DISTINCT needed
     students = conn.execute("""
-        SELECT DISTINCT u.id, u.username, s.section_name
+        SELECT u.id, u.username, s.section_name
         FROM users u
         JOIN student_sections ss ON u.id = ss.student_id
         JOIN teacher_sections ts ON ss.section_id = ts.section_id
@@ -624,12 +1769,14 @@ def create_subject(subject_name: str, section_id: int, teacher_id: int) -> bool:
             (subject_name, section_id, teacher_id)
         )
         conn.commit()
+        invalidate_cache("get_section_subjects", section_id)
         return True
     except sqlite3.IntegrityError:
         return False  # Subject already exists in section
     finally:
         conn.close()
 
+@cached_query
 def get_section_subjects(section_id: int) -> List[Dict]:
     """Get all subjects for a section"""
     conn = get_db_connection()
@@ -644,17 +1791,23 @@ def delete_subject(subject_id: int, teacher_id: int) -> bool:
     """Delete a subject if created by the teacher"""
     conn = get_db_connection()
     try:
-        conn.execute(
+        subject = conn.execute(
+            "SELECT section_id FROM subjects WHERE id = ? AND created_by = ?",
+            (subject_id, teacher_id)
+        ).fetchone()
+        if not subject:
+            return False
+        cursor = conn.execute(
             "DELETE FROM subjects WHERE id = ? AND created_by = ?",
             (subject_id, teacher_id)
         )
         conn.commit()
-        return conn.total_changes > 0
+        invalidate_cache("get_section_subjects", subject['section_id'])
+        return cursor.rowcount > 0
     finally:
         conn.close()
 
-# Add to database.py
-
+# ================== YouTube Recommendations ==================
 def create_topic(topic_name: str, section_id: int, created_by: int) -> bool:
     """Create a new recommendation topic"""
     conn = get_db_connection()
@@ -666,12 +1819,14 @@ def create_topic(topic_name: str, section_id: int, created_by: int) -> bool:
             (topic_name.strip(), section_id, created_by)
         )
         conn.commit()
+        invalidate_cache("get_section_topics", section_id)
         return True
     except sqlite3.IntegrityError:
         return False  # Topic already exists
     finally:
         conn.close()
 
+@cached_query
 def get_section_topics(section_id: int) -> List[Dict]:
     """Get all topics for a section"""
     conn = get_db_connection()
@@ -704,7 +1859,7 @@ def get_topic_recommendations(topic_id: int) -> List[Dict]:
     """Get all recommendations for a topic"""
     conn = get_db_connection()
     recommendations = conn.execute(
-        """SELECT v.id, v.video_url, u.username as added_by 
+        """SELECT v.id, v.video_url, v.title, u.username as added_by 
         FROM video_recommendations v
         JOIN users u ON v.added_by = u.id
         WHERE topic_id = ?""",
@@ -712,83 +1867,834 @@ def get_topic_recommendations(topic_id: int) -> List[Dict]:
     ).fetchall()
     conn.close()
     return [dict(rec) for rec in recommendations]
-# Add to database.py
 
-# ================== YouTube Recommendations ==================
-def create_topic(topic_name: str, section_id: int, created_by: int) -> bool:
-    """Create a new recommendation topic"""
+def get_student_section_files(student_id: int, file_type: str = None) -> List[Dict]:
+    """Get all PDFs or videos for the student's assigned sections"""
+    conn = get_db_connection()
+    query = f"""
+        SELECT {_JOINED_FILE_COLUMNS}
+        FROM files f
+        JOIN student_sections ss ON f.section_id = ss.section_id
+        WHERE ss.student_id = ?
+    """
+    params = [student_id]
+    
+    if file_type:
+        query += " AND f.file_type = ?"
+        params.append(file_type)
+    
+    files = conn.execute(query, params).fetchall()
+    conn.close()
+    return [dict(file) for file in files]
+
+# ================== Unread Badges ==================
+# section_reads holds one row per (member, section): how far the user has
+# read each kind of activity (highest id seen) and how many newer items by
+# other people there are. Triggers on the activity tables bump the counters
+# of the section's members as items are added or removed, so badges are read
+# from the user's own rows without counting any history.
+#
+# New members start caught up on chat, with every existing file and
+# assignment of the section unread.
+
+# kind -> (source table, counter column, watermark column, author column or None)
+UNREAD_KINDS = {
+    "messages": ("messages", "unread_messages", "last_read_message_id", "user_id"),
+    "files": ("files", "unread_files", "last_read_file_id", "uploaded_by"),
+    "assignments": ("assignments", "unread_assignments", "last_read_assignment_id", None),
+}
+
+def _unread_triggers(table: str, counter: str, watermark: str, author: Optional[str]) -> str:
+    def others(row: str) -> str:
+        return f" AND user_id != {row}.{author}" if author else ""
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_unread_insert AFTER INSERT ON {table}
+    BEGIN
+        UPDATE section_reads SET {counter} = {counter} + 1
+        WHERE section_id = NEW.section_id{others("NEW")};
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_unread_delete AFTER DELETE ON {table}
+    BEGIN
+        UPDATE section_reads SET {counter} = {counter} - 1
+        WHERE section_id = OLD.section_id AND {watermark} < OLD.id AND {counter} > 0{others("OLD")};
+    END;
+    """
+
+def _unread_membership_triggers(table: str, member: str, other_table: str, other_member: str) -> str:
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_unread_insert AFTER INSERT ON {table}
+    BEGIN
+        INSERT OR IGNORE INTO section_reads (user_id, section_id, last_read_message_id,
+                                             unread_files, unread_assignments)
+        VALUES (NEW.{member}, NEW.section_id,
+                COALESCE((SELECT MAX(id) FROM messages WHERE section_id = NEW.section_id), 0),
+                (SELECT COUNT(*) FROM files WHERE section_id = NEW.section_id AND uploaded_by != NEW.{member}),
+                (SELECT COUNT(*) FROM assignments WHERE section_id = NEW.section_id));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_unread_delete AFTER DELETE ON {table}
+    BEGIN
+        DELETE FROM section_reads
+        WHERE user_id = OLD.{member} AND section_id = OLD.section_id
+          AND NOT EXISTS (SELECT 1 FROM {other_table}
+                          WHERE {other_member} = OLD.{member} AND section_id = OLD.section_id);
+    END;
+    """
+
+_UNREAD_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS section_reads (
+        user_id INTEGER NOT NULL,
+        section_id INTEGER NOT NULL,
+        last_read_message_id INTEGER NOT NULL DEFAULT 0,
+        last_read_file_id INTEGER NOT NULL DEFAULT 0,
+        last_read_assignment_id INTEGER NOT NULL DEFAULT 0,
+        unread_messages INTEGER NOT NULL DEFAULT 0,
+        unread_files INTEGER NOT NULL DEFAULT 0,
+        unread_assignments INTEGER NOT NULL DEFAULT 0,
+        last_read_at DATETIME,
+        PRIMARY KEY (user_id, section_id),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (section_id) REFERENCES sections(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+
+    -- Fan-out from the activity triggers
+    CREATE INDEX IF NOT EXISTS idx_section_reads_section ON section_reads(section_id, user_id);
+    -- Latest file id of a section, for mark_section_read
+    CREATE INDEX IF NOT EXISTS idx_files_section_id ON files(section_id, id);
+
+    {"".join(_unread_triggers(*spec) for spec in UNREAD_KINDS.values())}
+    {_unread_membership_triggers("student_sections", "student_id", "teacher_sections", "teacher_id")}
+    {_unread_membership_triggers("teacher_sections", "teacher_id", "student_sections", "student_id")}
+"""
+
+_SECTION_MEMBERS = """
+    SELECT student_id AS user_id, section_id FROM student_sections
+    UNION
+    SELECT teacher_id, section_id FROM teacher_sections
+"""
+
+def _latest_id(table: str, section: str) -> str:
+    return f"COALESCE((SELECT MAX(id) FROM {table} WHERE section_id = {section}), 0)"
+
+def _backfill_section_reads(conn: sqlite3.Connection):
+    """Add a caught-up row for every membership that has none"""
+    watermarks = ", ".join(spec[2] for spec in UNREAD_KINDS.values())
+    latest = ", ".join(_latest_id(spec[0], "m.section_id") for spec in UNREAD_KINDS.values())
+    conn.execute(f"""
+        INSERT OR IGNORE INTO section_reads (user_id, section_id, {watermarks})
+        SELECT m.user_id, m.section_id, {latest} FROM ({_SECTION_MEMBERS}) m
+    """)
+
+def _rebuild_unread_counters(conn: sqlite3.Connection):
+    _backfill_section_reads(conn)
+    conn.execute(f"DELETE FROM section_reads WHERE (user_id, section_id) NOT IN ({_SECTION_MEMBERS})")
+    counts = ", ".join(
+        f"{counter} = (SELECT COUNT(*) FROM {table} t WHERE t.section_id = section_reads.section_id"
+        f" AND t.id > section_reads.{watermark}"
+        + (f" AND t.{author} != section_reads.user_id)" if author else ")")
+        for table, counter, watermark, author in UNREAD_KINDS.values()
+    )
+    conn.execute(f"UPDATE section_reads SET {counts}")
+
+def rebuild_unread_counters() -> bool:
+    """Recount every unread counter from the read watermarks"""
     conn = get_db_connection()
     try:
-        conn.execute(
-            """INSERT INTO recommendation_topics 
-            (topic_name, section_id, created_by) 
-            VALUES (?, ?, ?)""",
-            (topic_name.strip(), section_id, created_by)
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild_unread_counters(conn)
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Unread counter rebuild error: {e}")
+        return False
+    finally:
+        conn.close()
+
+def mark_section_read(user_id: int, section_id: int, kinds: Optional[List[str]] = None) -> bool:
+    """Reset a member's unread counters for a section (all kinds by default).
+
+    Call it when the user opens the section; nothing is written if the
+    counters are already zero.
+    """
+    specs = [UNREAD_KINDS[kind] for kind in (kinds or UNREAD_KINDS)]
+    conn = get_db_connection()
+    try:
+        row = conn.execute(
+            f"SELECT {', '.join(spec[1] for spec in specs)} FROM section_reads WHERE user_id = ? AND section_id = ?",
+            (user_id, section_id)
+        ).fetchone()
+        if row is None:
+            return False
+        if not any(row):
+            return True
+        updates = ", ".join(
+            f"{watermark} = {_latest_id(table, ':section_id')}, {counter} = 0"
+            for table, counter, watermark, _ in specs
         )
+        conn.execute(f"""
+            UPDATE section_reads SET {updates}, last_read_at = CURRENT_TIMESTAMP
+            WHERE user_id = :user_id AND section_id = :section_id
+        """, {"user_id": user_id, "section_id": section_id})
         conn.commit()
         return True
-    except sqlite3.IntegrityError:
-        return False  # Topic already exists
+    except sqlite3.Error as e:
+        print(f"Mark read error: {e}")
+        return False
     finally:
         conn.close()
 
-def get_section_topics(section_id: int) -> List[Dict]:
-    """Get all topics for a section"""
+def get_unread_badges(user_id: int) -> Dict[int, Dict]:
+    """Unread message/file/assignment counts for each of a user's sections, keyed by section id"""
     conn = get_db_connection()
-    topics = conn.execute(
-        """SELECT t.id, t.topic_name, u.username as created_by 
-        FROM recommendation_topics t
-        JOIN users u ON t.created_by = u.id
-        WHERE section_id = ?""",
-        (section_id,)
-    ).fetchall()
+    rows = conn.execute("""
+        SELECT section_id, unread_messages, unread_files, unread_assignments, last_read_at
+        FROM section_reads WHERE user_id = ?
+    """, (user_id,)).fetchall()
     conn.close()
-    return [dict(topic) for topic in topics]
+    badges = {}
+    for row in rows:
+        badge = dict(row)
+        badge["total"] = row["unread_messages"] + row["unread_files"] + row["unread_assignments"]
+        badges[badge.pop("section_id")] = badge
+    return badges
+
+# ================== Search ==================
+# messages_fts and files_fts are external-content FTS5 indexes over
+# messages.content and files.filename: they store only the index and read
+# the text back from the base tables. section_id is indexed as a token too,
+# so a search limited to a few sections only walks those sections' postings.
+# Triggers keep both indexes in step with every insert, update and delete.
+
+SEARCH_RESULT_LIMIT = 20
+# Only the most recent matches are ranked, so very common words stay fast
+SEARCH_CANDIDATES = 5000
+# Above this many sections, filtering by join is cheaper than in the index
+SEARCH_SECTION_FILTER_MAX = 32
+SNIPPET_TOKENS = 12
+
+def _search_triggers(table: str, column: str) -> str:
+    index = f"{table}_fts"
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_insert AFTER INSERT ON {table}
+    BEGIN
+        INSERT INTO {index} (rowid, {column}, section_id) VALUES (NEW.id, NEW.{column}, NEW.section_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_delete AFTER DELETE ON {table}
+    BEGIN
+        INSERT INTO {index} ({index}, rowid, {column}, section_id)
+        VALUES ('delete', OLD.id, OLD.{column}, OLD.section_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_update AFTER UPDATE OF {column}, section_id ON {table}
+    BEGIN
+        INSERT INTO {index} ({index}, rowid, {column}, section_id)
+        VALUES ('delete', OLD.id, OLD.{column}, OLD.section_id);
+        INSERT INTO {index} (rowid, {column}, section_id) VALUES (NEW.id, NEW.{column}, NEW.section_id);
+    END;
+    """
 
-def add_video_recommendation(topic_id: int, video_url: str, student_id: int, title: str) -> bool:
-    """Add a video recommendation to a topic"""
+_SEARCH_SCHEMA = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, section_id, content='messages', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+        filename, section_id, content='files', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+
+    {_search_triggers("messages", "content")}
+    {_search_triggers("files", "filename")}
+"""
+
+# index -> (searched column, hit query); bm25 ignores the section_id column
+_SEARCH_SOURCES = {
+    "messages_fts": ("content", f"""
+        SELECT 'message' AS kind, m.id, m.section_id, m.user_id, u.username,
+               m.timestamp AS created_at,
+               snippet(messages_fts, 0, '**', '**', '…', {SNIPPET_TOKENS}) AS snippet,
+               bm25(messages_fts, 1.0, 0.0) AS score
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        LEFT JOIN users u ON u.id = m.user_id
+        WHERE messages_fts MATCH ? AND messages_fts.rowid >= ? AND m.section_id IN ({{sections}})
+        ORDER BY score
+        LIMIT ?
+    """),
+    "files_fts": ("filename", """
+        SELECT 'file' AS kind, f.id, f.section_id, f.uploaded_by AS user_id, u.username,
+               f.uploaded_at AS created_at,
+               highlight(files_fts, 0, '**', '**') AS snippet,
+               bm25(files_fts, 1.0, 0.0) AS score
+        FROM files_fts
+        JOIN files f ON f.id = files_fts.rowid
+        LEFT JOIN users u ON u.id = f.uploaded_by
+        WHERE files_fts MATCH ? AND files_fts.rowid >= ? AND f.section_id IN ({sections})
+        ORDER BY score
+        LIMIT ?
+    """),
+}
+
+def _rebuild_search_index(conn: sqlite3.Connection):
+    for index in _SEARCH_SOURCES:
+        conn.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+
+def rebuild_search_index() -> bool:
+    """Re-index every message and file name from the base tables"""
     conn = get_db_connection()
     try:
-        conn.execute(
-            """INSERT INTO video_recommendations 
-            (topic_id, video_url, added_by, title) 
-            VALUES (?, ?, ?, ?)""",
-            (topic_id, video_url.strip(), student_id, title)
-        )
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild_search_index(conn)
         conn.commit()
         return True
+    except sqlite3.Error as e:
+        print(f"Search rebuild error: {e}")
+        return False
     finally:
         conn.close()
 
-def get_topic_recommendations(topic_id: int) -> List[Dict]:
-    """Get all recommendations for a topic"""
+def _fts_terms(text: str) -> Optional[str]:
+    """Turn free text into FTS5 terms: every word must match, the last as a prefix.
+
+    Words are quoted so operators and punctuation typed by users (AND, NEAR,
+    quotes, colons, ...) are never interpreted as query syntax.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+def search(section_ids: List[int], query: str, limit: int = SEARCH_RESULT_LIMIT) -> List[Dict]:
+    """Full-text search over chat messages and file names in the given sections.
+
+    Returns the best matches first as dicts with kind ("message" or "file"),
+    id, section_id, user_id, username, created_at, snippet (matches wrapped
+    in ** for markdown) and score (bm25, lower is better).
+    """
+    terms = _fts_terms(query)
+    section_ids = [int(section_id) for section_id in section_ids]
+    if terms is None or not section_ids:
+        return []
+
+    section_filter = ""
+    if len(section_ids) <= SEARCH_SECTION_FILTER_MAX:
+        section_filter = " AND section_id : (" + " OR ".join(f'"{s}"' for s in section_ids) + ")"
+    placeholders = ", ".join("?" * len(section_ids))
+
     conn = get_db_connection()
-    recommendations = conn.execute(
-        """SELECT v.id, v.video_url, v.title, u.username as added_by 
-        FROM video_recommendations v
-        JOIN users u ON v.added_by = u.id
-        WHERE topic_id = ?""",
-        (topic_id,)
-    ).fetchall()
+    try:
+        hits = []
+        for index, (column, hit_query) in _SEARCH_SOURCES.items():
+            match = f"{column} : ({terms}){section_filter}"
+            # Rank the newest SEARCH_CANDIDATES matches rather than all of them
+            cutoff = conn.execute(
+                f"SELECT rowid FROM {index} WHERE {index} MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                (match, SEARCH_CANDIDATES - 1)
+            ).fetchone()
+            hits.extend(conn.execute(
+                hit_query.format(sections=placeholders),
+                (match, cutoff[0] if cutoff else 0, *section_ids, limit)
+            ).fetchall())
+        hits.sort(key=lambda hit: hit["score"])
+        return [dict(hit) for hit in hits[:limit]]
+    except sqlite3.Error as e:
+        print(f"Search error: {e}")
+        return []
+    finally:
+        conn.close()
+
+# ================== Payload Compression ==================
+def compress_stored_files(dry_run: bool = False) -> Dict[str, int]:
+    """Re-encode stored payloads whose codec differs from payload_codec() (one-shot migration).
+
+    Each payload is recompressed outside any lock, then swapped in under a
+    short write transaction. Returns counts and byte totals before/after.
+    """
+    store = get_blob_store()
+    conn = get_db_connection()
+    stats = {"payloads": 0, "recoded": 0, "kept": 0, "bytes_before": 0, "bytes_after": 0}
+    try:
+        payloads = conn.execute("""
+            SELECT content_hash, codec, MIN(filename) AS filename, MIN(file_type) AS file_type,
+                   MAX(stored_size) AS stored_size
+            FROM files
+            WHERE content_hash IS NOT NULL
+            GROUP BY content_hash, codec
+        """).fetchall()
+        for payload in payloads:
+            content_hash, codec = payload["content_hash"], payload["codec"]
+            target = payload_codec(payload["filename"], payload["file_type"])
+            stats["payloads"] += 1
+            stats["bytes_before"] += payload["stored_size"] or 0
+            if target == codec or not store.exists(content_hash, codec):
+                stats["kept"] += 1
+                stats["bytes_after"] += payload["stored_size"] or 0
+                continue
+
+            staged = store.recode(content_hash, codec, target)
+            worthwhile = staged.codec == target
+            if dry_run or not worthwhile:
+                # Just measuring, or the target codec doesn't pay off; leave it as it is
+                store.discard(staged)
+                stats["kept"] += 1
+                stats["bytes_after"] += staged.stored_size if dry_run and worthwhile else payload["stored_size"] or 0
+                continue
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                store.publish(staged)
+                conn.execute(
+                    "UPDATE files SET codec = ?, stored_size = ? WHERE content_hash = ? AND codec = ?",
+                    (staged.codec, staged.stored_size, content_hash, codec)
+                )
+                # Drop the old copy while holding the lock, so no upload can
+                # find it and record the codec we are about to remove
+                store.delete(content_hash, codec)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                store.discard(staged)
+                raise
+            stats["recoded"] += 1
+            stats["bytes_after"] += staged.stored_size
+        return stats
+    finally:
+        conn.close()
+
+# ================== Background Jobs ==================
+# A durable queue for work that must not run on a Streamlit rerun. Workers
+# (job_worker.py) claim jobs under a lease they keep extending while the job
+# runs; a job whose worker died is picked up again once its lease expires.
+# Failed jobs are retried with exponential backoff up to max_attempts.
+
+JOB_LEASE_SECONDS = 60
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_SECONDS = 30
+JOB_RETRY_MAX_SECONDS = 3600
+PDF_TEXT_JOB = "pdf_text"
+
+_JOB_QUEUE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL DEFAULT '{}',
+        dedupe_key TEXT,
+        status TEXT NOT NULL DEFAULT 'queued',  -- queued, running, done, failed
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        run_after REAL NOT NULL,                -- unix time
+        lease_owner TEXT,
+        lease_expires REAL,                     -- unix time
+        last_error TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        finished_at DATETIME
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, run_after);
+    CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(status, lease_expires);
+    CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key);
+
+    CREATE TABLE IF NOT EXISTS pdf_pages (
+        content_hash TEXT NOT NULL,
+        page_number INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (content_hash, page_number)
+    ) WITHOUT ROWID;
+"""
+
+_PDF_FILE_FILTER = "(lower(file_type) = 'pdf' OR lower(filename) LIKE '%.pdf')"
+
+def _is_pdf(filename: str, file_type: str) -> bool:
+    return (file_type or "").lower() == "pdf" or (filename or "").lower().endswith(".pdf")
+
+def _enqueue_job(conn: sqlite3.Connection, kind: str, payload: Dict, dedupe_key: Optional[str] = None,
+                 delay: float = 0.0, max_attempts: int = JOB_MAX_ATTEMPTS) -> Optional[int]:
+    """Queue a job inside the caller's transaction; skipped if the same job is already pending"""
+    if dedupe_key and conn.execute(
+        "SELECT 1 FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running') LIMIT 1",
+        (dedupe_key,)
+    ).fetchone():
+        return None
+    cursor = conn.execute(
+        "INSERT INTO jobs (kind, payload, dedupe_key, max_attempts, run_after) VALUES (?, ?, ?, ?, ?)",
+        (kind, json.dumps(payload), dedupe_key, max_attempts, time.time() + delay)
+    )
+    return cursor.lastrowid
+
+def _enqueue_pdf_text(conn: sqlite3.Connection, content_hash: str) -> Optional[int]:
+    # Identical uploads share a payload, so their text is extracted once
+    if conn.execute("SELECT 1 FROM pdf_pages WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone():
+        return None
+    return _enqueue_job(conn, PDF_TEXT_JOB, {"content_hash": content_hash},
+                        dedupe_key=f"{PDF_TEXT_JOB}:{content_hash}")
+
+def enqueue_job(kind: str, payload: Dict, dedupe_key: Optional[str] = None, delay: float = 0.0) -> Optional[int]:
+    """Queue a background job; returns its id, or None if an identical job is pending"""
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        job_id = _enqueue_job(conn, kind, payload, dedupe_key, delay)
+        conn.commit()
+        return job_id
+    except sqlite3.Error as e:
+        print(f"Enqueue error: {e}")
+        return None
+    finally:
+        conn.close()
+
+def _kind_filter(kinds: Optional[List[str]]) -> Tuple[str, list]:
+    if not kinds:
+        return "", []
+    return f" AND kind IN ({', '.join('?' * len(kinds))})", list(kinds)
+
+def claim_jobs(owner: str, limit: int = 1, kinds: Optional[List[str]] = None,
+               lease_seconds: float = JOB_LEASE_SECONDS) -> List[Dict]:
+    """Lease up to limit runnable jobs to owner; payloads come back decoded"""
+    kind_sql, kind_params = _kind_filter(kinds)
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        # Jobs whose worker died on the last attempt are not retried again
+        conn.execute(f"""
+            UPDATE jobs SET status = 'failed', lease_owner = NULL, finished_at = CURRENT_TIMESTAMP,
+                   last_error = COALESCE(last_error, 'lease expired')
+            WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts{kind_sql}
+        """, (now, *kind_params))
+        rows = conn.execute(f"""
+            UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM jobs WHERE status = 'queued' AND run_after <= ?{kind_sql}
+                UNION ALL
+                SELECT id FROM jobs WHERE status = 'running' AND lease_expires < ?{kind_sql}
+                LIMIT ?
+            )
+            RETURNING id, kind, payload, attempts, max_attempts
+        """, (owner, now + lease_seconds, now, *kind_params, now, *kind_params, limit)).fetchall()
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Claim error: {e}")
+        return []
+    finally:
+        conn.close()
+
+    jobs = []
+    for row in rows:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        jobs.append(job)
+    return jobs
+
+def heartbeat_jobs(owner: str, job_ids: List[int], lease_seconds: float = JOB_LEASE_SECONDS) -> int:
+    """Extend the lease on jobs owner is still running; returns how many it still holds"""
+    if not job_ids:
+        return 0
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            f"UPDATE jobs SET lease_expires = ? WHERE lease_owner = ? AND status = 'running' "
+            f"AND id IN ({', '.join('?' * len(job_ids))})",
+            (time.time() + lease_seconds, owner, *job_ids)
+        )
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+def complete_job(job_id: int, owner: str) -> bool:
+    """Mark a leased job done"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires = NULL,
+                   finished_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND lease_owner = ? AND status = 'running'
+        """, (job_id, owner))
+        conn.commit()
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+def fail_job(job_id: int, owner: str, error: str) -> bool:
+    """Record a failed attempt; the job is retried with exponential backoff until max_attempts"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            UPDATE jobs SET
+                status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                finished_at = CASE WHEN attempts >= max_attempts THEN CURRENT_TIMESTAMP END,
+                run_after = ? + MIN(? * (1 << (attempts - 1)), ?),
+                lease_owner = NULL, lease_expires = NULL, last_error = ?
+            WHERE id = ? AND lease_owner = ? AND status = 'running'
+        """, (time.time(), JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS, error[:2000], job_id, owner))
+        conn.commit()
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+def release_jobs(owner: str) -> int:
+    """Hand back every job owner still holds without counting the attempt (worker shutdown)"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0),
+                   lease_owner = NULL, lease_expires = NULL
+            WHERE lease_owner = ? AND status = 'running'
+        """, (owner,))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+def retry_failed_jobs(kind: Optional[str] = None) -> int:
+    """Queue failed jobs again with a fresh attempt budget"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'queued', attempts = 0, run_after = ?, finished_at = NULL "
+            "WHERE status = 'failed'" + (" AND kind = ?" if kind else ""),
+            (time.time(), kind) if kind else (time.time(),)
+        )
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+def get_job_counts() -> Dict[str, int]:
+    """Number of jobs per status"""
+    conn = get_db_connection()
+    rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
     conn.close()
-    return [dict(rec) for rec in recommendations]
+    return {row[0]: row[1] for row in rows}
 
-# Add these table creations to init_db() function
-def get_student_section_files(student_id: int, file_type: str = None) -> List[Dict]:
-    """Get all PDFs or videos for the student's assigned sections"""
+def save_pdf_pages(content_hash: str, pages: List[Tuple[int, str]]):
+    """Store extracted text for some pages of a PDF payload (idempotent)"""
+    conn = get_db_connection()
+    try:
+        conn.executemany(
+            "INSERT OR REPLACE INTO pdf_pages (content_hash, page_number, text) VALUES (?, ?, ?)",
+            [(content_hash, page_number, text) for page_number, text in pages]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_pdf_pages(file_id: int) -> List[Dict]:
+    """Extracted text of a PDF, one dict per page; empty until the worker has run"""
     conn = get_db_connection()
-    query = """
-        SELECT f.filename, f.file_path, f.uploaded_at
+    pages = conn.execute("""
+        SELECT p.page_number, p.text
         FROM files f
-        JOIN student_sections ss ON f.section_id = ss.section_id
-        WHERE ss.student_id = ?
-    """
-    params = [student_id]
-    
-    if file_type:
-        query += " AND f.file_type = ?"
-        params.append(file_type)
-    
-    files = conn.execute(query, params).fetchall()
+        JOIN pdf_pages p ON p.content_hash = f.content_hash
+        WHERE f.id = ?
+        ORDER BY p.page_number
+    """, (file_id,)).fetchall()
     conn.close()
-    return [dict(file) for file in files]
+    return [dict(page) for page in pages]
+
+def get_pdf_text_status(file_id: int) -> Optional[str]:
+    """Extraction status of a PDF: queued, running, done, failed, or None if never queued"""
+    conn = get_db_connection()
+    row = conn.execute("""
+        SELECT j.status
+        FROM files f
+        JOIN jobs j ON j.dedupe_key = ? || f.content_hash
+        WHERE f.id = ?
+        ORDER BY j.id DESC
+        LIMIT 1
+    """, (f"{PDF_TEXT_JOB}:", file_id)).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+# ================== Thumbnails ==================
+# Rendered page images (see thumbnails.py) cached per payload hash, so a
+# listing reads one small row per file instead of parsing each PDF. The
+# cache is bounded by THUMBNAIL_CACHE_MAX_BYTES and evicts least recently
+# used entries; an evicted or missing thumbnail is simply rendered again.
+
+THUMBNAIL_JOB = "pdf_thumbnails"
+THUMBNAIL_PREVIEW = "preview"   # first page, listing size
+THUMBNAIL_PAGE = "page"         # every page, small
+THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get("SMART_CLASSROOM_THUMBNAIL_CACHE_BYTES", 256 * 1024 * 1024))
+# Eviction frees space down to this fraction of the budget
+THUMBNAIL_CACHE_LOW_WATER = 0.9
+# last_used is refreshed at most this often, so reads rarely write
+THUMBNAIL_TOUCH_SECONDS = 3600
+
+_THUMBNAIL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS thumbnails (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content_hash TEXT NOT NULL,
+        variant TEXT NOT NULL,
+        page_number INTEGER NOT NULL,
+        format TEXT NOT NULL,
+        width INTEGER NOT NULL,
+        height INTEGER NOT NULL,
+        byte_size INTEGER NOT NULL,
+        last_used REAL NOT NULL,
+        data BLOB NOT NULL,  -- last, so reading the other columns skips the image
+        UNIQUE(content_hash, variant, page_number)
+    );
+    CREATE INDEX IF NOT EXISTS idx_thumbnails_lru ON thumbnails(last_used, byte_size);
+"""
+
+def _enqueue_thumbnails(conn: sqlite3.Connection, content_hash: str,
+                        variant: str = THUMBNAIL_PREVIEW) -> Optional[int]:
+    return _enqueue_job(conn, THUMBNAIL_JOB, {"content_hash": content_hash, "variant": variant},
+                        dedupe_key=f"{THUMBNAIL_JOB}:{variant}:{content_hash}")
+
+def _evict_thumbnails(conn: sqlite3.Connection, max_bytes: int):
+    total = conn.execute("SELECT COALESCE(SUM(byte_size), 0) FROM thumbnails").fetchone()[0]
+    if total <= max_bytes:
+        return
+    target = total - int(max_bytes * THUMBNAIL_CACHE_LOW_WATER)
+    freed, victims = 0, []
+    for row in conn.execute("SELECT id, byte_size FROM thumbnails ORDER BY last_used"):
+        if freed >= target:
+            break
+        victims.append((row[0],))
+        freed += row[1]
+    conn.executemany("DELETE FROM thumbnails WHERE id = ?", victims)
+
+def save_thumbnails(content_hash: str, variant: str, images: List[Dict],
+                    max_bytes: Optional[int] = None):
+    """Cache rendered images (dicts of page_number, format, width, height, data) and evict to budget"""
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("""
+            INSERT OR REPLACE INTO thumbnails
+            (content_hash, variant, page_number, format, width, height, byte_size, last_used, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (content_hash, variant, image["page_number"], image["format"], image["width"],
+             image["height"], len(image["data"]), now, image["data"])
+            for image in images
+        ])
+        _evict_thumbnails(conn, THUMBNAIL_CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _touch_thumbnails(conn: sqlite3.Connection, rows, now: float):
+    stale = [(now, row["thumbnail_id"]) for row in rows
+             if row["thumbnail_id"] is not None and row["last_used"] < now - THUMBNAIL_TOUCH_SECONDS]
+    if stale:
+        conn.executemany("UPDATE thumbnails SET last_used = ? WHERE id = ?", stale)
+
+def get_thumbnails(file_ids: List[int], variant: str = THUMBNAIL_PREVIEW, page_number: int = 1) -> Dict[int, Dict]:
+    """Cached thumbnails for many files in one query, keyed by file id.
+
+    Each value has format, width, height and data (image bytes). PDFs with
+    no cached thumbnail are queued for rendering and left out of the result.
+    """
+    file_ids = list(file_ids)
+    if not file_ids:
+        return {}
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(f"""
+            SELECT f.id AS file_id, f.filename, f.file_type, f.content_hash,
+                   t.id AS thumbnail_id, t.format, t.width, t.height, t.last_used, t.data
+            FROM files f
+            LEFT JOIN thumbnails t
+              ON t.content_hash = f.content_hash AND t.variant = ? AND t.page_number = ?
+            WHERE f.id IN ({', '.join('?' * len(file_ids))})
+        """, (variant, page_number, *file_ids)).fetchall()
+
+        missing = {row["content_hash"] for row in rows
+                   if row["thumbnail_id"] is None and row["content_hash"]
+                   and _is_pdf(row["filename"], row["file_type"])}
+        if missing or any(row["thumbnail_id"] is not None
+                          and row["last_used"] < now - THUMBNAIL_TOUCH_SECONDS for row in rows):
+            conn.execute("BEGIN IMMEDIATE")
+            _touch_thumbnails(conn, rows, now)
+            for content_hash in missing:
+                _enqueue_thumbnails(conn, content_hash, variant)
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"Thumbnail read error: {e}")
+        return {}
+    finally:
+        conn.close()
+
+    return {
+        row["file_id"]: {"format": row["format"], "width": row["width"],
+                         "height": row["height"], "data": row["data"]}
+        for row in rows if row["thumbnail_id"] is not None
+    }
+
+def get_thumbnail(file_id: int, variant: str = THUMBNAIL_PREVIEW, page_number: int = 1) -> Optional[Dict]:
+    """Cached thumbnail of one page of a file, or None until it has been rendered"""
+    return get_thumbnails([file_id], variant, page_number).get(file_id)
+
+def get_page_thumbnails(file_id: int) -> List[Dict]:
+    """Small thumbnails of every page of a PDF; queues rendering the first time"""
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT f.content_hash, t.id AS thumbnail_id, t.page_number, t.format,
+                   t.width, t.height, t.last_used, t.data
+            FROM files f
+            LEFT JOIN thumbnails t ON t.content_hash = f.content_hash AND t.variant = ?
+            WHERE f.id = ?
+            ORDER BY t.page_number
+        """, (THUMBNAIL_PAGE, file_id)).fetchall()
+        if rows and (rows[0]["thumbnail_id"] is None or any(
+                row["last_used"] < now - THUMBNAIL_TOUCH_SECONDS for row in rows)):
+            conn.execute("BEGIN IMMEDIATE")
+            if rows[0]["thumbnail_id"] is None:
+                if rows[0]["content_hash"]:
+                    _enqueue_thumbnails(conn, rows[0]["content_hash"], THUMBNAIL_PAGE)
+            else:
+                _touch_thumbnails(conn, rows, now)
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"Thumbnail read error: {e}")
+        return []
+    finally:
+        conn.close()
+
+    return [
+        {key: row[key] for key in ("page_number", "format", "width", "height", "data")}
+        for row in rows if row["thumbnail_id"] is not None
+    ]
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    parser.add_argument("command", nargs="?", default="migrate",
+                        choices=["migrate", "rebuild-summaries", "check-summaries", "rebuild-search",
+                                 "compress-files", "rebuild-unread"])
+    parser.add_argument("--dry-run", action="store_true", help="compress-files: only report the savings")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "rebuild-summaries":
+        print("Grade summaries rebuilt" if rebuild_grade_summaries() else "Rebuild failed")
+    elif args.command == "check-summaries":
+        mismatches = check_grade_summaries()
+        for mismatch in mismatches[:20]:
+            print(mismatch)
+        print(f"{len(mismatches)} summary mismatches")
+    elif args.command == "rebuild-search":
+        print("Search index rebuilt" if rebuild_search_index() else "Rebuild failed")
+    elif args.command == "rebuild-unread":
+        print("Unread counters rebuilt" if rebuild_unread_counters() else "Rebuild failed")
+    elif args.command == "compress-files":
+        stats = compress_stored_files(dry_run=args.dry_run)
+        ratio = stats["bytes_after"] / stats["bytes_before"] if stats["bytes_before"] else 1.0
+        print(f"{stats['recoded']} of {stats['payloads']} payloads recompressed, "
+              f"{stats['bytes_before']} -> {stats['bytes_after']} bytes ({ratio:.1%})")
+    else:
+        conn = get_db_connection()
+        print(f"Database initialized successfully! (schema version {get_schema_version(conn)})")
+        conn.close()
@@ -0,0 +1,498 @@
+# db_benchmark.py
+"""Times every public database.py function at several data scales.
+
+Each scale's dataset is generated once with synthetic_data.py and cached in
+--data-dir (keyed by scale, seed and schema version). Every run works on a
+fresh copy, so write benchmarks never change the cached data. Each function
+is called repeatedly with ids sampled from the data, until MAX_RUNS calls or
+BUDGET_SECONDS have been spent (at least MIN_RUNS calls). Argument setup is
+not timed, and the reference cache is cleared before every call, so cached
+lookups are measured as misses.
+
+Results go to a JSON file. Given a baseline (the JSON of an earlier run),
+functions whose median and fastest call both got slower by more than
+--threshold are reported as regressions, and the exit status is 1.
+
+    python db_benchmark.py --scales 1k 100k
+    python db_benchmark.py --update-baseline          # store this run as the baseline
+    python db_benchmark.py --only "get_*" --scales 1m
+
+Public functions with no case (and not in NOT_BENCHMARKED) are listed as
+"not covered", so new data-layer functions get noticed.
+"""
+import argparse
+import fnmatch
+import inspect
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import database
+import synthetic_data
+
+DEFAULT_SCALES = ("1k", "100k", "1m")
+DATA_DIR = os.path.join(tempfile.gettempdir(), "smart_classroom_bench")
+RESULTS_PATH = "db_benchmark_results.json"
+BASELINE_PATH = "db_benchmark_baseline.json"
+MIN_RUNS = 3
+MAX_RUNS = 30
+BUDGET_SECONDS = 1.0
+# Full-table maintenance functions get fewer calls
+SLOW_RUNS = 3
+# A median this much slower than the baseline (and by at least MIN_DELTA_MS) is a regression
+REGRESSION_THRESHOLD = 0.25
+MIN_DELTA_MS = 0.2
+SAMPLE_SIZE = 50
+# Rows reserved for the delete benchmarks
+DELETE_POOL = MAX_RUNS
+UPLOAD_SIZE = 64 * 1024
+BENCH_JOB = "benchmark"
+BENCH_OWNER = "benchmark-worker"
+
+# Plumbing rather than queries: connection handling, migrations, hooks, cache helpers
+NOT_BENCHMARKED = {
+    "add_connection_hook", "remove_connection_hook", "get_pool", "get_db_connection",
+    "close_all_connections", "get_schema_version", "migrate", "get_blob_store", "init_db",
+    "cached_query", "invalidate_cache", "clear_cache", "get_cache_stats",
+    "add_message_listener", "remove_message_listener",
+}
+
+GRADES_SQL = "SELECT student_id, subject, grade, assignment_date FROM grades WHERE student_id = ?"
+
+# ================== Workload ==================
+class Workload:
+    """Ids sampled from the benchmark database, handed out to the cases"""
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self._serial = 0
+        self._cache = {}
+        conn = database.get_db_connection()
+        try:
+            self.doomed_students = [row[0] for row in conn.execute(
+                "SELECT id FROM users WHERE role = 'Student' ORDER BY id DESC LIMIT ?", (DELETE_POOL,))]
+            doomed = set(self.doomed_students)
+            students = [tuple(row) for row in conn.execute(
+                "SELECT id, username FROM users WHERE role = 'Student' ORDER BY id") if row[0] not in doomed]
+            self.rng.shuffle(students)
+            self.students = students[:SAMPLE_SIZE]
+            self.student_sections = {}
+            for student_id, section_id in conn.execute(
+                f"SELECT student_id, section_id FROM student_sections WHERE student_id IN "
+                f"({', '.join('?' * len(self.students))})", [s[0] for s in self.students]
+            ):
+                self.student_sections.setdefault(student_id, []).append(section_id)
+
+            self.section_teacher = dict(conn.execute(
+                "SELECT section_id, MIN(teacher_id) FROM teacher_sections GROUP BY section_id").fetchall())
+            self.sections = sorted(self.section_teacher)
+            self.teachers = sorted(set(self.section_teacher.values()))
+            self.section_subjects = {}
+            for section_id, subject in conn.execute("SELECT section_id, subject_name FROM subjects"):
+                self.section_subjects.setdefault(section_id, []).append(subject)
+            self.topics = [row[0] for row in conn.execute("SELECT id FROM recommendation_topics")]
+
+            files = [dict(row) for row in conn.execute(
+                "SELECT id, uploaded_by, content_hash, file_type FROM files ORDER BY id")]
+            self.files = files
+            self.pdfs = [f for f in files if f["file_type"] == "pdf"] or files
+
+            def id_pool(table: str, size: int) -> List[int]:
+                low, high = conn.execute(f"SELECT MIN(id), MAX(id) FROM {table}").fetchone()
+                return self.rng.sample(range(low, high + 1), min(size, high - low + 1)) if low else []
+            self.grades = id_pool("grades", SAMPLE_SIZE + DELETE_POOL)
+            self.doomed_grades = self.grades[SAMPLE_SIZE:]
+            self.grades = self.grades[:SAMPLE_SIZE]
+            self.doomed_messages = id_pool("messages", DELETE_POOL)
+            last_message = conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+            # Roughly the last 50 messages of each section
+            self.recent_message_id = max(0, last_message - 50 * len(self.sections))
+        finally:
+            conn.close()
+        self.upload = self.rng.randbytes(UPLOAD_SIZE)
+
+    def choice(self, items):
+        return self.rng.choice(items)
+
+    def unique(self, prefix: str) -> str:
+        self._serial += 1
+        return f"bench_{prefix}_{self._serial}"
+
+    def take(self, pool: List[int], fallback: Callable[[], int]) -> int:
+        return pool.pop() if pool else fallback()
+
+    def cached(self, key: str, build: Callable):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def student(self) -> int:
+        return self.choice(self.students)[0]
+
+    def section(self) -> int:
+        return self.choice(self.sections)
+
+    def member(self) -> tuple:
+        """A (student_id, section_id) pair from student_sections"""
+        student = self.student()
+        return student, self.choice(self.student_sections[student])
+
+    def teacher_section(self) -> tuple:
+        section = self.section()
+        return self.section_teacher[section], section
+
+    def new_user(self, role: str) -> int:
+        username = self.unique(role.lower())
+        database.add_user(username, "pw", role)
+        return database.get_user(username)["id"]
+
+    def new_payload(self) -> bytes:
+        # Distinct bytes each time, so uploads are not deduplicated
+        return self.unique("payload").encode() + self.upload
+
+    def new_file(self) -> tuple:
+        teacher, section = self.teacher_section()
+        return database.add_file_stream(self.unique("upload") + ".pdf", "pdf", self.new_payload(), teacher, section), teacher
+
+    def new_job(self, claim: bool = True) -> int:
+        """Queue a job (and lease it to BENCH_OWNER); returns its id"""
+        job_id = database.enqueue_job(BENCH_JOB, {"n": self._serial})
+        if claim:
+            # Earlier cases leave unclaimed jobs behind; lease until this one comes up
+            while True:
+                claimed = database.claim_jobs(BENCH_OWNER, 100, [BENCH_JOB])
+                if not claimed or any(job["id"] == job_id for job in claimed):
+                    break
+        return job_id
+
+    def trend_rows(self) -> List[tuple]:
+        conn = database.get_db_connection()
+        try:
+            return [
+                (row[0], row[1], row[2], row[3], 0.0, 0.0, row[4], row[4], 0, 0)
+                for row in conn.execute("""
+                    SELECT student_id, subject, grade_count, grade_sum / grade_count, latest_assignment_date
+                    FROM grade_summary_student
+                """)
+            ]
+        finally:
+            conn.close()
+
+    def new_subject(self) -> tuple:
+        teacher, section = self.teacher_section()
+        name = self.unique("subject")
+        database.create_subject(name, section, teacher)
+        conn = database.get_db_connection()
+        try:
+            subject_id = conn.execute("SELECT id FROM subjects WHERE subject_name = ? AND section_id = ?",
+                                      (name, section)).fetchone()[0]
+        finally:
+            conn.close()
+        return subject_id, teacher
+
+# ================== Cases ==================
+class Case:
+    """A benchmarked function: setup(workload) returns its arguments (untimed).
+
+    A False result counts as a failure unless the function is a predicate.
+    """
+
+    def __init__(self, function: str, setup: Callable[[Workload], tuple] = lambda w: (),
+                 max_runs: int = MAX_RUNS, consume: bool = False, predicate: bool = False):
+        self.function = function
+        self.setup = setup
+        self.max_runs = max_runs
+        self.consume = consume
+        self.predicate = predicate
+
+CASES = [
+    # Users and sections
+    Case("add_user", lambda w: (w.unique("user"), "pw", "Student")),
+    Case("get_user", lambda w: (w.choice(w.students)[1],)),
+    Case("get_all_users"),
+    Case("add_section", lambda w: (w.unique("section"),)),
+    Case("get_all_sections"),
+    Case("assign_section_to_teacher", lambda w: (w.new_user("Teacher"), w.section())),
+    Case("assign_section_to_student", lambda w: (w.new_user("Student"), w.section())),
+    Case("get_users_with_sections"),
+    Case("delete_user", lambda w: (w.take(w.doomed_students, lambda: w.new_user("Student")),)),
+    # Files
+    Case("payload_codec", lambda w: ("notes.pdf", "pdf")),
+    Case("add_file_stream", lambda w: (w.unique("upload") + ".pdf", "pdf", w.new_payload(), *w.teacher_section())),
+    Case("add_file", lambda w: (w.unique("upload") + ".pdf", "pdf", w.new_payload(), *w.teacher_section())),
+    Case("get_file", lambda w: (w.choice(w.files)["id"],)),
+    Case("get_file_data", lambda w: (w.choice(w.files)["id"],)),
+    Case("iter_file_data", lambda w: (w.choice(w.files)["id"],), consume=True),
+    Case("get_files_by_type", lambda w: ("pdf",)),
+    Case("get_teacher_sections", lambda w: (w.choice(w.teachers),)),
+    Case("get_student_files", lambda w: (w.student(),)),
+    Case("get_section_files", lambda w: (w.section(),)),
+    Case("get_student_section_files", lambda w: (w.student(),)),
+    Case("user_can_access_file", lambda w: (w.student(), w.choice(w.files)["id"]), predicate=True),
+    Case("delete_file", lambda w: w.new_file()),
+    Case("compress_stored_files", lambda w: (True,), max_runs=SLOW_RUNS),
+    # Grades
+    Case("add_grade", lambda w: (w.member()[0], w.choice(w.section_subjects[w.section()]), 75.0)),
+    Case("get_student_grades", lambda w: (w.student(),)),
+    Case("update_grade", lambda w: (w.choice(w.grades), 80.0)),
+    Case("delete_grade", lambda w: (w.take(w.doomed_grades, lambda: w.choice(w.grades)),)),
+    Case("get_student_subject_grades", lambda w: (w.student(),)),
+    Case("get_section_grades", lambda w: (w.section(),)),
+    Case("get_student_grade_summary", lambda w: (w.student(),)),
+    Case("get_section_grade_summary", lambda w: (w.section(),)),
+    Case("rebuild_grade_summaries", max_runs=SLOW_RUNS),
+    Case("check_grade_summaries", max_runs=SLOW_RUNS),
+    Case("query_arrow", lambda w: (GRADES_SQL, (w.student(),))),
+    Case("query_dataframe", lambda w: (GRADES_SQL, (w.student(),))),
+    Case("get_student_grades_frame", lambda w: (w.student(),)),
+    Case("get_section_grades_arrow", lambda w: (w.section(),)),
+    Case("get_section_grades_frame", lambda w: (w.section(),)),
+    Case("get_student_grade_summary_frame", lambda w: (w.student(),)),
+    Case("replace_grade_trends", lambda w: (w.cached("trend_rows", w.trend_rows),), max_runs=SLOW_RUNS),
+    Case("get_section_grade_trends", lambda w: (w.section(), True)),
+    Case("get_student_grade_trends", lambda w: (w.student(),)),
+    # Assignments, subjects and recommendations
+    Case("create_assignment", lambda w: (w.unique("assignment"), "Read chapter 3", "2026-12-01", w.section())),
+    Case("get_assignments_by_section", lambda w: (w.section(),)),
+    Case("get_student_sections", lambda w: (w.student(),)),
+    Case("get_teacher_section_students", lambda w: (w.choice(w.teachers),)),
+    Case("get_students_by_section", lambda w: (w.section(),)),
+    Case("create_subject", lambda w: (w.unique("subject"), *reversed(w.teacher_section()))),
+    Case("get_section_subjects", lambda w: (w.section(),)),
+    Case("delete_subject", lambda w: w.new_subject()),
+    Case("create_topic", lambda w: (w.unique("topic"), *reversed(w.teacher_section()))),
+    Case("get_section_topics", lambda w: (w.section(),)),
+    Case("add_video_recommendation", lambda w: (w.choice(w.topics), "https://www.youtube.com/watch?v=bench",
+                                                w.student(), "Benchmark video")),
+    Case("get_topic_recommendations", lambda w: (w.choice(w.topics),)),
+    # Chat, unread badges and search
+    Case("save_message", lambda w: (*reversed(w.member()), "benchmark message about the lecture notes")),
+    Case("get_messages", lambda w: (w.section(),)),
+    Case("get_messages_page", lambda w: (w.section(),)),
+    Case("get_messages_since", lambda w: (w.section(), w.recent_message_id)),
+    Case("delete_message", lambda w: (w.take(w.doomed_messages, lambda: 0), 0, "Teacher")),
+    Case("mark_section_read", lambda w: w.member()),
+    Case("get_unread_badges", lambda w: (w.student(),)),
+    Case("rebuild_unread_counters", max_runs=SLOW_RUNS),
+    Case("search", lambda w: (w.student_sections[w.student()], "lecture notes")),
+    Case("rebuild_search_index", max_runs=SLOW_RUNS),
+    # Job queue
+    Case("enqueue_job", lambda w: (BENCH_JOB, {"n": 1})),
+    Case("claim_jobs", lambda w: (w.new_job(claim=False) and BENCH_OWNER, 1, [BENCH_JOB])),
+    Case("heartbeat_jobs", lambda w: (BENCH_OWNER, [w.new_job()])),
+    Case("complete_job", lambda w: (w.new_job(), BENCH_OWNER)),
+    Case("fail_job", lambda w: (w.new_job(), BENCH_OWNER, "benchmark failure")),
+    Case("release_jobs", lambda w: (w.new_job() and BENCH_OWNER,)),
+    Case("retry_failed_jobs", lambda w: (BENCH_JOB,)),
+    Case("get_job_counts"),
+    # PDF text and thumbnails
+    Case("save_pdf_pages", lambda w: (w.choice(w.pdfs)["content_hash"], [(1, "page one text"), (2, "page two text")])),
+    Case("get_pdf_pages", lambda w: (w.choice(w.pdfs)["id"],)),
+    Case("get_pdf_text_status", lambda w: (w.choice(w.pdfs)["id"],)),
+    Case("save_thumbnails", lambda w: (w.choice(w.pdfs)["content_hash"], database.THUMBNAIL_PREVIEW, [
+        {"page_number": 1, "format": "PNG", "width": 160, "height": 220, "data": w.upload[:8192]}])),
+    Case("get_thumbnails", lambda w: ([f["id"] for f in w.files[:20]],)),
+    Case("get_thumbnail", lambda w: (w.choice(w.pdfs)["id"],)),
+    Case("get_page_thumbnails", lambda w: (w.choice(w.pdfs)["id"],)),
+]
+
+def public_functions() -> List[str]:
+    """Public functions defined in database.py"""
+    return sorted(
+        name for name, obj in vars(database).items()
+        if not name.startswith("_") and inspect.isfunction(obj) and obj.__module__ == database.__name__
+    )
+
+def not_covered() -> List[str]:
+    cased = {case.function for case in CASES}
+    return [name for name in public_functions() if name not in cased and name not in NOT_BENCHMARKED]
+
+# ================== Running ==================
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+def time_case(case: Case, workload: Workload, budget: float = BUDGET_SECONDS) -> Dict:
+    """Call a case's function repeatedly and summarise the timings (ms)"""
+    function = getattr(database, case.function)
+    durations = []
+    failures = 0
+    started = time.perf_counter()
+    while len(durations) < case.max_runs and (len(durations) < MIN_RUNS or time.perf_counter() - started < budget):
+        args = case.setup(workload)
+        database.clear_cache()
+        call_started = time.perf_counter()
+        try:
+            result = function(*args)
+            if case.consume:
+                for _ in result:
+                    pass
+        except Exception as e:
+            print(f"{case.function} raised {type(e).__name__}: {e}")
+            result = False
+        durations.append((time.perf_counter() - call_started) * 1000)
+        failures += result is False and not case.predicate
+    ordered = sorted(durations)
+    return {
+        "runs": len(ordered),
+        "failures": failures,
+        "median_ms": round(_percentile(ordered, 50), 4),
+        "p95_ms": round(_percentile(ordered, 95), 4),
+        "min_ms": round(ordered[0], 4),
+        "max_ms": round(ordered[-1], 4),
+    }
+
+def dataset(scale: str, seed: int, data_dir: str) -> Dict:
+    """Generate (or reuse) the cached dataset for a scale; returns its manifest"""
+    folder = os.path.join(data_dir, f"{scale}-seed{seed}-v{database.SCHEMA_VERSION}")
+    manifest_path = os.path.join(folder, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    print(f"Generating the {scale} dataset in {folder} ...")
+    started = time.perf_counter()
+    rows = synthetic_data.generate(os.path.join(folder, "bench.db"), scale, seed)
+    database.close_all_connections()
+    manifest = {"folder": folder, "rows": rows, "generate_seconds": round(time.perf_counter() - started, 2)}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def run_scale(scale: str, seed: int, data_dir: str, pattern: str = "*", budget: float = BUDGET_SECONDS) -> Dict:
+    """Benchmark every case on a fresh copy of the scale's dataset"""
+    manifest = dataset(scale, seed, data_dir)
+    functions = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        work = os.path.join(work_dir, "data")
+        shutil.copytree(manifest["folder"], work)
+        database.DB_PATH = os.path.join(work, "bench.db")
+        database.init_db()
+        try:
+            workload = Workload(seed)
+            for case in CASES:
+                if fnmatch.fnmatch(case.function, pattern):
+                    functions[case.function] = time_case(case, workload, budget)
+        finally:
+            database.close_all_connections()
+    return {"rows": manifest["rows"], "generate_seconds": manifest["generate_seconds"], "functions": functions}
+
+def run_benchmark(scales=DEFAULT_SCALES, seed: int = synthetic_data.DEFAULT_SEED, data_dir: str = DATA_DIR,
+                  pattern: str = "*", budget: float = BUDGET_SECONDS) -> Dict:
+    """Benchmark results for each scale, plus the environment they were taken in"""
+    # Blobs must live next to each copied database, not in a shared directory
+    os.environ.pop("SMART_CLASSROOM_BLOBS", None)
+    results = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": seed,
+            "schema_version": database.SCHEMA_VERSION,
+        },
+        "scales": {},
+        "not_covered": not_covered(),
+    }
+    for scale in scales:
+        print(f"Benchmarking {scale} ...")
+        results["scales"][scale] = run_scale(scale, seed, data_dir, pattern, budget)
+    return results
+
+# ================== Baseline Comparison ==================
+def compare(results: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD,
+            min_delta_ms: float = MIN_DELTA_MS) -> List[Dict]:
+    """Median changes against a baseline run; status is regression, improvement, ok or new"""
+    changes = []
+    for scale, current in results["scales"].items():
+        before = baseline.get("scales", {}).get(scale, {}).get("functions", {})
+        for function, stats in current["functions"].items():
+            change = {"scale": scale, "function": function, "median_ms": stats["median_ms"],
+                      "baseline_ms": None, "change": None, "status": "new"}
+            if function in before:
+                old = before[function]["median_ms"]
+                delta = stats["median_ms"] - old
+                change.update(baseline_ms=old, change=delta / old if old else None, status="ok")
+                # The fastest call must agree, so one noisy burst does not flag a change
+                old_min = before[function]["min_ms"]
+                min_change = (stats["min_ms"] - old_min) / old_min if old_min else 0.0
+                if abs(delta) >= min_delta_ms and old:
+                    if delta / old > threshold and min_change > threshold:
+                        change["status"] = "regression"
+                    elif delta / old < -threshold and min_change < -threshold:
+                        change["status"] = "improvement"
+            changes.append(change)
+    return changes
+
+def print_results(results: Dict):
+    for scale, data in results["scales"].items():
+        rows = ", ".join(f"{table} {count:,}" for table, count in data["rows"].items()
+                         if table in ("users", "grades", "messages", "files"))
+        print(f"\n== {scale} ({rows}) ==")
+        print(f"{'function':<34} {'runs':>5} {'median ms':>10} {'p95 ms':>10} {'min ms':>10}")
+        for function, stats in sorted(data["functions"].items(), key=lambda item: -item[1]["median_ms"]):
+            print(f"{function:<34} {stats['runs']:>5} {stats['median_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+                  f"{stats['min_ms']:>10.3f}" + (f"  ({stats['failures']} failed)" if stats["failures"] else ""))
+    if results["not_covered"]:
+        print(f"\nNot covered: {', '.join(results['not_covered'])}")
+
+def print_changes(changes: List[Dict], baseline: Dict):
+    meta = baseline.get("meta", {})
+    print(f"\nCompared with the baseline of {meta.get('created_at', '?')} "
+          f"(Python {meta.get('python', '?')}, SQLite {meta.get('sqlite', '?')})")
+    flagged = [c for c in changes if c["status"] in ("regression", "improvement")]
+    for c in sorted(flagged, key=lambda c: (c["status"], -c["change"])):
+        print(f"{c['status'].upper():<12} {c['scale']:>5} {c['function']:<34} "
+              f"{c['baseline_ms']:>9.3f} -> {c['median_ms']:>9.3f} ms ({c['change']:+.0%})")
+    regressions = sum(c["status"] == "regression" for c in changes)
+    print(f"{regressions} regression(s), {len(flagged) - regressions} improvement(s), "
+          f"{sum(c['status'] == 'new' for c in changes)} new")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark database.py functions on synthetic data")
+    parser.add_argument("--scales", nargs="+", choices=sorted(synthetic_data.SCALES), default=list(DEFAULT_SCALES))
+    parser.add_argument("--seed", type=int, default=synthetic_data.DEFAULT_SEED)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Where generated datasets are cached")
+    parser.add_argument("--only", default="*", help="Glob of function names to run")
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS, help="Seconds of calls per function")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Earlier results to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative slowdown of the median that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS,
+                        help="Ignore changes smaller than this (timer noise)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.scales, args.seed, args.data_dir, args.only, args.budget)
+    print_results(results)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to store one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    changes = compare(results, baseline, args.threshold, args.min_delta_ms)
+    print_changes(changes, baseline)
+    return 1 if any(c["status"] == "regression" for c in changes) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# export_parquet.py
+"""Export classroom data to partitioned Parquet datasets for offline analytics.
+
+Each table is read in keyset batches (WHERE id > ? ORDER BY id LIMIT n), so
+memory stays bounded and no read transaction outlives a single batch;
+writers are never blocked for the length of the export. Batches are written
+as hive-partitioned Parquet files:
+
+    <out>/grades/month=2025-03/part-....parquet
+    <out>/messages/section_id=4/month=2025-03/part-....parquet
+    <out>/student_sections/section_id=4/part-....parquet
+    <out>/files/section_id=4/month=2025-03/part-....parquet
+
+The highest exported id per dataset is kept in <out>/_watermarks.json, and
+later runs only export newer rows. Rows are append-only as far as the export
+is concerned: edits to already exported rows (update_grade) are picked up
+by a --full re-export. Grades have no section column, so they are
+partitioned by month only. File payloads are never exported, only metadata.
+
+    python export_parquet.py exports/
+    python export_parquet.py exports/ --datasets grades messages --full
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+
+from typing import Dict, List, Optional
+
+import database
+
+BATCH_SIZE = 100_000
+WATERMARK_FILE = "_watermarks.json"
+
+# dataset -> (SELECT list, source table, partition columns, column types)
+DATASETS = {
+    "grades": (
+        "id, student_id, subject, grade, assignment_date, substr(assignment_date, 1, 7) AS month",
+        "grades",
+        ["month"],
+        {"id": "int64", "student_id": "int64", "subject": "string", "grade": "double",
+         "assignment_date": "date32", "month": "string"},
+    ),
+    "messages": (
+        "id, section_id, user_id, content, timestamp, substr(timestamp, 1, 7) AS month",
+        "messages",
+        ["section_id", "month"],
+        {"id": "int64", "section_id": "int64", "user_id": "int64", "content": "string",
+         "timestamp": "timestamp[s]", "month": "string"},
+    ),
+    "student_sections": (
+        "id, student_id, section_id",
+        "student_sections",
+        ["section_id"],
+        {"id": "int64", "student_id": "int64", "section_id": "int64"},
+    ),
+    "teacher_sections": (
+        "id, teacher_id, section_id",
+        "teacher_sections",
+        ["section_id"],
+        {"id": "int64", "teacher_id": "int64", "section_id": "int64"},
+    ),
+    "files": (
+        "id, filename, file_type, content_hash, file_size, codec, stored_size, uploaded_by, section_id, "
+        "uploaded_at, substr(uploaded_at, 1, 7) AS month",
+        "files",
+        ["section_id", "month"],
+        {"id": "int64", "filename": "string", "file_type": "string", "content_hash": "string",
+         "file_size": "int64", "codec": "string", "stored_size": "int64",
+         "uploaded_by": "int64", "section_id": "int64",
+         "uploaded_at": "timestamp[s]", "month": "string"},
+    ),
+}
+
+def load_watermarks(out_dir: str) -> Dict[str, int]:
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_watermarks(out_dir: str, watermarks: Dict[str, int]):
+    """Write the watermark file atomically so a crash never leaves it half-written"""
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def _max_id(table: str, db_path: Optional[str]) -> int:
+    conn = database.get_db_connection(db_path)
+    try:
+        return conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+def export_dataset(name: str, out_dir: str, watermarks: Dict[str, int], batch_size: int = BATCH_SIZE,
+                   db_path: Optional[str] = None) -> int:
+    """Export rows newer than the dataset's watermark; returns the number of rows written"""
+    import pyarrow.dataset as ds
+
+    columns, table, partitioning, column_types = DATASETS[name]
+    target = os.path.join(out_dir, name)
+    run_id = uuid.uuid4().hex[:12]
+
+    # Stop at the rows that existed when the export started
+    last_id, stop_id = watermarks.get(name, 0), _max_id(table, db_path)
+    exported = 0
+    batch_no = 0
+    while last_id < stop_id:
+        batch = database.query_arrow(
+            f"SELECT {columns} FROM {table} WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+            (last_id, stop_id, batch_size), column_types, db_path=db_path,
+        )
+        if batch.num_rows == 0:
+            break
+
+        ds.write_dataset(
+            batch, target, format="parquet",
+            partitioning=partitioning, partitioning_flavor="hive",
+            basename_template=f"part-{run_id}-{batch_no:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        last_id = batch.column("id")[-1].as_py()
+        exported += batch.num_rows
+        batch_no += 1
+
+        # Advance after every batch so an interrupted export resumes where it stopped
+        watermarks[name] = last_id
+        save_watermarks(out_dir, watermarks)
+    return exported
+
+def export_all(out_dir: str, datasets: Optional[List[str]] = None, full: bool = False,
+               batch_size: int = BATCH_SIZE, db_path: Optional[str] = None) -> Dict[str, int]:
+    """Export the given datasets (all by default); full=True re-exports from scratch"""
+    database.init_db(db_path)
+    os.makedirs(out_dir, exist_ok=True)
+    watermarks = load_watermarks(out_dir)
+
+    counts = {}
+    for name in datasets or list(DATASETS):
+        if full:
+            shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+            watermarks.pop(name, None)
+        counts[name] = export_dataset(name, out_dir, watermarks, batch_size, db_path)
+    save_watermarks(out_dir, watermarks)
+    return counts
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export classroom data to partitioned Parquet")
+    parser.add_argument("out_dir")
+    parser.add_argument("--datasets", nargs="+", choices=sorted(DATASETS), default=None)
+    parser.add_argument("--full", action="store_true", help="Ignore watermarks and re-export everything")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--db", default=None, help="Database file (defaults to SMART_CLASSROOM_DB)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    counts = export_all(args.out_dir, args.datasets, args.full, args.batch_size, args.db)
+    for name, count in counts.items():
+        print(f"{name}: {count} rows")
+    print(f"Exported in {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
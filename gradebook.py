@@ -0,0 +1,121 @@
+# gradebook.py
+"""Dense gradebook matrices and vectorized section statistics.
+
+load_section_gradebook() pulls a section's grade averages in one query and
+lays them out as a student x subject NumPy matrix (NaN where a student has
+no grade). section_statistics() then derives every figure the Mark Analysis
+page needs with array operations instead of per-row Python loops.
+"""
+import warnings
+
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+import database
+
+PERCENTILES = (10, 25, 75, 90)
+
+class SectionGradebook(NamedTuple):
+    section_id: int
+    student_ids: np.ndarray     # (students,)
+    usernames: List[str]        # (students,)
+    subjects: List[str]         # (subjects,)
+    grades: np.ndarray          # (students, subjects), mean grade per cell, NaN if missing
+
+def load_section_gradebook(section_id: int, subjects: Optional[List[str]] = None,
+                           db_path: Optional[str] = None) -> SectionGradebook:
+    """Load every enrolled student's average grade per subject as a dense matrix.
+
+    Students without grades still get a row (all NaN). Pass subjects to fix
+    the column set and order; otherwise every subject graded in the section
+    is included, sorted by name.
+    """
+    conn = database.get_db_connection(db_path)
+    # Roster rows (subject IS NULL) and per-student/subject averages in one
+    # round trip; averages come from the trigger-maintained summary table
+    rows = conn.execute("""
+        SELECT ss.student_id, u.username, NULL AS subject, NULL AS grade
+        FROM student_sections ss
+        JOIN users u ON u.id = ss.student_id
+        WHERE ss.section_id = ?
+        UNION ALL
+        SELECT gs.student_id, NULL, gs.subject, gs.grade_sum / gs.grade_count
+        FROM student_sections ss
+        JOIN grade_summary_student gs ON gs.student_id = ss.student_id
+        WHERE ss.section_id = ?
+    """, (section_id, section_id)).fetchall()
+    conn.close()
+
+    roster = [row for row in rows if row[2] is None]
+    cells = [row for row in rows if row[2] is not None]
+    roster.sort(key=lambda row: row[0])
+    student_ids = np.fromiter((row[0] for row in roster), dtype=np.int64, count=len(roster))
+    usernames = [row[1] for row in roster]
+
+    if subjects is None:
+        subjects = sorted({row[2] for row in cells})
+    grades = np.full((len(student_ids), len(subjects)), np.nan)
+    if not cells or not len(subjects):
+        return SectionGradebook(section_id, student_ids, usernames, list(subjects), grades)
+
+    cell_students, cell_subjects, cell_values = zip(*((row[0], row[2], row[3]) for row in cells))
+    column_of = {subject: j for j, subject in enumerate(subjects)}
+    columns = np.fromiter((column_of.get(s, -1) for s in cell_subjects), dtype=np.int64, count=len(cells))
+    students = np.searchsorted(student_ids, np.asarray(cell_students, dtype=np.int64))
+
+    keep = columns >= 0
+    grades[students[keep], columns[keep]] = np.asarray(cell_values, dtype=np.float64)[keep]
+    return SectionGradebook(section_id, student_ids, usernames, list(subjects), grades)
+
+def competition_ranks(values: np.ndarray) -> np.ndarray:
+    """Rank along axis 0, highest value = 1, ties share the best rank, NaN stays NaN"""
+    matrix = values[:, np.newaxis] if values.ndim == 1 else values
+    missing = np.isnan(matrix)
+    # Negate so an ascending sort puts the highest grades first; NaN sorts last
+    keys = np.where(missing, np.inf, -matrix)
+    ordered = np.sort(keys, axis=0)
+
+    ranks = np.empty(matrix.shape, dtype=np.float64)
+    for column in range(matrix.shape[1]):
+        ranks[:, column] = np.searchsorted(ordered[:, column], keys[:, column], side="left") + 1
+    ranks[missing] = np.nan
+    return ranks.reshape(values.shape)
+
+def section_statistics(gradebook: SectionGradebook, percentiles=PERCENTILES) -> Dict[str, np.ndarray]:
+    """Per-subject and per-student statistics for a gradebook.
+
+    Per subject (length = subjects): count, mean, median, std, min, max and
+    p<N> for each requested percentile. Per student (length = students):
+    student_mean and student_rank. Per cell (students x subjects): rank
+    within the subject and z_score against the subject mean.
+    """
+    grades = gradebook.grades
+    with warnings.catch_warnings():
+        # Subjects or students with no grades at all produce NaN, not noise
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        mean = np.nanmean(grades, axis=0)
+        std = np.nanstd(grades, axis=0)
+        stats = {
+            "count": np.sum(~np.isnan(grades), axis=0),
+            "mean": mean,
+            "median": np.nanmedian(grades, axis=0),
+            "std": std,
+            "min": np.nanmin(grades, axis=0) if grades.size else np.full(grades.shape[1], np.nan),
+            "max": np.nanmax(grades, axis=0) if grades.size else np.full(grades.shape[1], np.nan),
+        }
+        if grades.size:
+            for p, values in zip(percentiles, np.nanpercentile(grades, percentiles, axis=0)):
+                stats[f"p{p}"] = values
+        else:
+            for p in percentiles:
+                stats[f"p{p}"] = np.full(grades.shape[1], np.nan)
+
+        student_mean = np.nanmean(grades, axis=1)
+        safe_std = np.where(std > 0, std, np.nan)
+        stats["z_score"] = (grades - mean) / safe_std
+
+    stats["rank"] = competition_ranks(grades)
+    stats["student_mean"] = student_mean
+    stats["student_rank"] = competition_ranks(student_mean)
+    return stats
@@ -0,0 +1,398 @@
+# instrumentation.py
+"""Per-function instrumentation of the data layer.
+
+install() wraps every public function of database.py and adds a connection
+hook, so for each function it records
+
+    calls, errors     (exceptions raised; errors the function prints are not seen)
+    latency           total/max and a histogram over LATENCY_BUCKETS_MS
+    rows              rows returned (list length, Arrow/pandas row count)
+    blob_bytes        bytes of BLOB values returned, including streamed payload chunks
+    statements        SQL statements run, from the sqlite3 trace callback
+    vm_steps          SQLite virtual machine work, counted by the progress handler
+
+Statements and VM steps include those of nested instrumented calls
+(add_file counts add_file_stream's). A function that returns a generator
+is timed across the chunks it produces, not the time its consumer spends
+between them.
+
+Calls slower than SLOW_CALL_MS go to a bounded slow-query log along with
+every statement they ran, each with its approximate time and its
+EXPLAIN QUERY PLAN. Statements are logged with their string and BLOB
+literals replaced by ?, so bound passwords and message text never reach
+it. snapshot() returns all of it as a JSON-ready dict; the Admin Analytics
+page (admin_analytics.py) shows it.
+
+Stats live in the process that serves the pages. Functions imported with
+`from database import name` before install() ran keep the uninstrumented
+version, which is why main.py installs before importing any page.
+"""
+import inspect
+import json
+import os
+import re
+import threading
+import time
+
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import database
+
+ENABLED = os.environ.get("SMART_CLASSROOM_INSTRUMENT", "1") != "0"
+SLOW_CALL_MS = float(os.environ.get("SMART_CLASSROOM_SLOW_MS", "200"))
+SLOW_LOG_SIZE = 100
+# Statements remembered per call for the slow log
+MAX_STATEMENTS_PER_CALL = 50
+MAX_SQL_CHARS = 2000
+# The progress handler runs every PROGRESS_OPS virtual machine instructions
+PROGRESS_OPS = 1000
+# Upper bounds of the latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+PLAN_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+# String and BLOB literals; the trace callback sees statements with their parameters expanded
+_SQL_LITERAL_RE = re.compile(r"[xX]'[0-9a-fA-F]*'|'(?:[^']|'')*'")
+
+# Connection plumbing and helpers that aren't data access
+NOT_INSTRUMENTED = {
+    "get_db_connection", "get_pool", "close_all_connections", "add_connection_hook",
+    "remove_connection_hook", "add_message_listener", "remove_message_listener",
+    "cached_query", "invalidate_cache", "clear_cache", "get_cache_stats",
+    "get_blob_store", "payload_codec",
+}
+
+class FunctionStats:
+    """Counters for one instrumented function"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.rows = 0
+        self.blob_bytes = 0
+        self.statements = 0
+        self.vm_steps = 0
+
+    def record(self, elapsed_ms: float, rows: int, blob_bytes: int, statements: int, vm_steps: int,
+               error: bool):
+        self.calls += 1
+        self.errors += error
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.histogram[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.rows += rows
+        self.blob_bytes += blob_bytes
+        self.statements += statements
+        self.vm_steps += vm_steps
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile call (ms)"""
+        if not self.calls:
+            return None
+        target = q / 100 * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS + (self.max_ms,), self.histogram):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3),
+            "histogram": self.histogram,
+            "rows": self.rows,
+            "blob_bytes": self.blob_bytes,
+            "statements": self.statements,
+            "vm_steps": self.vm_steps,
+        }
+
+class _Call:
+    """What one in-flight call has done so far"""
+    __slots__ = ("name", "statements", "statement_count", "vm_steps", "last_started")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.statements: List[Dict] = []
+        self.statement_count = 0
+        self.vm_steps = 0
+        self.last_started: Optional[float] = None
+
+_stats: Dict[str, FunctionStats] = {}
+_slow_log: deque = deque(maxlen=SLOW_LOG_SIZE)
+_lock = threading.Lock()
+_local = threading.local()
+_installed = False
+_started_at = datetime.now()
+
+def _current() -> Optional[_Call]:
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+# ================== Connection Hook ==================
+def _trace(sql: str):
+    call = _current()
+    # "-- TRIGGER name" lines mark trigger bodies, which run inside the statement
+    if call is None or getattr(_local, "explaining", False) or sql.startswith("--"):
+        return
+    now = time.perf_counter()
+    if call.statements and call.last_started is not None:
+        call.statements[-1]["approx_ms"] = (now - call.last_started) * 1000
+    call.last_started = now
+    call.statement_count += 1
+    if len(call.statements) < MAX_STATEMENTS_PER_CALL:
+        call.statements.append({"sql": sql, "approx_ms": None, "vm_steps": 0})
+
+def _progress() -> int:
+    call = _current()
+    if call is not None:
+        call.vm_steps += PROGRESS_OPS
+        if call.statements:
+            call.statements[-1]["vm_steps"] += PROGRESS_OPS
+    return 0  # non-zero would abort the statement
+
+def connection_hook(conn):
+    """database connection hook: attribute statements and VM work to the calling function"""
+    conn.set_trace_callback(_trace)
+    conn.set_progress_handler(_progress, PROGRESS_OPS)
+
+# ================== Function Wrapper ==================
+_BLOB_TYPES = (bytes, bytearray, memoryview)
+
+def _blob_bytes(value: Any) -> int:
+    if isinstance(value, _BLOB_TYPES):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(v) for v in value.values() if isinstance(v, _BLOB_TYPES))
+    return 0
+
+def _rows_blob_bytes(rows) -> int:
+    """BLOB bytes in a list of row dicts, only looking at columns that can hold one"""
+    first = rows[0]
+    if not isinstance(first, dict):
+        return sum(_blob_bytes(row) for row in rows)
+    # A column that is text or a number in the first row isn't a BLOB column
+    columns = [key for key, value in first.items() if value is None or isinstance(value, _BLOB_TYPES)]
+    total = 0
+    for row in rows if columns else ():
+        for key in columns:
+            value = row.get(key)
+            if isinstance(value, _BLOB_TYPES):
+                total += len(value)
+    return total
+
+def _measure_result(result: Any):
+    """(rows, blob bytes) of a returned value"""
+    if result is None or isinstance(result, bool):
+        return 0, 0
+    if isinstance(result, _BLOB_TYPES):
+        return 0, len(result)
+    if isinstance(result, (list, tuple)):
+        return len(result), _rows_blob_bytes(result) if result else 0
+    if isinstance(result, dict):
+        rows = list(result.values())
+        if rows and isinstance(rows[0], dict):
+            return len(rows), _rows_blob_bytes(rows)
+        return 1, _blob_bytes(result)
+    if hasattr(result, "num_rows"):
+        return result.num_rows, 0
+    if hasattr(result, "shape"):
+        return result.shape[0], 0
+    return 1, 0
+
+def redact_sql(sql: str) -> Tuple[str, int]:
+    """Statement with its string and BLOB literals replaced by ?, and how many were replaced"""
+    return _SQL_LITERAL_RE.subn("?", sql)
+
+def _explain(sql: str, placeholders: int) -> List[str]:
+    if not sql.lstrip().upper().startswith(PLAN_STATEMENTS):
+        return []
+    _local.explaining = True
+    conn = database.get_db_connection()
+    try:
+        # Redacted literals are bound as NULL; the plan doesn't depend on them
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", (None,) * placeholders).fetchall()
+        return [row["detail"] for row in rows]
+    except Exception as e:
+        return [f"(no plan: {e})"]
+    finally:
+        conn.close()
+        _local.explaining = False
+
+def _finish(call: _Call, elapsed_ms: float, rows: int, blob_bytes: int, error: bool):
+    if not getattr(_local, "stack", None):
+        # Outermost call of this thread: count it towards the thread's database time
+        _local.db_ms = getattr(_local, "db_ms", 0.0) + elapsed_ms
+    if call.statements and call.last_started is not None and call.statements[-1]["approx_ms"] is None:
+        call.statements[-1]["approx_ms"] = (time.perf_counter() - call.last_started) * 1000
+    with _lock:
+        stats = _stats.get(call.name)
+        if stats is None:
+            stats = _stats[call.name] = FunctionStats()
+        stats.record(elapsed_ms, rows, blob_bytes, call.statement_count, call.vm_steps, error)
+
+    if elapsed_ms >= SLOW_CALL_MS:
+        statements = []
+        for statement in call.statements:
+            sql, placeholders = redact_sql(statement["sql"])
+            statements.append({
+                "sql": sql[:MAX_SQL_CHARS],
+                "approx_ms": round(statement["approx_ms"] or 0.0, 3),
+                "vm_steps": statement["vm_steps"],
+                "plan": _explain(sql, placeholders),
+            })
+        entry = {
+            "function": call.name,
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "duration_ms": round(elapsed_ms, 3),
+            "rows": rows,
+            "blob_bytes": blob_bytes,
+            "statements": statements,
+        }
+        with _lock:
+            _slow_log.append(entry)
+
+def _stack() -> List[_Call]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def _roll_up(call: _Call):
+    """Count a finished nested call's statements towards its caller too"""
+    parent = _current()
+    if parent is not None:
+        parent.statement_count += call.statement_count
+        parent.vm_steps += call.vm_steps
+        room = MAX_STATEMENTS_PER_CALL - len(parent.statements)
+        parent.statements.extend(call.statements[:max(room, 0)])
+
+def _instrument_iterator(call: _Call, elapsed_ms: float, iterator):
+    """Attribute a returned generator's work to the call, which finishes when it is exhausted.
+
+    Only the time spent producing chunks is counted, so a slow consumer
+    (a download to a slow client) doesn't make the call look slow.
+    """
+    blob_bytes = 0
+    error = False
+    try:
+        while True:
+            stack = _stack()
+            stack.append(call)
+            started = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                elapsed_ms += (time.perf_counter() - started) * 1000
+                stack.pop()
+            blob_bytes += _blob_bytes(chunk)
+            yield chunk
+    except Exception:
+        error = True
+        raise
+    finally:
+        _finish(call, elapsed_ms, 0, blob_bytes, error)
+
+def instrumented(func: Callable, name: Optional[str] = None) -> Callable:
+    """Wrap a data-access function so its calls are recorded under name (default: its own)"""
+    name = name or func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        call = _Call(name)
+        stack = _stack()
+        stack.append(call)
+        started = time.perf_counter()
+        error = True
+        try:
+            result = func(*args, **kwargs)
+            error = False
+        finally:
+            stack.pop()
+            _roll_up(call)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if error:
+                _finish(call, elapsed_ms, 0, 0, True)
+
+        if inspect.isgenerator(result):
+            return _instrument_iterator(call, elapsed_ms, result)
+        rows, blob_bytes = _measure_result(result)
+        _finish(call, elapsed_ms, rows, blob_bytes, False)
+        return result
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+def install(module=database) -> int:
+    """Instrument every public function of the data layer (idempotent); returns how many were wrapped"""
+    global _installed
+    if not ENABLED:
+        return 0
+    wrapped = 0
+    with _lock:
+        if _installed:
+            return 0
+        for name, value in list(vars(module).items()):
+            if (name.startswith("_") or name in NOT_INSTRUMENTED or not inspect.isfunction(value)
+                    or value.__module__ != module.__name__ or getattr(value, "__instrumented__", False)):
+                continue
+            setattr(module, name, instrumented(value, name))
+            wrapped += 1
+        _installed = True
+    database.add_connection_hook(connection_hook)
+    # Pooled connections opened before now have no hook
+    database.close_all_connections()
+    return wrapped
+
+def thread_db_ms() -> float:
+    """Milliseconds the current thread has spent in instrumented calls so far"""
+    return getattr(_local, "db_ms", 0.0)
+
+# ================== Snapshot ==================
+def snapshot() -> Dict:
+    """Every counter and the slow-query log as a JSON-ready dict"""
+    with _lock:
+        functions = {name: stats.to_dict() for name, stats in _stats.items()}
+        slow = list(_slow_log)
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "since": _started_at.isoformat(timespec="seconds"),
+        "database": os.path.abspath(database.DB_PATH),
+        "slow_call_ms": SLOW_CALL_MS,
+        "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+        "functions": functions,
+        "slow_queries": slow,
+        "cache": database.get_cache_stats(),
+    }
+
+def snapshot_json(indent: Optional[int] = 2) -> str:
+    return json.dumps(snapshot(), indent=indent, default=str)
+
+def write_snapshot(path: str):
+    """Write the snapshot to a file atomically"""
+    with open(path + ".tmp", "w") as f:
+        f.write(snapshot_json())
+    os.replace(path + ".tmp", path)
+
+def reset():
+    """Forget all counters and the slow-query log"""
+    global _started_at
+    with _lock:
+        _stats.clear()
+        _slow_log.clear()
+        _started_at = datetime.now()
@@ -0,0 +1,211 @@
+# job_worker.py
+"""Drain the background job queue with a pool of worker processes.
+
+Uploads only queue work (see database.enqueue_job); this command does it
+outside the Streamlit process. The parent claims jobs, hands each to a
+ProcessPoolExecutor child and keeps the job's lease alive while the child
+runs. Handlers run in the children and must be idempotent: a job whose
+worker crashed is claimed again once its lease expires.
+
+    python job_worker.py                 # run until interrupted
+    python job_worker.py --once          # drain what is runnable now and exit
+    python job_worker.py --status
+    python job_worker.py --retry-failed
+"""
+import argparse
+import importlib.util
+import multiprocessing
+import os
+import socket
+import sys
+import time
+import uuid
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import database
+import thumbnails
+
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+POLL_SECONDS = 2.0
+HEARTBEAT_SECONDS = database.JOB_LEASE_SECONDS / 3
+# Pages of extracted text written per transaction
+PAGE_BATCH_SIZE = 50
+
+HANDLERS: Dict[str, Callable[[Dict], None]] = {}
+
+def job_handler(kind: str):
+    """Register a function as the handler for a job kind"""
+    def register(func: Callable[[Dict], None]) -> Callable[[Dict], None]:
+        HANDLERS[kind] = func
+        return func
+    return register
+
+# ================== PDF Text ==================
+def _pdfium_pages(path: str) -> Iterator[Tuple[int, str]]:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            try:
+                yield index + 1, textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+
+def _pdfplumber_pages(path: str) -> Iterator[Tuple[int, str]]:
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        for index, page in enumerate(pdf.pages):
+            yield index + 1, page.extract_text() or ""
+            page.flush_cache()
+
+def extract_pages(path: str) -> Iterator[Tuple[int, str]]:
+    """Yield (page number, text) for a PDF, one page in memory at a time.
+
+    Uses pypdfium2, and pdfplumber when pypdfium2 is missing or can't open
+    the document.
+    """
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        yield from _pdfplumber_pages(path)
+        return
+
+    try:
+        pdfium.PdfDocument(path).close()
+    except pdfium.PdfiumError:
+        if importlib.util.find_spec("pdfplumber") is None:
+            raise
+        yield from _pdfplumber_pages(path)
+        return
+    yield from _pdfium_pages(path)
+
+@job_handler(database.PDF_TEXT_JOB)
+def extract_pdf_text(payload: Dict):
+    """Store the per-page text of an uploaded PDF"""
+    content_hash = payload["content_hash"]
+    store = database.get_blob_store()
+    if not store.exists(content_hash):
+        return  # every file using this payload was deleted before we got to it
+
+    batch = []
+    with store.local_path(content_hash) as path:
+        for page_number, text in extract_pages(path):
+            batch.append((page_number, text))
+            if len(batch) >= PAGE_BATCH_SIZE:
+                database.save_pdf_pages(content_hash, batch)
+                batch = []
+    if batch:
+        database.save_pdf_pages(content_hash, batch)
+
+# Rendering lives in thumbnails.py; the worker only needs to know the kind
+job_handler(database.THUMBNAIL_JOB)(thumbnails.render_thumbnail_job)
+
+# ================== Worker ==================
+def _init_process(db_path: str):
+    database.DB_PATH = db_path
+
+def _run_job(kind: str, payload: Dict):
+    HANDLERS[kind](payload)
+
+def _new_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn: children must not inherit the parent's open SQLite connections
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_process,
+        initargs=(database.DB_PATH,),
+    )
+
+def run_worker(workers: int = DEFAULT_WORKERS, kinds: Optional[List[str]] = None, once: bool = False,
+               poll_interval: float = POLL_SECONDS) -> Dict[str, int]:
+    """Claim and run jobs until interrupted (or until none are runnable, with once=True)"""
+    database.init_db()
+    kinds = list(kinds or HANDLERS)
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    stats = {"done": 0, "failed": 0}
+    inflight = {}
+    next_heartbeat = time.monotonic() + HEARTBEAT_SECONDS
+    pool = _new_pool(workers)
+    try:
+        while True:
+            free = workers - len(inflight)
+            if free > 0:
+                for job in database.claim_jobs(owner, free, kinds):
+                    inflight[pool.submit(_run_job, job["kind"], job["payload"])] = job
+
+            if not inflight:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(inflight, timeout=HEARTBEAT_SECONDS, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                job = inflight.pop(future)
+                error = future.exception()
+                if error is None:
+                    database.complete_job(job["id"], owner)
+                    stats["done"] += 1
+                else:
+                    database.fail_job(job["id"], owner, f"{type(error).__name__}: {error}")
+                    stats["failed"] += 1
+                    broken = broken or isinstance(error, BrokenProcessPool)
+            if broken:
+                # A child died (e.g. a PDF crashed the parser); start a fresh pool
+                pool.shutdown(wait=False, cancel_futures=True)
+                for job in inflight.values():
+                    database.fail_job(job["id"], owner, "BrokenProcessPool: worker process died")
+                    stats["failed"] += 1
+                inflight.clear()
+                pool = _new_pool(workers)
+
+            if inflight and time.monotonic() >= next_heartbeat:
+                database.heartbeat_jobs(owner, [job["id"] for job in inflight.values()])
+                next_heartbeat = time.monotonic() + HEARTBEAT_SECONDS
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        # Whatever was still running goes back to the queue for the next worker
+        database.release_jobs(owner)
+    return stats
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run background jobs (PDF text, thumbnails, ...)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--kinds", nargs="+", choices=sorted(HANDLERS), default=None)
+    parser.add_argument("--once", action="store_true", help="Exit when no job is runnable")
+    parser.add_argument("--status", action="store_true", help="Print job counts and exit")
+    parser.add_argument("--retry-failed", action="store_true", help="Queue failed jobs again and exit")
+    parser.add_argument("--db", default=None, help="Database file (defaults to SMART_CLASSROOM_DB)")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_PATH = args.db
+    database.init_db()
+
+    if args.status:
+        for status, count in sorted(database.get_job_counts().items()):
+            print(f"{status}: {count}")
+        return 0
+    if args.retry_failed:
+        print(f"{database.retry_failed_jobs()} failed jobs queued again")
+        return 0
+
+    stats = run_worker(args.workers, args.kinds, once=args.once)
+    print(f"{stats['done']} jobs done, {stats['failed']} failed attempts")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+# load_test.py
+"""Concurrent-session load test of the app, driven through Streamlit's AppTest.
+
+Simulated users run main.main in-process (no browser, no server) against a
+throwaway synthetic database (see synthetic_data.py). All users start
+together, like a class logging in at once:
+
+    student: log in through the login form, then per iteration re-render the
+             dashboard, post a chat message and poll the chat for new ones
+    teacher: log in, then per iteration enter a grade for a student of their
+             section and post a chat message
+
+Chat and grade entry have no page in this tree, so those actions call the
+same database.py / chat_bus.py functions a page would.
+
+AppTest swaps Streamlit's global runtime for each run, so renders within one
+process are serialized; users are spread over --workers processes, each
+running its users as threads. The wait for the render slot is reported as
+"render_queue". Data-layer calls are never serialized, so lock contention is
+real, both between threads and between processes.
+
+The report gives throughput, p50/p95/p99 per action, failures and "database
+is locked" errors (from the data layer's error messages and exceptions).
+"login_page" includes AppTest's own setup of a new session.
+
+    python load_test.py --students 200 --teachers 10 --iterations 5
+    python load_test.py --workers 8 --think 0.5 --json load.json
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_SCRIPT = "import main\nmain.main()\n"
+PASSWORD = "pw"
+# Page targets missing from this tree and what to render instead
+FALLBACK_PAGES = {"student.dashboard:student_dashboard": "dashboard:student_dashboard"}
+LOCK_MESSAGES = ("database is locked", "database table is locked")
+RENDER_TIMEOUT = 60
+START_TIMEOUT = 300
+ACTIONS = ("login_page", "login", "dashboard", "chat_post", "chat_read", "grade_entry", "render_queue")
+
+# ================== Worker Process ==================
+_local = threading.local()
+_render_lock = threading.Lock()
+_render_action: Optional[str] = None
+
+class _Recorder:
+    """Latencies, failures and lock errors per action, shared by a worker's threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {action: [] for action in ACTIONS}
+        self.failures = {action: 0 for action in ACTIONS}
+        self.lock_errors = {action: 0 for action in ACTIONS}
+
+    def record(self, action: str, ms: float, ok: bool = True):
+        with self.lock:
+            self.samples[action].append(ms)
+            self.failures[action] += not ok
+
+    def crashed(self, error: BaseException):
+        """A simulated user stopped on an unexpected exception"""
+        with self.lock:
+            self.failures["other"] = self.failures.get("other", 0) + 1
+        if _is_lock_error(error):
+            self.lock_error(None)
+
+    def lock_error(self, action: Optional[str]):
+        with self.lock:
+            self.lock_errors[action or "other"] = self.lock_errors.get(action or "other", 0) + 1
+
+class _LockTap(io.TextIOBase):
+    """stdout wrapper counting the data layer's "database is locked" messages"""
+
+    def __init__(self, stream, recorder: _Recorder, echo: bool):
+        self.stream = stream
+        self.recorder = recorder
+        self.echo = echo
+
+    def write(self, text: str) -> int:
+        if any(message in text for message in LOCK_MESSAGES):
+            # Renders print from Streamlit's script thread, other actions from the user's thread
+            self.recorder.lock_error(getattr(_local, "action", None) or _render_action)
+        if self.echo:
+            self.stream.write(text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def _is_lock_error(error: BaseException) -> bool:
+    return any(message in str(error) for message in LOCK_MESSAGES)
+
+def _render(at, action: str, recorder: _Recorder):
+    """Run the app once; returns True if the script finished without an exception"""
+    global _render_action
+    queued = time.perf_counter()
+    with _render_lock:
+        started = time.perf_counter()
+        recorder.record("render_queue", (started - queued) * 1000)
+        _render_action = action
+        try:
+            at.run(timeout=RENDER_TIMEOUT)
+            errors = [element.value for element in at.exception]
+        except Exception as e:
+            errors = [str(e)]
+        finally:
+            _render_action = None
+        elapsed = (time.perf_counter() - started) * 1000
+    for error in errors:
+        if any(message in str(error) for message in LOCK_MESSAGES):
+            recorder.lock_error(action)
+    return elapsed, not errors
+
+def _timed_call(action: str, recorder: _Recorder, function, *args):
+    """Call a data-layer function as one action; returns its result (None if it raised)"""
+    _local.action = action
+    started = time.perf_counter()
+    result = None
+    try:
+        result = function(*args)
+        ok = result is not False
+    except Exception as e:
+        ok = False
+        if _is_lock_error(e):
+            recorder.lock_error(action)
+    finally:
+        _local.action = None
+    recorder.record(action, (time.perf_counter() - started) * 1000, ok)
+    return result
+
+def _login(at, user: Dict, recorder: _Recorder) -> bool:
+    elapsed, ok = _render(at, "login_page", recorder)
+    recorder.record("login_page", elapsed, ok)
+    if not ok:
+        return False
+    at.selectbox[0].select(user["role"])
+    at.text_input[0].input(user["username"])
+    at.text_input[1].input(PASSWORD)
+    at.button[0].click()
+    elapsed, ok = _render(at, "login", recorder)
+    ok = ok and at.session_state["authenticated"] is True
+    recorder.record("login", elapsed, ok)
+    return ok
+
+def _run_user(user: Dict, options: Dict, recorder: _Recorder):
+    try:
+        _simulate(user, options, recorder)
+    except Exception as e:
+        print(f"Simulated user {user['username']} failed: {type(e).__name__}: {e}", file=sys.stderr)
+        recorder.crashed(e)
+
+def _simulate(user: Dict, options: Dict, recorder: _Recorder):
+    import chat_bus
+    import database
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(f"{options['seed']}:{user['username']}")
+    at = AppTest.from_string(APP_SCRIPT, default_timeout=RENDER_TIMEOUT)
+    if not _login(at, user, recorder):
+        return
+    last_id = 0
+    for iteration in range(options["iterations"]):
+        if options["think"]:
+            time.sleep(rng.uniform(0, options["think"]))
+        if user["role"] == "Student":
+            elapsed, ok = _render(at, "dashboard", recorder)
+            recorder.record("dashboard", elapsed, ok)
+        else:
+            _timed_call("grade_entry", recorder, database.add_grade, rng.choice(user["students"]),
+                        rng.choice(user["subjects"]), round(rng.uniform(40, 100), 1))
+        _timed_call("chat_post", recorder, database.save_message, user["section_id"], user["user_id"],
+                    f"load test message {iteration} from {user['username']}")
+        if user["role"] == "Student":
+            messages = _timed_call("chat_read", recorder, chat_bus.get_messages_since, user["section_id"], last_id)
+            if messages:
+                last_id = messages[-1]["id"]
+
+def _worker(users: List[Dict], options: Dict, barrier, results):
+    """One process: warm up, wait for the others, then run its users as threads"""
+    try:
+        results.put(_run_worker(users, options, barrier))
+    except Exception as e:
+        barrier.abort()  # release the other workers instead of leaving them waiting
+        results.put({"error": f"{type(e).__name__}: {e}"})
+        raise
+
+def _run_worker(users: List[Dict], options: Dict, barrier) -> Dict:
+    sys.path.insert(0, HERE)
+    from streamlit.logger import get_logger
+    from streamlit.testing.v1 import AppTest
+
+    # Streamlit calls outside a script run (importing main, reading AppTest state) warn each time
+    get_logger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+    import main
+    for role_pages in main.NAV_CONFIG.values():
+        for label, target in role_pages.items():
+            role_pages[label] = FALLBACK_PAGES.get(target, target)
+    # Pay the import and first-render costs of each role's landing page before the clock starts
+    for role in {user["role"] for user in users}:
+        user = next(user for user in users if user["role"] == role)
+        _login(AppTest.from_string(APP_SCRIPT, default_timeout=RENDER_TIMEOUT), user, _Recorder())
+
+    recorder = _Recorder()
+    sys.stdout = _LockTap(sys.stdout, recorder, options["verbose"])
+
+    barrier.wait(timeout=START_TIMEOUT)
+    started = time.time()
+    threads = [threading.Thread(target=_run_user, args=(user, options, recorder), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "started": started,
+        "finished": time.time(),
+        "samples": recorder.samples,
+        "failures": recorder.failures,
+        "lock_errors": recorder.lock_errors,
+    }
+
+# ================== Driver ==================
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))], 3)
+
+def prepare_database(db_path: str, students: int, teachers: int, scale: str, seed: int) -> List[Dict]:
+    """Create the synthetic database and describe the users to simulate"""
+    import database
+    import synthetic_data
+
+    # At least one section per teacher, so every simulated teacher has a class
+    sections = max(synthetic_data.SCALES[scale]["sections"], teachers)
+    synthetic_data.generate(db_path, scale, seed, students=max(students, 1), teachers=max(teachers, 1),
+                            sections=sections)
+    conn = database.get_db_connection()
+    try:
+        section_students, section_subjects = {}, {}
+        for section_id, student_id in conn.execute("SELECT section_id, student_id FROM student_sections ORDER BY id"):
+            section_students.setdefault(section_id, []).append(student_id)
+        for section_id, subject in conn.execute("SELECT section_id, subject_name FROM subjects"):
+            section_subjects.setdefault(section_id, []).append(subject)
+
+        def first_section(table: str, column: str) -> Dict[int, int]:
+            return dict(conn.execute(f"SELECT {column}, MIN(section_id) FROM {table} GROUP BY {column}").fetchall())
+        student_section = first_section("student_sections", "student_id")
+        teacher_section = first_section("teacher_sections", "teacher_id")
+
+        users = []
+        wanted = {"Student": students, "Teacher": teachers}
+        for row in conn.execute("SELECT id, username, role FROM users WHERE role IN ('Student', 'Teacher') ORDER BY id"):
+            if wanted[row["role"]] <= 0:
+                continue
+            wanted[row["role"]] -= 1
+            if row["role"] == "Student":
+                users.append({"role": "Student", "username": row["username"], "user_id": row["id"],
+                              "section_id": student_section[row["id"]]})
+            else:
+                section_id = teacher_section[row["id"]]
+                users.append({"role": "Teacher", "username": row["username"], "user_id": row["id"],
+                              "section_id": section_id, "students": section_students.get(section_id, [])[:50],
+                              "subjects": section_subjects.get(section_id, ["Mathematics"])})
+    finally:
+        conn.close()
+    database.close_all_connections()
+    return users
+
+def run_load_test(students: int = 50, teachers: int = 5, iterations: int = 5, workers: Optional[int] = None,
+                  think: float = 0.0, scale: str = "1k", seed: int = 42, verbose: bool = False) -> Dict:
+    """Run the simulated users and aggregate their timings"""
+    workers = max(1, min(workers or os.cpu_count() or 1, students + teachers))
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Children inherit the environment: every process opens the same throwaway database
+        os.environ["SMART_CLASSROOM_DB"] = os.path.join(work_dir, "load_test.db")
+        os.environ["SMART_CLASSROOM_BLOBS"] = os.path.join(work_dir, "file_store")
+        import database
+        database.DB_PATH = os.environ["SMART_CLASSROOM_DB"]
+        users = prepare_database(database.DB_PATH, students, teachers, scale, seed)
+        random.Random(seed).shuffle(users)
+
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(workers)
+        results = context.Queue()
+        options = {"iterations": iterations, "think": think, "seed": seed, "verbose": verbose}
+        processes = [
+            context.Process(target=_worker, args=(users[index::workers], options, barrier, results))
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    errors = [r["error"] for r in reports if "error" in r]
+    if errors:
+        raise RuntimeError(f"Load test worker failed: {errors[0]}")
+
+    wall = max(r["finished"] for r in reports) - min(r["started"] for r in reports)
+    actions = {}
+    for action in ACTIONS:
+        ordered = sorted(ms for r in reports for ms in r["samples"][action])
+        if not ordered:
+            continue
+        actions[action] = {
+            "count": len(ordered),
+            "per_second": round(len(ordered) / wall, 2) if wall else None,
+            "failures": sum(r["failures"][action] for r in reports),
+            "lock_errors": sum(r["lock_errors"].get(action, 0) for r in reports),
+            "p50_ms": _percentile(ordered, 50),
+            "p95_ms": _percentile(ordered, 95),
+            "p99_ms": _percentile(ordered, 99),
+            "max_ms": round(ordered[-1], 3),
+        }
+    completed = sum(stats["count"] for action, stats in actions.items() if action != "render_queue")
+    return {
+        "students": sum(u["role"] == "Student" for u in users),
+        "teachers": sum(u["role"] == "Teacher" for u in users),
+        "iterations": iterations,
+        "workers": workers,
+        "think_seconds": think,
+        "wall_seconds": round(wall, 3),
+        "actions_per_second": round(completed / wall, 2) if wall else None,
+        "failures": sum(n for r in reports for n in r["failures"].values()),
+        "lock_errors": sum(n for r in reports for n in r["lock_errors"].values()),
+        "actions": actions,
+        "substituted_pages": FALLBACK_PAGES,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the app with concurrent simulated sessions")
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--teachers", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=5, help="Dashboard/chat/grade rounds per user")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--think", type=float, default=0.0, help="Max random pause between rounds (seconds)")
+    parser.add_argument("--scale", default="1k", help="synthetic_data scale for the rest of the data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="Show the app's printed messages")
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.students, args.teachers, args.iterations, args.workers,
+                           args.think, args.scale, args.seed, args.verbose)
+    print(f"{report['students']} students + {report['teachers']} teachers, {report['iterations']} iterations, "
+          f"{report['workers']} workers: {report['wall_seconds']:.1f}s, "
+          f"{report['actions_per_second']:.1f} actions/s, {report['failures']} failures, "
+          f"{report['lock_errors']} lock errors")
+    print(f"{'action':<14} {'count':>6} {'per s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} "
+          f"{'failed':>7} {'locked':>7}")
+    for action, stats in report["actions"].items():
+        print(f"{action:<14} {stats['count']:>6} {stats['per_second']:>8.1f} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f} "
+              f"{stats['failures']:>7} {stats['lock_errors']:>7}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["failures"] or report["lock_errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
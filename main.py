@@ -1,16 +1,16 @@
+import importlib
+
+from typing import Callable, Dict
+
 import streamlit as st
+
+# Instrument the data layer before anything imports names from it
+import instrumentation
+instrumentation.install()
+import page_profiler
+
 from auth import login, logout, authentication_guard
 from database import init_db
-from admin.dashboard import admin_dashboard
-from teacher.dashboard import teacher_dashboard, upload_pdfs, upload_videos, class_chat, grade_management
-from student.dashboard import student_dashboard
-from features.study_materials import study_materials
-from features.chatbot import chatbot
-from features.roadmap import roadmap
-from features.youtube_recommendations import youtube_recommendations
-from features.mark_analysis import mark_analysis
-from features.resume import resume_main
-from features.course_recommendations import course_recommendations  # New import
 
 # Initialize the database
 init_db()
@@ -23,34 +23,50 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def handle_navigation():
-    """Manage role-based navigation and page routing"""
-    NAV_CONFIG = {
-        "Student": {
-            "🏠 Dashboard": student_dashboard,
-            "📚 Study Materials": study_materials,
-            "💬 AI Assistant": chatbot,
-            "🗺 Learning Path": roadmap,
-            "🎥 Video Recommendations": youtube_recommendations,
-            "📖 Course Recommendations": course_recommendations,
-            "🤖 AI Interview Prep": resume_main
-        },
-        "Teacher": {
-            "🏠 Dashboard": teacher_dashboard,
-            "📝 Grade Management": grade_management,
-            "📤 Upload PDFs": upload_pdfs,
-            "🎬 Lecture Videos": upload_videos,
-            "📊 Mark Analysis": mark_analysis,
-        },
-        "Admin": {
-            "🏠 Dashboard": admin_dashboard,
-            "👥 User Management": admin_dashboard,
-            "📂 Section Management": admin_dashboard,
-            "📊 Analytics": youtube_recommendations,
-            "⚙ System Settings": roadmap
-        }
+# Pages as "module:function" targets, imported the first time they are opened
+# so the login page never loads the AI features' dependencies
+NAV_CONFIG = {
+    "Student": {
+        "🏠 Dashboard": "student.dashboard:student_dashboard",
+        "📚 Study Materials": "features.study_materials:study_materials",
+        "💬 AI Assistant": "features.chatbot:chatbot",
+        "🗺 Learning Path": "features.roadmap:roadmap",
+        "🎥 Video Recommendations": "features.youtube_recommendations:youtube_recommendations",
+        "📖 Course Recommendations": "features.course_recommendations:course_recommendations",
+        "🤖 AI Interview Prep": "features.resume:resume_main"
+    },
+    "Teacher": {
+        "🏠 Dashboard": "teacher.dashboard:teacher_dashboard",
+        "📝 Grade Management": "teacher.dashboard:grade_management",
+        "📤 Upload PDFs": "teacher.dashboard:upload_pdfs",
+        "🎬 Lecture Videos": "teacher.dashboard:upload_videos",
+        "📊 Mark Analysis": "features.mark_analysis:mark_analysis",
+    },
+    "Admin": {
+        "🏠 Dashboard": "admin.dashboard:admin_dashboard",
+        "👥 User Management": "admin.dashboard:admin_dashboard",
+        "📂 Section Management": "admin.dashboard:admin_dashboard",
+        "📊 Analytics": "admin_analytics:admin_analytics",
+        "⚙ System Settings": "features.roadmap:roadmap"
     }
+}
 
+page_profiler.register_pages([f"{role} / {label}" for role, pages in NAV_CONFIG.items() for label in pages])
+
+# Module imports are cached by Python; this saves the attribute lookup per rerun
+_loaded_pages: Dict[str, Callable[[], None]] = {}
+
+def load_page(target: str) -> Callable[[], None]:
+    """Import a "module:function" page target (once) and return the page function"""
+    page = _loaded_pages.get(target)
+    if page is None:
+        module_name, _, function_name = target.partition(":")
+        page = getattr(importlib.import_module(module_name), function_name)
+        _loaded_pages[target] = page
+    return page
+
+def handle_navigation():
+    """Manage role-based navigation and page routing"""
     if st.session_state.role not in NAV_CONFIG:
         st.error("Invalid role detected. Please log in again.")
         logout()
@@ -64,10 +80,15 @@ def handle_navigation():
     )
 
     try:
-        NAV_CONFIG[st.session_state.role][selected]()
+        page_profiler.run_page(
+            f"{st.session_state.role} / {selected}",
+            load_page(NAV_CONFIG[st.session_state.role][selected])
+        )
     except KeyError as e:
         st.error(f"Page configuration error: {str(e)}")
         logout()
+    except (ImportError, AttributeError) as e:
+        st.error(f"Page could not be loaded: {str(e)}")
 
     st.sidebar.divider()
     if st.sidebar.button("🚪 Logout", key="logout_btn"):
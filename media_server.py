@@ -0,0 +1,210 @@
+# media_server.py
+"""Local HTTP endpoint that streams stored files with Range support.
+
+Streamlit pages embed lecture videos by URL instead of pushing the bytes
+through the script:
+
+    st.video(media_url(st.session_state.user_id, file_id))
+
+The browser then seeks with Range requests against this server, which
+reads only the requested bytes from the blob store, one chunk at a time.
+URLs carry an HMAC-signed (user, file, expiry) token, and section
+membership is re-checked on every request.
+
+    python media_server.py --port 8502
+"""
+import argparse
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+import secrets
+import time
+
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+import tornado.ioloop
+import tornado.web
+
+import database
+
+MEDIA_BASE_URL = os.environ.get("EDUPORTFOLIO_MEDIA_URL", "http://localhost:8502")
+TOKEN_TTL_SECONDS = 6 * 3600
+STREAM_CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _media_secret() -> bytes:
+    """Signing key shared by the Streamlit app and the media server.
+
+    Taken from EDUPORTFOLIO_MEDIA_SECRET, or generated once and kept in a
+    private file next to the database so both processes agree on it.
+    """
+    secret = os.environ.get("EDUPORTFOLIO_MEDIA_SECRET")
+    if secret:
+        return secret.encode()
+
+    path = os.path.join(os.path.dirname(os.path.abspath(database.DB_PATH)), ".media_secret")
+    if not os.path.exists(path):
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+        except FileExistsError:
+            pass
+    with open(path) as f:
+        return f.read().strip().encode()
+
+def sign_media_token(user_id: int, file_id: int, expires: int) -> str:
+    message = f"{user_id}:{file_id}:{expires}".encode()
+    return hmac.new(_media_secret(), message, hashlib.sha256).hexdigest()
+
+def media_url(user_id: int, file_id: int, ttl: int = TOKEN_TTL_SECONDS) -> str:
+    """Signed URL a page can hand to st.video / st.audio / a download link"""
+    expires = int(time.time()) + ttl
+    signature = sign_media_token(user_id, file_id, expires)
+    return f"{MEDIA_BASE_URL}/media/{file_id}?user={user_id}&expires={expires}&sig={signature}"
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range Range header into [start, end) offsets.
+
+    Returns None when the whole file should be sent (no header, or a
+    multi-range request), and raises ValueError when the range can't be
+    satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    elif last:
+        start, end = max(size - int(last), 0), size
+    else:
+        return None
+
+    if start >= size or start >= end:
+        raise ValueError(f"Unsatisfiable range {header!r} for {size} bytes")
+    return start, end
+
+def content_disposition(filename: str, disposition: str = "inline") -> str:
+    """Content-Disposition value that is safe for any stored filename.
+
+    Old clients read the ASCII-only filename; others use the RFC 5987
+    filename* form, which carries the exact UTF-8 name.
+    """
+    fallback = "".join(
+        c for c in filename.encode("ascii", "ignore").decode() if c.isprintable() and c not in '"\\'
+    ).strip() or "download"
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+async def _blocking(func, *args):
+    """Run a blocking call (SQLite, blob files) on the IOLoop's thread pool"""
+    return await tornado.ioloop.IOLoop.current().run_in_executor(None, func, *args)
+
+class MediaHandler(tornado.web.RequestHandler):
+    """GET/HEAD /media/<file_id> with Range, ETag and conditional requests"""
+
+    def _authorized_file(self, file_id: int) -> Optional[dict]:
+        try:
+            user_id = int(self.get_query_argument("user"))
+            expires = int(self.get_query_argument("expires"))
+        except (tornado.web.MissingArgumentError, ValueError):
+            return None
+        signature = self.get_query_argument("sig", "")
+        expected = sign_media_token(user_id, file_id, expires)
+        if expires < time.time() or not hmac.compare_digest(signature, expected):
+            return None
+        if not database.user_can_access_file(user_id, file_id):
+            return None
+        return database.get_file(file_id)
+
+    async def get(self, file_id: str):
+        await self._serve(int(file_id), include_body=True)
+
+    async def head(self, file_id: str):
+        await self._serve(int(file_id), include_body=False)
+
+    async def _serve(self, file_id: int, include_body: bool):
+        # Lookups and reads run off the IOLoop, so one slow disk never stalls other viewers
+        file = await _blocking(self._authorized_file, file_id)
+        if not file or not file["content_hash"]:
+            raise tornado.web.HTTPError(404)
+
+        store = database.get_blob_store()
+        content_hash, codec = file["content_hash"], file["codec"]
+        if not await _blocking(store.exists, content_hash, codec):
+            raise tornado.web.HTTPError(404)
+        # Lengths and ranges refer to the original bytes, whatever the codec
+        size = file["file_size"]
+
+        # Payloads are content-addressed, so the hash is a strong validator
+        etag = f'"{content_hash}"'
+        content_type = mimetypes.guess_type(file["filename"])[0] or "application/octet-stream"
+        self.set_header("ETag", etag)
+        self.set_header("Accept-Ranges", "bytes")
+        self.set_header("Cache-Control", "private, max-age=3600")
+        self.set_header("Content-Type", content_type)
+        self.set_header("Content-Disposition", content_disposition(file["filename"]))
+
+        if_none_match = self.request.headers.get("If-None-Match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            self.set_status(304)
+            return
+
+        range_header = self.request.headers.get("Range")
+        if_range = self.request.headers.get("If-Range")
+        if if_range and if_range.strip() != etag:
+            range_header = None
+
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            self.set_status(416)
+            self.set_header("Content-Range", f"bytes */{size}")
+            return
+
+        start, end = byte_range or (0, size)
+        if byte_range:
+            self.set_status(206)
+            self.set_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        self.set_header("Content-Length", end - start)
+
+        if not include_body:
+            return
+        chunks = store.iter_chunks(content_hash, start, end, chunk_size=STREAM_CHUNK_SIZE, codec=codec)
+        try:
+            while True:
+                chunk = await _blocking(next, chunks, None)
+                if chunk is None:
+                    break
+                self.write(chunk)
+                # Wait for the socket to drain so each viewer holds one chunk at a time
+                await self.flush()
+        finally:
+            chunks.close()
+
+def make_app() -> tornado.web.Application:
+    return tornado.web.Application([
+        (r"/media/(\d+)", MediaHandler),
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve stored lecture files over HTTP with Range support")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--address", default="0.0.0.0")
+    args = parser.parse_args()
+
+    database.init_db()
+    make_app().listen(args.port, address=args.address)
+    print(f"Media server listening on {args.address}:{args.port}")
+    tornado.ioloop.IOLoop.current().start()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# page_profiler.py
+"""Opt-in render profiling for the pages dispatched by main.handle_navigation.
+
+With profiling on (SMART_CLASSROOM_PAGE_PROFILING=1, or set_enabled() from
+the Admin Analytics page) every page call is timed: wall time, CPU time of
+the rendering thread and, when instrumentation.py is installed, the time
+spent inside database.py. Timings are aggregated per page across all
+sessions of the process into a latency histogram plus a window of recent
+samples for p50/p95/p99.
+
+Independently, an admin can ask for a cProfile capture of a page's next
+render (request_capture); whichever session renders it next runs under the
+profiler once, and the pstats output is kept for download.
+
+When profiling is off and no capture is pending, run_page() is one flag
+check and a direct call.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import threading
+import time
+
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import instrumentation
+
+ENABLED = os.environ.get("SMART_CLASSROOM_PAGE_PROFILING", "0") == "1"
+# Upper bounds of the render time histogram buckets (ms); the last bucket is open
+PAGE_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+# Recent renders per page kept for percentiles
+PAGE_SAMPLES = 1000
+MAX_CAPTURES = 10
+CAPTURE_TOP_FUNCTIONS = 40
+
+class PageStats:
+    """Render timings of one page"""
+
+    def __init__(self):
+        self.renders = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.cpu_ms = 0.0
+        self.db_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(PAGE_BUCKETS_MS) + 1)
+        self.samples: deque = deque(maxlen=PAGE_SAMPLES)
+
+    def record(self, wall_ms: float, cpu_ms: float, db_ms: float, error: bool):
+        self.renders += 1
+        self.errors += error
+        self.total_ms += wall_ms
+        self.cpu_ms += cpu_ms
+        self.db_ms += db_ms
+        self.max_ms = max(self.max_ms, wall_ms)
+        self.histogram[bisect_left(PAGE_BUCKETS_MS, wall_ms)] += 1
+        self.samples.append(wall_ms)
+
+    def to_dict(self) -> Dict:
+        ordered = sorted(self.samples)
+
+        def percentile(q: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))], 3)
+
+        renders = self.renders or 1
+        return {
+            "renders": self.renders,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / renders, 3),
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "max_ms": round(self.max_ms, 3),
+            "cpu_ms": round(self.cpu_ms / renders, 3),
+            "db_ms": round(self.db_ms / renders, 3),
+            "histogram": list(self.histogram),
+        }
+
+_page_names: List[str] = []
+_pages: Dict[str, PageStats] = {}
+_pending_captures: Dict[str, str] = {}  # page -> who asked
+_captures: deque = deque(maxlen=MAX_CAPTURES)
+_lock = threading.Lock()
+_capture_lock = threading.Lock()
+_enabled = ENABLED
+
+def register_pages(names: List[str]):
+    """Page names offered for captures on the Admin Analytics page"""
+    _page_names[:] = names
+
+def page_names() -> List[str]:
+    return list(_page_names)
+
+def is_enabled() -> bool:
+    return _enabled
+
+def set_enabled(enabled: bool):
+    """Turn render timing on or off for every session of this process"""
+    global _enabled
+    _enabled = enabled
+
+def request_capture(page: str, requested_by: str = ""):
+    """Run the next render of page under cProfile"""
+    with _lock:
+        _pending_captures[page] = requested_by
+
+def _take_capture_request(page: str) -> Optional[str]:
+    # One capture at a time: newer Pythons allow a single active profiler per process
+    if page not in _pending_captures or not _capture_lock.acquire(blocking=False):
+        return None
+    with _lock:
+        requested_by = _pending_captures.pop(page, None)
+    if requested_by is None:
+        _capture_lock.release()
+    return requested_by
+
+def _record(page: str, wall_ms: float, cpu_ms: float, db_ms: float, error: bool):
+    with _lock:
+        stats = _pages.get(page)
+        if stats is None:
+            stats = _pages[page] = PageStats()
+        stats.record(wall_ms, cpu_ms, db_ms, error)
+
+def _save_capture(page: str, requested_by: str, profile: cProfile.Profile, wall_ms: float, cpu_ms: float):
+    profile.create_stats()
+    # The same format cProfile's dump_stats writes, for snakeviz/pstats;
+    # taken first because pstats.Stats(profile) empties profile.stats
+    dump = marshal.dumps(profile.stats)
+    report = io.StringIO()
+    pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(CAPTURE_TOP_FUNCTIONS)
+    with _lock:
+        _captures.append({
+            "page": page,
+            "requested_by": requested_by,
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "wall_ms": round(wall_ms, 3),
+            "cpu_ms": round(cpu_ms, 3),
+            "report": report.getvalue(),
+            "pstats": dump,
+        })
+
+def run_page(page: str, render: Callable[[], None]):
+    """Render a page, timing it (and profiling it) if asked to"""
+    capture_for = _take_capture_request(page) if _pending_captures else None
+    if not _enabled and capture_for is None:
+        return render()
+
+    profile = cProfile.Profile() if capture_for is not None else None
+    db_before = instrumentation.thread_db_ms()
+    cpu_started = time.thread_time()
+    started = time.perf_counter()
+    error = False
+    try:
+        if profile is not None:
+            profile.enable()
+        return render()
+    except Exception:
+        error = True
+        raise
+    finally:
+        if profile is not None:
+            profile.disable()
+        wall_ms = (time.perf_counter() - started) * 1000
+        cpu_ms = (time.thread_time() - cpu_started) * 1000
+        if _enabled:
+            _record(page, wall_ms, cpu_ms, instrumentation.thread_db_ms() - db_before, error)
+        if profile is not None:
+            try:
+                _save_capture(page, capture_for, profile, wall_ms, cpu_ms)
+            finally:
+                _capture_lock.release()
+
+def page_stats() -> Dict[str, Dict]:
+    """Aggregated render timings per page"""
+    with _lock:
+        return {page: stats.to_dict() for page, stats in _pages.items()}
+
+def pending_captures() -> Dict[str, str]:
+    with _lock:
+        return dict(_pending_captures)
+
+def captures() -> List[Dict]:
+    """Finished cProfile captures, oldest first"""
+    with _lock:
+        return list(_captures)
+
+def reset():
+    """Forget page timings and captures"""
+    with _lock:
+        _pages.clear()
+        _captures.clear()
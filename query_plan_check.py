@@ -0,0 +1,212 @@
+# query_plan_check.py
+"""Query-plan regression check for database.py
+
+Builds a throwaway database with init_db(), calls each data-access function
+with a trace callback attached, and runs EXPLAIN QUERY PLAN on every statement
+it issued. The trace only shows top-level statements, so the body of every
+trigger in the schema is checked on its own as well. Any full table scan or temp B-tree sort outside FULL_SCAN_ALLOWED is reported and
+the script exits non-zero. Foreign key lookups don't show up in query plans,
+so every foreign key must also have an index on its child column.
+
+    python query_plan_check.py
+"""
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+import database
+
+# Functions that list a whole table on purpose
+FULL_SCAN_ALLOWED = {"get_all_users", "get_all_sections"}
+
+# (function name, args) exercised against the seeded database
+HOT_CALLS = [
+    ("get_user", ("student1",)),
+    ("get_all_users", ()),
+    ("get_all_sections", ()),
+    ("get_users_with_sections", ()),
+    ("get_teacher_sections", (2,)),
+    ("get_student_sections", (3,)),
+    ("get_teacher_section_students", (2,)),
+    ("get_students_by_section", (1,)),
+    ("get_files_by_type", ("pdf",)),
+    ("get_student_files", (3,)),
+    ("get_section_files", (1,)),
+    ("get_section_files", (1, "pdf")),
+    ("get_student_section_files", (3, "pdf")),
+    ("get_file", (1,)),
+    ("user_can_access_file", (3, 1)),
+    ("get_student_grades", (3,)),
+    ("get_student_subject_grades", (3,)),
+    ("get_section_grades", (1,)),
+    ("get_section_grade_trends", (1, True)),
+    ("get_student_grade_trends", (3,)),
+    ("update_grade", (1, 75.0)),
+    ("get_assignments_by_section", (1,)),
+    ("get_messages", (1,)),
+    ("get_messages_page", (1,)),
+    ("get_messages_page", (1, 20, 100)),
+    ("get_messages_since", (1, 0)),
+    ("delete_message", (1, 3, "Student")),
+    ("get_unread_badges", (3,)),
+    ("mark_section_read", (3, 1)),
+    ("get_section_subjects", (1,)),
+    ("delete_subject", (1, 2)),
+    ("get_section_topics", (1,)),
+    ("get_topic_recommendations", (1,)),
+    ("search", ([1], "hello")),
+    ("search", ([1], "notes")),
+    ("claim_jobs", ("plan-check", 5)),
+    ("heartbeat_jobs", ("plan-check", [1])),
+    ("get_thumbnails", ([1],)),
+    ("get_page_thumbnails", (1,)),
+    # Writes that fire the summary, search and unread counter triggers
+    ("add_user", ("student2", "pw", "Student")),
+    ("assign_section_to_student", (4, 1)),
+    ("add_grade", (4, "Maths", 70.0)),
+    ("save_message", (1, 4, "Hi")),
+    ("create_assignment", ("Homework 2", "", "2030-01-08", 1)),
+    ("add_file", ("slides.pdf", "pdf", b"%PDF-1.4 slides", 2, 1)),
+    ("add_video_recommendation", (1, "https://example.com/w", 4, "Recap")),
+    ("delete_user", (4,)),
+    ("delete_file", (1, 2)),
+]
+
+PLAN_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+
+# FTS5 reads its own shadow tables (e.g. messages_fts_config) from triggers
+FTS_SHADOW_MARKER = "_fts_"
+# An FTS5 MATCH is an index lookup, though the plan calls it SCAN ... VIRTUAL TABLE
+FTS_MATCH_PLAN = re.compile(r"^SCAN \S+ VIRTUAL TABLE INDEX \d+:\S*M")
+_TRIGGER_BODY = re.compile(r"\bBEGIN\b(.*)\bEND\s*$", re.IGNORECASE | re.DOTALL)
+_TRIGGER_ROW_REF = re.compile(r"\b(?:NEW|OLD)\.\w+", re.IGNORECASE)
+# bm25 ranking sorts the (bounded) candidate set; no index can order by it
+TEMP_BTREE_ALLOWED = {"search"}
+
+def seed_database():
+    """Insert one row of everything the hot calls need"""
+    database.add_user("teacher1", "pw", "Teacher")
+    database.add_user("student1", "pw", "Student")
+    database.add_section("Section A")
+    database.assign_section_to_teacher(2, 1)
+    database.assign_section_to_student(3, 1)
+    database.add_file("notes.pdf", "pdf", b"%PDF-1.4", 2, 1)
+    database.add_grade(3, "Maths", 88.0)
+    database.create_assignment("Homework 1", "", "2030-01-01", 1)
+    database.save_message(1, 3, "Hello")
+    database.create_subject("Maths", 1, 2)
+    database.create_topic("Algebra", 1, 2)
+    database.add_video_recommendation(1, "https://example.com/v", 3, "Intro")
+
+def capture_statements(calls) -> list:
+    """Call each function and return (function name, SQL) for every statement run"""
+    captured = []
+    current = {"name": None}
+
+    def trace(sql):
+        if current["name"] and sql.lstrip().upper().startswith(PLAN_STATEMENTS) \
+                and FTS_SHADOW_MARKER not in sql:
+            captured.append((current["name"], sql))
+
+    def hook(conn):
+        conn.set_trace_callback(trace)
+
+    database.close_all_connections()
+    database.clear_cache()
+    database.add_connection_hook(hook)
+    try:
+        for name, args in calls:
+            current["name"] = name
+            getattr(database, name)(*args)
+            current["name"] = None
+    finally:
+        database.remove_connection_hook(hook)
+        database.close_all_connections()
+    return captured
+
+def trigger_statements(conn) -> list:
+    """(trigger, SQL, parameter count) of each statement in every trigger body.
+
+    NEW/OLD columns become parameters, so the statement can be explained on its own.
+    """
+    statements = []
+    for row in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name").fetchall():
+        statement = ""
+        for line in _TRIGGER_BODY.search(row["sql"]).group(1).splitlines(keepends=True):
+            statement += line
+            if sqlite3.complete_statement(statement):
+                if statement.lstrip().upper().startswith(PLAN_STATEMENTS):
+                    sql, placeholders = _TRIGGER_ROW_REF.subn("?", statement.strip())
+                    statements.append((row["name"], sql, placeholders))
+                statement = ""
+    return statements
+
+def unindexed_foreign_keys(conn) -> list:
+    """(table, column) of foreign keys whose child column doesn't lead any index"""
+    missing = []
+    tables = [row["name"] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    for table in tables:
+        leading = {info["name"] for info in conn.execute(f"PRAGMA table_info({table})") if info["pk"] == 1}
+        for index in conn.execute(f"PRAGMA index_list({table})").fetchall():
+            first = conn.execute(f"PRAGMA index_info({index['name']})").fetchone()
+            if first is not None:
+                leading.add(first["name"])
+        for key in conn.execute(f"PRAGMA foreign_key_list({table})"):
+            if key["from"] not in leading:
+                missing.append((table, key["from"]))
+    return missing
+
+def plan_problems(conn, sql: str, allow_temp_btree: bool = False, placeholders: int = 0) -> list:
+    """Return the plan lines that indicate a full scan or a temp B-tree"""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", (None,) * placeholders).fetchall()
+    return [
+        row["detail"] for row in plan
+        if (row["detail"].startswith("SCAN ") and not FTS_MATCH_PLAN.match(row["detail"]))
+        or ("TEMP B-TREE" in row["detail"] and not allow_temp_btree)
+    ]
+
+def check_query_plans() -> list:
+    """Run every hot call against a fresh database and collect plan regressions"""
+    original_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "plan_check.db")
+        try:
+            database.init_db()
+            seed_database()
+            statements = capture_statements(HOT_CALLS)
+
+            failures = []
+            conn = database.get_db_connection()
+            try:
+                for name, sql in statements:
+                    if name in FULL_SCAN_ALLOWED:
+                        continue
+                    for detail in plan_problems(conn, sql, name in TEMP_BTREE_ALLOWED):
+                        failures.append((name, detail, " ".join(sql.split())))
+                for trigger, sql, placeholders in trigger_statements(conn):
+                    for detail in plan_problems(conn, sql, placeholders=placeholders):
+                        failures.append((trigger, detail, " ".join(sql.split())))
+                for table, column in unindexed_foreign_keys(conn):
+                    failures.append((f"{table}.{column}", "foreign key without an index", ""))
+            finally:
+                conn.close()
+        finally:
+            database.close_all_connections()
+            database.DB_PATH = original_path
+    return failures
+
+def main() -> int:
+    failures = check_query_plans()
+    for name, detail, sql in failures:
+        print(f"{name}: {detail}\n    {sql}")
+    if failures:
+        print(f"{len(failures)} query plan regression(s)")
+        return 1
+    print(f"All {len(HOT_CALLS)} hot calls and every trigger use indexed plans; every foreign key is indexed")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,23 @@
 # reset_db.py
 import os
+import shutil
+
+import blob_store
 import database
 
-if os.path.exists("smart_classroom.db"):
-    os.remove("smart_classroom.db")
+database.close_all_connections()
+removed = False
+for suffix in ("", "-wal", "-shm"):
+    if os.path.exists(database.DB_PATH + suffix):
+        os.remove(database.DB_PATH + suffix)
+        removed = True
+# Payloads left behind would be orphaned, and new uploads would dedupe against them
+blob_dir = blob_store.blob_dir_for(database.DB_PATH)
+if os.path.isdir(blob_dir):
+    shutil.rmtree(blob_dir, ignore_errors=True)
+    removed = True
+if removed:
     print("Old database removed")
     
 database.init_db()
-print("New database created with updated schema")
\ No newline at end of file
+print("New database created with updated schema")
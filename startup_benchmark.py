@@ -0,0 +1,99 @@
+# startup_benchmark.py
+"""Cold-start import cost of the login page and of each page in main.NAV_CONFIG.
+
+Every measurement runs in a fresh interpreter against a throwaway database.
+"login" imports main (what a new session pays before the login form shows);
+each page then imports main and loads the page's module, and is reported
+both in total and on top of the login cost. RSS is the peak resident set
+size of that interpreter.
+
+    python startup_benchmark.py
+    python startup_benchmark.py --repeat 5 --json startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in the child; prints one JSON line. A page target of "" measures login only.
+_PROBE = r"""
+import json, resource, sys, time
+started = time.perf_counter()
+result = {}
+try:
+    import main
+    result["login_seconds"] = time.perf_counter() - started
+    if sys.argv[1]:
+        main.load_page(sys.argv[1])
+except Exception as e:
+    result["error"] = f"{type(e).__name__}: {e}"
+result["seconds"] = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+result["rss_mb"] = rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+result["modules"] = len(sys.modules)
+print(json.dumps(result))
+"""
+
+def probe(target: str, db_dir: str) -> Dict:
+    env = dict(os.environ,
+               SMART_CLASSROOM_DB=os.path.join(db_dir, "startup.db"),
+               SMART_CLASSROOM_BLOBS=os.path.join(db_dir, "file_store"))
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE, target],
+        cwd=HERE, env=env, capture_output=True, text=True,
+    )
+    lines = completed.stdout.strip().splitlines()
+    if not lines:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "no output"}
+    return json.loads(lines[-1])
+
+def page_targets() -> Dict[str, str]:
+    """Unique page targets from main.NAV_CONFIG, labelled by their first menu entry"""
+    sys.path.insert(0, HERE)
+    os.environ.setdefault("SMART_CLASSROOM_DB", os.path.join(tempfile.mkdtemp(), "startup.db"))
+    import main
+
+    targets = {}
+    for role, pages in main.NAV_CONFIG.items():
+        for label, target in pages.items():
+            targets.setdefault(target, f"{role} / {label}")
+    return {label: target for target, label in targets.items()}
+
+def run_benchmark(repeat: int = 3) -> List[Dict]:
+    """Best-of-repeat time and peak RSS for login and every page"""
+    results = []
+    with tempfile.TemporaryDirectory() as db_dir:
+        probe("", db_dir)  # create and migrate the throwaway database once
+        for label, target in [("login", "")] + list(page_targets().items()):
+            runs = [probe(target, db_dir) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run["seconds"] if "seconds" in run else float("inf"))
+            results.append({"page": label, "target": target or "main", **best})
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold-start import time and RSS per page")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per page (best is kept)")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.repeat)
+    login = results[0]
+    print(f"{'page':<44} {'seconds':>8} {'+login':>8} {'RSS MB':>8} {'modules':>8}")
+    for r in results:
+        extra = r["seconds"] - login["seconds"] if "seconds" in r and "seconds" in login else float("nan")
+        print(f"{r['page'][:44]:<44} {r.get('seconds', float('nan')):>8.2f} {extra:>8.2f} "
+              f"{r.get('rss_mb', float('nan')):>8.1f} {r.get('modules', 0):>8}"
+              + (f"  ({r['error']})" if "error" in r else ""))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+# synthetic_data.py
+"""Seeded synthetic classroom data for benchmarks and load tests.
+
+Fills a database with sections, teachers, students, subjects, grades spread
+over the last year, chat messages, assignments, recommendation topics and
+uploaded files of configurable sizes. The same scale and seed always give
+the same rows. Rows are written with executemany() in batched transactions
+through the normal schema, so triggers keep the grade summaries, search
+index and unread counters consistent. Section memberships go in last: new
+members start caught up on chat, so history never fans out to counters.
+
+    python synthetic_data.py bench.db --scale 100k
+    python synthetic_data.py bench.db --scale 1k --students 500 --file-size 4096 1048576
+
+Scales name the size of the largest tables (grades and messages):
+    1k      4 sections, 80 students, 1,000 grades and messages
+    100k    40 sections, 4,000 students, 100,000 grades and messages
+    1m      250 sections, 40,000 students, 1,000,000 grades and messages
+"""
+import argparse
+import random
+import sys
+import time
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import database
+
+SCALES = {
+    "1k": {"sections": 4, "teachers": 4, "students": 80, "subjects_per_section": 4,
+           "grades": 1_000, "messages": 1_000, "assignments": 20, "files": 20, "topics_per_section": 2},
+    "100k": {"sections": 40, "teachers": 30, "students": 4_000, "subjects_per_section": 5,
+             "grades": 100_000, "messages": 100_000, "assignments": 400, "files": 200, "topics_per_section": 3},
+    "1m": {"sections": 250, "teachers": 150, "students": 40_000, "subjects_per_section": 6,
+           "grades": 1_000_000, "messages": 1_000_000, "assignments": 2_500, "files": 1_000, "topics_per_section": 3},
+}
+DEFAULT_SEED = 42
+# Uploaded payload sizes are drawn log-uniformly from this range (bytes)
+FILE_SIZES = (4 * 1024, 256 * 1024)
+# (file_type, extension, share of uploads)
+FILE_TYPES = (("pdf", "pdf", 0.6), ("video", "mp4", 0.2), ("text", "txt", 0.2))
+# Share of students enrolled in a second section
+SECOND_SECTION_SHARE = 0.2
+HISTORY_DAYS = 365
+BATCH_SIZE = 50_000
+PASSWORD = "pw"
+
+SUBJECTS = ("Mathematics", "Physics", "Chemistry", "Biology", "English", "History",
+            "Geography", "Computer Science", "Economics", "Art")
+WORDS = ("the", "lecture", "notes", "assignment", "due", "tomorrow", "please", "check", "chapter",
+         "exam", "question", "answer", "thanks", "project", "group", "deadline", "slides", "lab",
+         "report", "quiz", "homework", "revision", "problem", "solution", "graph", "theorem")
+
+def _batches(rows, size: int = BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _insert(conn, sql: str, rows) -> int:
+    count = 0
+    for batch in _batches(rows):
+        conn.execute("BEGIN")
+        conn.executemany(sql, batch)
+        conn.commit()
+        count += len(batch)
+    return count
+
+def _sentence(rng: random.Random, low: int = 3, high: int = 16) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+def _payload(rng: random.Random, file_type: str, size: int) -> bytes:
+    if file_type == "video":
+        return rng.randbytes(size)
+    text = []
+    length = 0
+    while length < size:
+        line = _sentence(rng, 8, 20) + "\n"
+        text.append(line)
+        length += len(line)
+    body = "".join(text).encode()[:size]
+    return b"%PDF-1.4\n" + body[9:] if file_type == "pdf" else body
+
+def generate(db_path: str, scale: str = "1k", seed: int = DEFAULT_SEED,
+             file_sizes: Tuple[int, int] = FILE_SIZES, **overrides) -> Dict[str, int]:
+    """Fill a new database with synthetic data; returns rows written per table"""
+    config = dict(SCALES[scale], **{k: v for k, v in overrides.items() if v is not None})
+    rng = random.Random(seed)
+    database.DB_PATH = db_path
+    database.init_db()
+    conn = database.get_db_connection()
+    counts = {}
+    now = datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=HISTORY_DAYS)
+
+    try:
+        # Users: teachers first, then students (the default admin is id 1)
+        users = [(f"teacher{n}", PASSWORD, "Teacher") for n in range(config["teachers"])]
+        users += [(f"student{n}", PASSWORD, "Student") for n in range(config["students"])]
+        first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users").fetchone()[0]
+        counts["users"] = _insert(conn, "INSERT INTO users (id, username, password, role) VALUES (?, ?, ?, ?)",
+                                  ((first_id + i,) + user for i, user in enumerate(users)))
+        teacher_ids = list(range(first_id, first_id + config["teachers"]))
+        student_ids = list(range(first_id + config["teachers"], first_id + len(users)))
+
+        first_section = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM sections").fetchone()[0]
+        section_ids = list(range(first_section, first_section + config["sections"]))
+        counts["sections"] = _insert(conn, "INSERT INTO sections (id, section_name) VALUES (?, ?)",
+                                     ((sid, f"Section {sid}") for sid in section_ids))
+
+        # Memberships are decided now and inserted at the end
+        section_teachers = {sid: [teacher_ids[i % len(teacher_ids)]] for i, sid in enumerate(section_ids)}
+        for teacher in teacher_ids:
+            if rng.random() < 0.5:
+                extra = rng.choice(section_ids)
+                if teacher not in section_teachers[extra]:
+                    section_teachers[extra].append(teacher)
+        student_sections = {student: [section_ids[i % len(section_ids)]] for i, student in enumerate(student_ids)}
+        for student in student_ids:
+            if len(section_ids) > 1 and rng.random() < SECOND_SECTION_SHARE:
+                extra = rng.choice(section_ids)
+                if extra not in student_sections[student]:
+                    student_sections[student].append(extra)
+        section_members = {sid: list(teachers) for sid, teachers in section_teachers.items()}
+        for student, sections in student_sections.items():
+            for sid in sections:
+                section_members[sid].append(student)
+
+        section_subjects = {
+            sid: rng.sample(SUBJECTS, min(config["subjects_per_section"], len(SUBJECTS))) for sid in section_ids
+        }
+        counts["subjects"] = _insert(
+            conn, "INSERT INTO subjects (subject_name, section_id, created_by) VALUES (?, ?, ?)",
+            ((subject, sid, section_teachers[sid][0]) for sid in section_ids for subject in section_subjects[sid])
+        )
+
+        # Grades: each student has a level and a drift, so trends are there to find
+        profiles = {student: (rng.gauss(72, 10), rng.gauss(0, 1.5)) for student in student_ids}
+
+        def grade_rows():
+            for _ in range(config["grades"]):
+                student = rng.choice(student_ids)
+                subject = rng.choice(section_subjects[rng.choice(student_sections[student])])
+                day = rng.randrange(HISTORY_DAYS)
+                level, drift = profiles[student]
+                grade = min(100.0, max(0.0, rng.gauss(level + drift * day / 30, 8)))
+                yield student, subject, round(grade, 1), (start + timedelta(days=day)).date().isoformat()
+        counts["grades"] = _insert(
+            conn, "INSERT INTO grades (student_id, subject, grade, assignment_date) VALUES (?, ?, ?, ?)", grade_rows()
+        )
+
+        # Messages in time order, so ids and timestamps agree
+        step = HISTORY_DAYS * 86400 / max(config["messages"], 1)
+
+        def message_rows():
+            for n in range(config["messages"]):
+                sid = rng.choice(section_ids)
+                sent = start + timedelta(seconds=n * step)
+                yield sid, rng.choice(section_members[sid]), _sentence(rng), sent.strftime("%Y-%m-%d %H:%M:%S")
+        counts["messages"] = _insert(
+            conn, "INSERT INTO messages (section_id, user_id, content, timestamp) VALUES (?, ?, ?, ?)", message_rows()
+        )
+
+        def assignment_rows():
+            for n in range(config["assignments"]):
+                created = start + timedelta(days=rng.randrange(HISTORY_DAYS))
+                yield (f"Assignment {n + 1}", _sentence(rng), (created + timedelta(days=14)).date().isoformat(),
+                       rng.choice(section_ids), created.strftime("%Y-%m-%d %H:%M:%S"))
+        counts["assignments"] = _insert(
+            conn, "INSERT INTO assignments (title, description, due_date, section_id, created_at) VALUES (?, ?, ?, ?, ?)",
+            assignment_rows()
+        )
+
+        topics = [(f"{subject} topic", sid, section_teachers[sid][0])
+                  for sid in section_ids for subject in section_subjects[sid][:config["topics_per_section"]]]
+        counts["recommendation_topics"] = _insert(
+            conn, "INSERT INTO recommendation_topics (topic_name, section_id, created_by) VALUES (?, ?, ?)", topics
+        )
+        topic_ids = [row[0] for row in conn.execute("SELECT id FROM recommendation_topics").fetchall()]
+        counts["video_recommendations"] = _insert(
+            conn, "INSERT INTO video_recommendations (topic_id, video_url, added_by, title) VALUES (?, ?, ?, ?)",
+            ((topic, f"https://www.youtube.com/watch?v={rng.randbytes(6).hex()}", rng.choice(student_ids), _sentence(rng, 2, 6))
+             for topic in topic_ids for _ in range(3))
+        )
+    finally:
+        conn.close()
+
+    # Files go through the normal upload path (blob store, codecs, job queue)
+    low, high = file_sizes
+    types, extensions, weights = zip(*FILE_TYPES)
+    counts["files"] = 0
+    for n in range(config["files"]):
+        index = rng.choices(range(len(types)), weights)[0]
+        size = int(low * (high / low) ** rng.random()) if high > low else low
+        sid = rng.choice(section_ids)
+        file_id = database.add_file_stream(
+            f"upload_{n + 1}.{extensions[index]}", types[index], _payload(rng, types[index], size),
+            rng.choice(section_teachers[sid]), sid,
+        )
+        counts["files"] += file_id is not None
+
+    conn = database.get_db_connection()
+    try:
+        counts["teacher_sections"] = _insert(
+            conn, "INSERT INTO teacher_sections (teacher_id, section_id) VALUES (?, ?)",
+            ((teacher, sid) for sid, teachers in section_teachers.items() for teacher in teachers)
+        )
+        counts["student_sections"] = _insert(
+            conn, "INSERT INTO student_sections (student_id, section_id) VALUES (?, ?)",
+            ((student, sid) for student, sections in student_sections.items() for sid in sections)
+        )
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+    database.clear_cache()
+    return counts
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic classroom database")
+    parser.add_argument("db_path", help="Database file to create (must not exist yet)")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--file-size", type=int, nargs=2, metavar=("MIN", "MAX"), default=FILE_SIZES,
+                        help="Range of uploaded payload sizes in bytes")
+    for name in SCALES["1k"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=None, dest=name,
+                            help=f"Override the scale's {name}")
+    args = parser.parse_args(argv)
+
+    import os
+    if os.path.exists(args.db_path):
+        print(f"{args.db_path} already exists; synthetic data goes into a new database")
+        return 1
+
+    started = time.perf_counter()
+    overrides = {name: getattr(args, name) for name in SCALES["1k"]}
+    counts = generate(args.db_path, args.scale, args.seed, tuple(args.file_size), **overrides)
+    for table, count in counts.items():
+        print(f"{table}: {count}")
+    print(f"Generated in {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
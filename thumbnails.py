@@ -0,0 +1,80 @@
+# thumbnails.py
+"""Render PDF page thumbnails for the thumbnail cache.
+
+Rendering runs in job_worker.py: uploads queue a job that rasterizes the
+first page of each new PDF payload once, and pages asking for every page
+(database.get_page_thumbnails) queue a low-resolution pass over the whole
+document. Pages read the results with database.get_thumbnails(file_ids).
+
+    st.image(database.get_thumbnail(file_id)["data"])
+"""
+import io
+
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+import database
+
+if TYPE_CHECKING:
+    import PIL.Image
+
+PREVIEW_WIDTH = 320
+PAGE_WIDTH = 120
+WEBP_QUALITY = 70
+# Rendered pages written to the cache per transaction
+SAVE_BATCH_SIZE = 50
+
+_WIDTHS = {database.THUMBNAIL_PREVIEW: PREVIEW_WIDTH, database.THUMBNAIL_PAGE: PAGE_WIDTH}
+
+def render_pages(path: str, width: int, max_pages: Optional[int] = None) -> Iterator[Tuple[int, "PIL.Image.Image"]]:
+    """Yield (page number, image) for a PDF, each page scaled to the given width"""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        count = len(pdf) if max_pages is None else min(len(pdf), max_pages)
+        for index in range(count):
+            page = pdf[index]
+            try:
+                bitmap = page.render(scale=width / page.get_width())
+                yield index + 1, bitmap.to_pil().convert("RGB")
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+
+def encode_image(image) -> Tuple[str, bytes]:
+    """Compress an image as WebP, or PNG when Pillow was built without WebP"""
+    from PIL import features
+
+    out = io.BytesIO()
+    if features.check("webp"):
+        image.save(out, format="WEBP", quality=WEBP_QUALITY, method=4)
+        return "webp", out.getvalue()
+    image.save(out, format="PNG", optimize=True)
+    return "png", out.getvalue()
+
+def render_thumbnails(path: str, variant: str = database.THUMBNAIL_PREVIEW) -> Iterator[Dict]:
+    """Yield cache entries (page_number, format, width, height, data) for a PDF file"""
+    max_pages = 1 if variant == database.THUMBNAIL_PREVIEW else None
+    for page_number, image in render_pages(path, _WIDTHS[variant], max_pages):
+        image_format, data = encode_image(image)
+        yield {"page_number": page_number, "format": image_format,
+               "width": image.width, "height": image.height, "data": data}
+
+def render_thumbnail_job(payload: Dict):
+    """Job handler: render and cache one variant of a PDF payload's thumbnails"""
+    content_hash = payload["content_hash"]
+    variant = payload.get("variant", database.THUMBNAIL_PREVIEW)
+    store = database.get_blob_store()
+    if not store.exists(content_hash):
+        return  # deleted before we got to it
+
+    batch: List[Dict] = []
+    with store.local_path(content_hash) as path:
+        for entry in render_thumbnails(path, variant):
+            batch.append(entry)
+            if len(batch) >= SAVE_BATCH_SIZE:
+                database.save_thumbnails(content_hash, variant, batch)
+                batch = []
+    if batch:
+        database.save_thumbnails(content_hash, variant, batch)
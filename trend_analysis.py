@@ -0,0 +1,166 @@
+# trend_analysis.py
+"""Nightly grade trend and at-risk detection over the whole grades history.
+
+Loads every grade in one columnar pass, groups them by (student, subject)
+and fits each series' least-squares slope of grade against assignment date
+with np.bincount sums, so there is no Python loop over students. A series is
+flagged
+
+    declining  at least MIN_POINTS grades over MIN_SPAN_DAYS or more, and the
+               fitted slope is at or below DECLINE_PER_30_DAYS
+    outlier    the student's mean in the subject is OUTLIER_Z or more standard
+               deviations below the subject's mean over all students
+
+Results replace the grade_trends table, read by
+database.get_section_grade_trends() and database.get_student_grade_trends().
+Schedule it nightly, e.g. from cron:
+
+    15 2 * * *  cd /app && python trend_analysis.py
+"""
+import argparse
+import sys
+import time
+import warnings
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import database
+
+MIN_POINTS = 3
+MIN_SPAN_DAYS = 14
+DECLINE_PER_30_DAYS = -3.0
+OUTLIER_Z = 2.0
+
+def load_grade_series(db_path: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Every dated grade as parallel arrays: student_id, subject code, day, grade, plus the subject names"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = database.query_arrow(
+        "SELECT student_id, subject, assignment_date, grade FROM grades WHERE assignment_date IS NOT NULL",
+        column_types={"student_id": "int64", "subject": "string", "assignment_date": "date32", "grade": "double"},
+        db_path=db_path,
+    )
+    subjects = pc.dictionary_encode(table.column("subject").combine_chunks())
+    return {
+        "student_id": table.column("student_id").to_numpy(),
+        "subject": subjects.indices.to_numpy(zero_copy_only=False).astype(np.int64),
+        "day": table.column("assignment_date").cast(pa.int32()).to_numpy().astype(np.float64),
+        "grade": table.column("grade").to_numpy(),
+        "subjects": np.asarray(subjects.dictionary.to_pylist(), dtype=object),
+    }
+
+def fit_trends(series: Dict[str, np.ndarray], min_points: int = MIN_POINTS, min_span_days: float = MIN_SPAN_DAYS,
+               decline_per_30_days: float = DECLINE_PER_30_DAYS, outlier_z: float = OUTLIER_Z) -> Dict[str, np.ndarray]:
+    """Per (student, subject) slope, z-score and flags, one array element per series"""
+    subject_count = max(len(series["subjects"]), 1)
+    keys, group = np.unique(series["student_id"] * subject_count + series["subject"], return_inverse=True)
+    count = np.bincount(group)
+    day, grade = series["day"], series["grade"]
+
+    # Centre each series before summing so the slope keeps its precision
+    mean_day = np.bincount(group, day) / count
+    mean_grade = np.bincount(group, grade) / count
+    dx = day - mean_day[group]
+    sxx = np.bincount(group, dx * dx)
+    sxy = np.bincount(group, dx * (grade - mean_grade[group]))
+
+    first_day = np.full(len(keys), np.inf)
+    last_day = np.full(len(keys), -np.inf)
+    np.minimum.at(first_day, group, day)
+    np.maximum.at(last_day, group, day)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        slope = np.where(sxx > 0, sxy / sxx, np.nan) * 30.0
+
+        # z-score of each student's subject mean against every student's mean in that subject
+        subject = keys % subject_count
+        students_in_subject = np.bincount(subject, minlength=subject_count)
+        subject_mean = np.bincount(subject, mean_grade, subject_count) / students_in_subject
+        subject_var = np.bincount(subject, (mean_grade - subject_mean[subject]) ** 2, subject_count) / students_in_subject
+        subject_std = np.sqrt(subject_var)
+        z_score = np.where(subject_std[subject] > 0, (mean_grade - subject_mean[subject]) / subject_std[subject], np.nan)
+
+    declining = (count >= min_points) & (last_day - first_day >= min_span_days) & (slope <= decline_per_30_days)
+    outlier = z_score <= -outlier_z
+    return {
+        "student_id": keys // subject_count,
+        "subject": series["subjects"][subject],
+        "grade_count": count,
+        "mean_grade": mean_grade,
+        "slope_per_30_days": slope,
+        "z_score": z_score,
+        "first_day": first_day,
+        "last_day": last_day,
+        "declining": declining,
+        "outlier": outlier,
+    }
+
+def _days_to_dates(days: np.ndarray) -> List[str]:
+    return np.datetime_as_string(days.astype("datetime64[D]")).tolist()
+
+def _nullable(values: np.ndarray) -> list:
+    return [None if value != value else value for value in np.round(values, 4).tolist()]
+
+def trend_rows(trends: Dict[str, np.ndarray]) -> List[tuple]:
+    """Rows in database.GRADE_TREND_COLUMNS order"""
+    return list(zip(
+        trends["student_id"].tolist(),
+        trends["subject"].tolist(),
+        trends["grade_count"].tolist(),
+        np.round(trends["mean_grade"], 4).tolist(),
+        _nullable(trends["slope_per_30_days"]),
+        _nullable(trends["z_score"]),
+        _days_to_dates(trends["first_day"]),
+        _days_to_dates(trends["last_day"]),
+        trends["declining"].astype(int).tolist(),
+        trends["outlier"].astype(int).tolist(),
+    ))
+
+def run_trend_analysis(db_path: Optional[str] = None, **thresholds) -> Dict[str, float]:
+    """Recompute grade_trends from the grades table; returns counts and timings"""
+    database.init_db(db_path)
+
+    started = time.perf_counter()
+    series = load_grade_series(db_path)
+    loaded = time.perf_counter()
+    trends = fit_trends(series, **thresholds)
+    fitted = time.perf_counter()
+    written = database.replace_grade_trends(trend_rows(trends), db_path=db_path)
+    finished = time.perf_counter()
+
+    return {
+        "grades": len(series["grade"]),
+        "series": written,
+        "students": len(np.unique(trends["student_id"])),
+        "declining": int(trends["declining"].sum()),
+        "outliers": int(trends["outlier"].sum()),
+        "load_seconds": loaded - started,
+        "fit_seconds": fitted - loaded,
+        "write_seconds": finished - fitted,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fit grade trends and flag at-risk students")
+    parser.add_argument("--db", default=None, help="Database file (defaults to SMART_CLASSROOM_DB)")
+    parser.add_argument("--min-points", type=int, default=MIN_POINTS)
+    parser.add_argument("--min-span-days", type=float, default=MIN_SPAN_DAYS)
+    parser.add_argument("--decline", type=float, default=DECLINE_PER_30_DAYS,
+                        help="Slope (grade points per 30 days) at or below which a series is declining")
+    parser.add_argument("--outlier-z", type=float, default=OUTLIER_Z)
+    args = parser.parse_args(argv)
+
+    stats = run_trend_analysis(
+        args.db, min_points=args.min_points, min_span_days=args.min_span_days,
+        decline_per_30_days=args.decline, outlier_z=args.outlier_z,
+    )
+    print(f"{stats['grades']} grades, {stats['series']} series over {stats['students']} students: "
+          f"{stats['declining']} declining, {stats['outliers']} outliers")
+    print(f"load {stats['load_seconds']:.1f}s, fit {stats['fit_seconds']:.1f}s, write {stats['write_seconds']:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())